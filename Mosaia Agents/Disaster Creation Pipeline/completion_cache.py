@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import observe
+
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", "completion_cache.db")
+COMPLETION_CACHE_DISABLED = os.getenv("COMPLETION_CACHE_DISABLED", "false").lower() == "true"
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "5000"))
+COMPLETION_CACHE_DEFAULT_TTL = float(os.getenv("COMPLETION_CACHE_DEFAULT_TTL", "0"))
+
+# Seconds a completion stays valid, per agent model ID. 0 disables caching for
+# that agent. Agents whose answer depends on live data (weather stations, web
+# search) get short TTLs or none. COMPLETION_CACHE_TTLS="model=seconds,..."
+# overrides or extends these.
+AGENT_TTLS = {
+    "6864d6cbca5744854d34c998": 30 * 86400,  # bbox: a location's bounding box doesn't change
+    "6864dd95ade4d61675d45e4d": 15 * 60,     # weather: latest station readings
+    "6866162ee2d11c774d448a27": 86400,       # financial analysis
+    "6866646ff14ab5c885e4386d": 86400,       # re-vote amount adjustment
+}
+for _pair in filter(None, os.getenv("COMPLETION_CACHE_TTLS", "").split(",")):
+    _model, _, _seconds = _pair.partition("=")
+    AGENT_TTLS[_model.strip()] = float(_seconds)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    fingerprint TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_by_last_access ON completions (last_access);
+"""
+
+
+def prompt_fingerprint(model, messages):
+    payload = json.dumps([model, messages], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CompletionCache:
+    """Disk-backed cache of agent completions keyed by model ID + prompt fingerprint"""
+
+    def __init__(self, path=COMPLETION_CACHE_PATH, max_entries=COMPLETION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._counters = {}  # model -> {"hits", "misses", "bypassed"}
+
+    def _count(self, model, key):
+        counters = self._counters.setdefault(model, {"hits": 0, "misses": 0, "bypassed": 0})
+        counters[key] += 1
+
+    def ttl_for(self, model):
+        return AGENT_TTLS.get(model, COMPLETION_CACHE_DEFAULT_TTL)
+
+    def get(self, model, messages):
+        now = time.time()
+        fingerprint = prompt_fingerprint(model, messages)
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT content, expires_at FROM completions WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row and row[1] > now:
+                self._db.execute("UPDATE completions SET last_access = ? WHERE fingerprint = ?", (now, fingerprint))
+                self._count(model, "hits")
+                return row[0]
+            if row:
+                self._db.execute("DELETE FROM completions WHERE fingerprint = ?", (fingerprint,))
+            self._count(model, "misses")
+            return None
+
+    def put(self, model, messages, content, ttl):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (fingerprint, model, content, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (prompt_fingerprint(model, messages), model, content, now, now + ttl, now),
+            )
+            size = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            if size > self.max_entries:
+                # Evict expired rows first, then the least recently used tenth
+                self._db.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+                excess = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM completions WHERE fingerprint IN "
+                        "(SELECT fingerprint FROM completions ORDER BY last_access LIMIT ?)",
+                        (excess + self.max_entries // 10,),
+                    )
+
+    def _should_use(self, model, bypass):
+        if bypass or COMPLETION_CACHE_DISABLED or self.ttl_for(model) <= 0:
+            with self._lock:
+                self._count(model, "bypassed")
+            return False
+        return True
+
+    def complete(self, client, model, messages, bypass=False, latency=None):
+        """
+        chat.completions.create through the cache; returns the message content.
+        latency (a Histogram) gets the agent call's duration, not cache hits.
+        """
+        use_cache = self._should_use(model, bypass)
+        if use_cache:
+            content = self.get(model, messages)
+            if content is not None:
+                return content
+        started = time.perf_counter()
+        with observe("agent_completion", model):
+            completion = client.chat.completions.create(model=model, messages=messages)
+        if latency is not None:
+            latency.observe(time.perf_counter() - started)
+        content = completion.choices[0].message.content
+        if use_cache and content:
+            self.put(model, messages, content, self.ttl_for(model))
+        return content
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            per_agent = {model: dict(counters) for model, counters in self._counters.items()}
+        for counters in per_agent.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = round(counters["hits"] / lookups, 3) if lookups else None
+        return {"entries": size, "max_entries": self.max_entries, "disabled": COMPLETION_CACHE_DISABLED,
+                "agents": per_agent}
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+
+DEDUPE_DB_PATH = os.getenv("DEDUPE_DB_PATH", "disaster_index.db")
+DEDUPE_TITLE_THRESHOLD = float(os.getenv("DEDUPE_TITLE_THRESHOLD", "0.85"))
+DEDUPE_LOCATION_THRESHOLD = float(os.getenv("DEDUPE_LOCATION_THRESHOLD", "0.5"))
+DEDUPE_WINDOW_DAYS = float(os.getenv("DEDUPE_WINDOW_DAYS", "14"))  # Fuzzy matching only looks this far back
+DEDUPE_PENDING_TTL_SECONDS = float(os.getenv("DEDUPE_PENDING_TTL_SECONDS", "21600"))
+# Title similarity that makes an active disaster whose bbox overlaps ours a duplicate
+DEDUPE_GEO_TITLE_THRESHOLD = float(os.getenv("DEDUPE_GEO_TITLE_THRESHOLD", "0.6"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS disasters (
+    content_hash TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    location TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    location_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    disaster_hash TEXT,
+    event_id TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    times_seen INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS disasters_by_first_seen ON disasters (first_seen);
+"""
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def content_hash(title, location):
+    """Same sha256(title + location) the pipeline uses as fallback disaster hash"""
+    return hashlib.sha256((title + location).encode()).hexdigest()
+
+
+def _normalize(text):
+    # Token-sorted so "Floods in Kerala" and "Kerala floods" compare as close
+    return " ".join(sorted(_NON_WORD.sub(" ", text.lower()).split()))
+
+
+def _title_similarity(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _location_overlap(a, b):
+    a_tokens, b_tokens = set(a.split()), set(b.split())
+    if not a_tokens or not b_tokens:
+        return 0.0
+    if a_tokens <= b_tokens or b_tokens <= a_tokens:
+        return 1.0
+    return len(a_tokens & b_tokens) / len(a_tokens | b_tokens)
+
+
+class DedupeIndex:
+    """
+    Persistent index of disasters the pipeline has already handled, keyed by
+    content hash, with a fuzzy title/location fallback for reworded repeats.
+
+    reserve() is check-and-claim in one step: it returns the matching row for
+    a known disaster, or inserts a 'pending' row and returns None, so two
+    flows handling the same event concurrently can't both proceed.
+    """
+
+    def __init__(self, path=DEDUPE_DB_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.counters = {"exact_hits": 0, "fuzzy_hits": 0, "geo_hits": 0, "misses": 0}
+
+    def _find(self, key, title_key, location_key, now):
+        row = self._db.execute("SELECT * FROM disasters WHERE content_hash = ?", (key,)).fetchone()
+        if row and self._is_live(row, now):
+            return row, "exact"
+        rows = self._db.execute(
+            "SELECT * FROM disasters WHERE first_seen >= ? AND content_hash != ?",
+            (now - DEDUPE_WINDOW_DAYS * 86400, key),
+        ).fetchall()
+        for row in rows:
+            if (self._is_live(row, now)
+                    and _location_overlap(location_key, row["location_key"]) >= DEDUPE_LOCATION_THRESHOLD
+                    and _title_similarity(title_key, row["title_key"]) >= DEDUPE_TITLE_THRESHOLD):
+                return row, "fuzzy"
+        return None, None
+
+    @staticmethod
+    def _is_live(row, now):
+        # A pending row whose flow died long ago no longer blocks the disaster
+        return row["status"] != "pending" or now - row["last_seen"] < DEDUPE_PENDING_TTL_SECONDS
+
+    def reserve(self, title, location):
+        """Return (match, kind) for a known disaster, or (None, None) after claiming it"""
+        key = content_hash(title, location)
+        title_key, location_key = _normalize(title), _normalize(location)
+        now = time.time()
+        with self._lock, self._db:
+            match, kind = self._find(key, title_key, location_key, now)
+            if match:
+                self._db.execute(
+                    "UPDATE disasters SET last_seen = ?, times_seen = times_seen + 1 WHERE content_hash = ?",
+                    (now, match["content_hash"]),
+                )
+                self.counters[f"{kind}_hits"] += 1
+                return dict(match), kind
+            self._db.execute(
+                "INSERT OR REPLACE INTO disasters (content_hash, title, location, title_key, location_key, "
+                "status, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)",
+                (key, title, location, title_key, location_key, now, now),
+            )
+            self.counters["misses"] += 1
+            return None, None
+
+    def complete(self, title, location, disaster_hash, event_id):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE disasters SET status = 'stored', disaster_hash = ?, event_id = ?, last_seen = ? "
+                "WHERE content_hash = ?",
+                (disaster_hash, event_id, time.time(), content_hash(title, location)),
+            )
+
+    def match_nearby(self, title, location, nearby):
+        """
+        First of `nearby` (active disasters whose bbox overlaps this one's) with
+        a similar title, or None. The area already matches, so the title bar is
+        lower than for the text-only match. A match completes the pending claim
+        with the existing disaster, so later cycles hit it as an exact repeat.
+        """
+        title_key = _normalize(title)
+        for candidate in nearby:
+            if _title_similarity(title_key, _normalize(candidate.get("title") or "")) >= DEDUPE_GEO_TITLE_THRESHOLD:
+                self.complete(title, location, candidate.get("disaster_hash"), candidate.get("event_id"))
+                with self._lock:
+                    self.counters["geo_hits"] += 1
+                return candidate
+        return None
+
+    def release(self, title, location):
+        """Drop a pending claim so the next cycle can retry the disaster"""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM disasters WHERE content_hash = ? AND status = 'pending'",
+                (content_hash(title, location),),
+            )
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM disasters").fetchone()[0]
+        return {"entries": size, **self.counters}
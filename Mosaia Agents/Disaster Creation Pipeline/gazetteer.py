@@ -0,0 +1,325 @@
+import csv
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from metrics import BBOX_LOOKUPS, BBOX_SECONDS_SAVED
+
+logger = logging.getLogger(__name__)
+
+_PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Natural Earth country polygons; a copy ships with the pipeline (the Docker
+# image only contains this directory), the frontend's is used as a fallback
+GAZETTEER_COUNTRIES_PATH = os.getenv("GAZETTEER_COUNTRIES_PATH") or next(
+    (p for p in (
+        os.path.join(_PIPELINE_DIR, "ne_110m_admin_0_countries.geojson"),
+        os.path.join(_PIPELINE_DIR, "..", "..", "frontend", "public", "ne_110m_admin_0_countries.geojson"),
+    ) if os.path.exists(p)),
+    None,
+)
+# Optional extra datasets, comma separated: GeoJSON polygons with a name
+# property (e.g. Natural Earth admin-1 regions) or GeoNames city dumps (.txt)
+GAZETTEER_PLACES_PATHS = [p for p in os.getenv("GAZETTEER_PLACES_PATHS", "").split(",") if p.strip()]
+GAZETTEER_DISABLED = os.getenv("GAZETTEER_DISABLED", "false").lower() == "true"
+# Used as the bbox agent's latency until a fallback call has been timed
+BBOX_AGENT_SECONDS_ESTIMATE = float(os.getenv("BBOX_AGENT_SECONDS_ESTIMATE", "5"))
+
+# Other names the web-search agent uses for Natural Earth's 110m country names
+COUNTRY_ALIASES = {
+    "usa": ["united states", "united states of america", "us", "america"],
+    "england": ["united kingdom", "uk", "great britain", "britain"],
+    "democratic republic of the congo": ["dr congo", "drc", "congo kinshasa"],
+    "republic of the congo": ["congo", "congo brazzaville"],
+    "ivory coast": ["cote d ivoire"],
+    "east timor": ["timor leste"],
+    "macedonia": ["north macedonia"],
+    "republic of serbia": ["serbia"],
+    "swaziland": ["eswatini"],
+    "united republic of tanzania": ["tanzania"],
+    "the bahamas": ["bahamas"],
+    "czech republic": ["czechia"],
+    "myanmar": ["burma"],
+    "turkey": ["turkiye"],
+    "south korea": ["korea", "republic of korea"],
+    "north korea": ["dprk"],
+    "united arab emirates": ["uae"],
+    "vietnam": ["viet nam"],
+    "russia": ["russian federation"],
+    "syria": ["syrian arab republic"],
+    "guinea bissau": ["guinea-bissau"],
+}
+KIND_PRIORITY = {"country": 0, "region": 1, "city": 2}
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_SPLIT_PLACES = re.compile(r"[;/]")
+# Only tried when the whole group isn't a place itself ("Trinidad and Tobago")
+_SPLIT_AND = re.compile(r"\s+(?:and|&)\s+|&")
+_QUALIFIER = re.compile(
+    r"^(?:(?:parts|areas|regions) of |the )?(?:(?:north|south)(?:east|west)?(?:ern)?|(?:east|west)(?:ern)?|central|coastal"
+    r"|northern|southern|eastern|western) "
+)
+_GENERIC_SUFFIX = re.compile(r" (?:state|province|region|district|county|prefecture|city|area|areas|coast)$")
+
+
+_BBOX_KEYS = ("min_lat", "min_lon", "max_lat", "max_lon")
+_BBOX_VALUE = {key: re.compile(rf'"?{key}"?\s*[:=]\s*(-?\d+(?:\.\d+)?)') for key in _BBOX_KEYS}
+
+
+def parse_bbox(text):
+    """min/max lat/lon dict from a bbox as get_bbox returns it (gazetteer JSON or agent reply), or None"""
+    values = {}
+    for key, pattern in _BBOX_VALUE.items():
+        match = pattern.search(text or "")
+        if not match:
+            return None
+        values[key] = float(match.group(1))
+    if not (-90 <= values["min_lat"] <= values["max_lat"] <= 90 and -180 <= values["min_lon"] <= 180
+            and -180 <= values["max_lon"] <= 180):
+        return None
+    return values
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class Place:
+    __slots__ = ("name", "kind", "bbox", "rank")
+
+    def __init__(self, name, kind, bbox, rank):
+        self.name = name
+        self.kind = kind
+        self.bbox = bbox  # (min_lat, min_lon, max_lat, max_lon)
+        self.rank = rank  # Larger wins among places of the same kind (area or population)
+
+    @property
+    def center(self):
+        return (self.bbox[0] + self.bbox[2]) / 2, (self.bbox[1] + self.bbox[3]) / 2
+
+
+def _rings(geometry):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def _ring_bbox(ring):
+    lons = [point[0] for point in ring]
+    lats = [point[1] for point in ring]
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+def _union(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def _area(bbox):
+    return (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+
+def _polygon_bbox(polygons):
+    """The largest part: a union would stretch France to French Guiana and wrap the antimeridian (Fiji, Russia)"""
+    return max((_ring_bbox(polygon[0]) for polygon in polygons), key=_area)
+
+
+def _point_in_ring(lat, lon, ring):
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class Gazetteer:
+    """
+    In-process geocoder for the web-search agent's "Disaster Location:" line.
+
+    Names (and aliases) map to places in a dict, and country polygons sit in
+    a 1-degree grid so a city can be checked against the country named next
+    to it ("Valencia, Spain" vs "Valencia, Venezuela"). resolve() returns
+    the bbox in the same min/max lat/lon shape the bbox agent produces, or
+    None when the most specific part of the location isn't known, in which
+    case the caller asks the agent.
+    """
+
+    def __init__(self):
+        self._names = {}  # normalized name -> [Place]
+        self._grid = {}   # (floor(lat), floor(lon)) -> [(country Place, polygons)]
+        self._lock = threading.Lock()
+        self.sources = []
+        self.load_seconds = 0.0
+        self.counters = {"hits": 0, "misses": 0, "lookup_seconds": 0.0, "seconds_saved": 0.0}
+        self._cycle = dict(self.counters)
+        self._agent_seconds = None  # Moving average of timed bbox agent fallbacks
+
+    @classmethod
+    def load(cls):
+        gazetteer = cls()
+        if GAZETTEER_DISABLED:
+            return gazetteer
+        started = time.perf_counter()
+        if not GAZETTEER_COUNTRIES_PATH:
+            logger.warning("No countries GeoJSON found (set GAZETTEER_COUNTRIES_PATH); "
+                           "country names will all go to the bbox agent")
+        paths = ([GAZETTEER_COUNTRIES_PATH] if GAZETTEER_COUNTRIES_PATH else []) + GAZETTEER_PLACES_PATHS
+        for i, path in enumerate(paths):
+            try:
+                if path.endswith((".txt", ".tsv")):
+                    count = gazetteer.add_geonames(path)
+                else:
+                    count = gazetteer.add_geojson(path, kind="country" if i == 0 and GAZETTEER_COUNTRIES_PATH else "region")
+                gazetteer.sources.append({"path": path, "places": count})
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Skipping gazetteer source %s: %s", path, e)
+        gazetteer.load_seconds = time.perf_counter() - started
+        logger.info("Gazetteer loaded", extra={
+            "names": len(gazetteer._names), "sources": gazetteer.sources,
+            "load_seconds": round(gazetteer.load_seconds, 3),
+        })
+        return gazetteer
+
+    def _add(self, name, place):
+        key = normalize(name)
+        if key:
+            self._names.setdefault(key, []).append(place)
+
+    def add_geojson(self, path, kind):
+        with open(path, encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        count = 0
+        for feature in features:
+            props = feature.get("properties") or {}
+            name = props.get("name") or props.get("NAME") or props.get("name_en")
+            polygons = _rings(feature.get("geometry") or {"type": None})
+            if not name or not polygons:
+                continue
+            bbox = _polygon_bbox(polygons)
+            place = Place(name, kind, bbox, _area(bbox))
+            self._add(name, place)
+            if kind == "country":
+                for alias in COUNTRY_ALIASES.get(normalize(name), []):
+                    self._add(alias, place)
+                self._index_polygons(place, polygons)
+            count += 1
+        return count
+
+    def add_geonames(self, path):
+        """GeoNames dump (cities15000.txt etc.): a point per city, sized by population"""
+        count = 0
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(row) < 15:
+                    continue
+                lat, lon, population = float(row[4]), float(row[5]), int(row[14] or 0)
+                half_lat = 0.1 if population < 100_000 else 0.25 if population < 1_000_000 else 0.5
+                half_lon = min(half_lat / max(math.cos(math.radians(lat)), 0.1), 2.0)
+                place = Place(row[1], "city", (lat - half_lat, lon - half_lon, lat + half_lat, lon + half_lon), population)
+                for name in {row[1], row[2], *filter(None, row[3].split(","))}:
+                    self._add(name, place)
+                count += 1
+        return count
+
+    def _index_polygons(self, place, polygons):
+        for polygon in polygons:
+            min_lat, min_lon, max_lat, max_lon = _ring_bbox(polygon[0])
+            for cell_lat in range(math.floor(min_lat), math.floor(max_lat) + 1):
+                for cell_lon in range(math.floor(min_lon), math.floor(max_lon) + 1):
+                    self._grid.setdefault((cell_lat, cell_lon), []).append((place, polygon))
+
+    def country_at(self, lat, lon):
+        for place, polygon in self._grid.get((math.floor(lat), math.floor(lon)), ()):
+            if _point_in_ring(lat, lon, polygon[0]) and not any(_point_in_ring(lat, lon, hole) for hole in polygon[1:]):
+                return place
+        return None
+
+    def _candidates(self, part):
+        part = normalize(part)
+        if part in self._names:
+            return self._names[part]
+        stripped = _GENERIC_SUFFIX.sub("", _QUALIFIER.sub("", part))
+        return self._names.get(stripped, [])
+
+    def _resolve_one(self, location):
+        """One place, written most specific first: "Kochi, Kerala, India" """
+        parts = [p for p in location.split(",") if p.strip()]
+        if not parts:
+            return None
+        candidates = self._candidates(",".join(parts)) or self._candidates(parts[0])
+        if not candidates:
+            return None
+        context = [c for p in parts[1:] for c in self._candidates(p) if c.kind == "country"]
+        if context:
+            inside = [c for c in candidates if c in context or self.country_at(*c.center) in context]
+            if not inside:
+                return None
+            candidates = inside
+        return min(candidates, key=lambda c: (KIND_PRIORITY[c.kind], -c.rank))
+
+    def resolve(self, location):
+        """bbox dict for a location string, or None if it isn't recognized"""
+        started = time.perf_counter()
+        places = []
+        for group in _SPLIT_PLACES.split(location or ""):
+            if not group.strip():
+                continue
+            place = self._resolve_one(group)
+            if place:
+                places.append(place)
+            else:
+                places.extend(self._resolve_one(part) for part in _SPLIT_AND.split(group) if part.strip())
+        bbox = None
+        if places and all(places):
+            min_lat, min_lon, max_lat, max_lon = _union([p.bbox for p in places])
+            bbox = {"min_lat": round(min_lat, 4), "min_lon": round(min_lon, 4),
+                    "max_lat": round(max_lat, 4), "max_lon": round(max_lon, 4)}
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            saved = (self._agent_seconds or BBOX_AGENT_SECONDS_ESTIMATE) if bbox else 0.0
+            for counters in (self.counters, self._cycle):
+                counters["hits" if bbox else "misses"] += 1
+                counters["lookup_seconds"] += elapsed
+                counters["seconds_saved"] += saved
+        BBOX_LOOKUPS.labels("hit" if bbox else "miss").inc()
+        if saved:
+            BBOX_SECONDS_SAVED.inc(saved)
+        return bbox
+
+    def record_agent_fallback(self, seconds):
+        """Time of a bbox agent call made after a miss; sets the estimate for latency saved per hit"""
+        with self._lock:
+            self._agent_seconds = seconds if self._agent_seconds is None else 0.8 * self._agent_seconds + 0.2 * seconds
+
+    @staticmethod
+    def _summary(counters):
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_ratio": round(counters["hits"] / lookups, 3) if lookups else None,
+            "avg_lookup_us": round(counters["lookup_seconds"] / lookups * 1e6, 1) if lookups else None,
+            "seconds_saved": round(counters["seconds_saved"], 2),
+        }
+
+    def take_cycle_stats(self):
+        """Lookups since the previous call (one scheduler cycle)"""
+        with self._lock:
+            cycle, self._cycle = self._cycle, {key: 0 if key in ("hits", "misses") else 0.0 for key in self._cycle}
+        return self._summary(cycle)
+
+    def stats(self):
+        with self._lock:
+            summary = self._summary(self.counters)
+        return {**summary, "names": len(self._names), "load_seconds": round(self.load_seconds, 3),
+                "agent_seconds_estimate": round(self._agent_seconds or BBOX_AGENT_SECONDS_ESTIMATE, 2)}
@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RUN_JOURNAL_PATH = os.getenv("RUN_JOURNAL_PATH", "run_journal.db")
+RUN_JOURNAL_MAX_ATTEMPTS = int(os.getenv("RUN_JOURNAL_MAX_ATTEMPTS", "3"))
+# A failed run is picked up again only after this long, so a stage a timed-out
+# run left running in the background has finished (and been journaled) by then
+RUN_JOURNAL_RESUME_DELAY_SECONDS = float(os.getenv("RUN_JOURNAL_RESUME_DELAY_SECONDS", "60"))
+RUN_JOURNAL_MAX_AGE_HOURS = float(os.getenv("RUN_JOURNAL_MAX_AGE_HOURS", "48"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stage_outputs (
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    output TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE INDEX IF NOT EXISTS runs_by_status ON runs (status, updated_at);
+"""
+
+
+class RunJournal:
+    """
+    SQLite journal of disaster flow runs: one row per run and the JSON output
+    of every stage it completed. A run that failed (or whose process died
+    while it was 'running') can be resumed by passing its outputs back to
+    run_stages as `initial`, so finished stages, the createDisaster send
+    included, are not repeated.
+
+    Statuses: running, failed (resumable), done, stopped (known disaster),
+    abandoned (out of attempts or too old).
+    """
+
+    def __init__(self, path=RUN_JOURNAL_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.counters = {"started": 0, "resumed": 0, "stages_recorded": 0, "stages_skipped": 0, "abandoned": 0}
+
+    def start(self, run_id, initial=None):
+        """
+        Mark the run as running (again). `initial` is what the run starts from:
+        outputs produced outside the graph for a new run (journaled here), or
+        the journaled outputs themselves for a resumed one.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            resumed = self._db.execute(
+                "UPDATE runs SET status = 'running', attempts = attempts + 1, error = NULL, updated_at = ? "
+                "WHERE run_id = ?", (now, run_id),
+            ).rowcount
+            if not resumed:
+                self._db.execute(
+                    "INSERT INTO runs (run_id, status, attempts, created_at, updated_at) VALUES (?, 'running', 1, ?, ?)",
+                    (run_id, now, now),
+                )
+            self.counters["resumed" if resumed else "started"] += 1
+            if resumed:
+                self.counters["stages_skipped"] += len(initial or {})
+        if not resumed:
+            for stage, output in (initial or {}).items():
+                self.record(run_id, stage, output)
+
+    def record(self, run_id, stage, output):
+        """Persist one stage's output; called from the stage's worker thread as soon as it returns"""
+        payload = json.dumps(output, default=str, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO stage_outputs (run_id, stage, output, completed_at) VALUES (?, ?, ?, ?)",
+                (run_id, stage, payload, now),
+            )
+            self._db.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+            self.counters["stages_recorded"] += 1
+
+    def finish(self, run_id, status, error=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                (status, error, time.time(), run_id),
+            )
+            if status == "abandoned":
+                self.counters["abandoned"] += 1
+
+    def outputs(self, run_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT stage, output FROM stage_outputs WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        return {stage: json.loads(output) for stage, output in rows}
+
+    def resumable(self):
+        """
+        (run_id, outputs, attempts) of failed or interrupted runs that got at
+        least one stage done, oldest first. Runs past RUN_JOURNAL_MAX_AGE_HOURS
+        are abandoned here; the caller abandons those out of attempts.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE runs SET status = 'abandoned', error = COALESCE(error, 'too old to resume') "
+                "WHERE status IN ('running', 'failed') AND created_at < ?",
+                (now - RUN_JOURNAL_MAX_AGE_HOURS * 3600,),
+            )
+            rows = self._db.execute(
+                "SELECT run_id, attempts FROM runs WHERE status IN ('running', 'failed') AND updated_at < ? "
+                "AND EXISTS (SELECT 1 FROM stage_outputs s WHERE s.run_id = runs.run_id) ORDER BY created_at",
+                (now - RUN_JOURNAL_RESUME_DELAY_SECONDS,),
+            ).fetchall()
+        return [(run_id, self.outputs(run_id), attempts) for run_id, attempts in rows]
+
+    def prune(self):
+        """Drop finished runs older than RUN_JOURNAL_MAX_AGE_HOURS"""
+        cutoff = time.time() - RUN_JOURNAL_MAX_AGE_HOURS * 3600
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM stage_outputs WHERE run_id IN (SELECT run_id FROM runs WHERE status NOT IN "
+                "('running', 'failed') AND updated_at < ?)", (cutoff,),
+            )
+            self._db.execute(
+                "DELETE FROM runs WHERE status NOT IN ('running', 'failed') AND updated_at < ?", (cutoff,),
+            )
+
+    def stats(self):
+        with self._lock:
+            by_status = dict(self._db.execute("SELECT status, COUNT(*) FROM runs GROUP BY status").fetchall())
+        return {"runs": by_status, **self.counters}
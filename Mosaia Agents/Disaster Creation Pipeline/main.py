@@ -1,27 +1,80 @@
 import os
 import json
-import hashlib
 import uuid
 from datetime import datetime, timezone
+from decimal import Decimal
 from dotenv import load_dotenv
-from openai import OpenAI
-import boto3
+from botocore.exceptions import ClientError
 import re
 import requests
 from web3 import Web3
 from eth_account import Account
+import argparse
 import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from stages import Stage, StageFailed, FlowStopped, StopFlow, run_stages
+from dedupe import DedupeIndex, content_hash
+from completion_cache import CompletionCache
+from clients import get_agent_client, get_web3, get_dynamodb, get_http_client, client_stats
+from metrics import observe, observe_parse, observe_stages, export_metrics, ANALYSIS_PROMPT_CHARS, ANALYSIS_SECONDS
+from logs import configure_logging, log_payload, logging_stats, request_id_var
+from scheduler import Scheduler
+from journal import RunJournal, RUN_JOURNAL_MAX_ATTEMPTS
+from outbox import Outbox
+from gazetteer import Gazetteer, parse_bbox
+from weather import WEATHER_SUMMARY_ENABLED, summarize as summarize_station_readings
 
 # Load environment variables
 load_dotenv()
+configure_logging()
+logger = logging.getLogger("pipeline")
 
 # Ethereum Sepolia/Contract config from .env
 ETH_RPC_URL = os.getenv("ETH_RPC_URL")
 ETH_CHAIN_ID = int(os.getenv("ETH_CHAIN_ID", "11155111"))  # Sepolia chain ID
-ETH_CONTRACT_ADDRESS = "0x07f9BFEb19F1ac572f6D69271261dDA1fD378D9A"  # New contract address
+ETH_CONTRACT_ADDRESS = os.getenv("ETH_CONTRACT_ADDRESS", "0x07f9BFEb19F1ac572f6D69271261dDA1fD378D9A")  # New contract address
 ETH_ACCOUNT_ADDRESS = os.getenv("ETH_ACCOUNT_ADDRESS")
 ETH_PRIVATE_KEY = os.getenv("ETH_PRIVATE_KEY")
 
+# Verification service, asked for active disasters overlapping a new one's bbox (geometry dedupe)
+VERIFICATION_SERVICE_URL = os.getenv("VERIFICATION_SERVICE_URL")
+NEARBY_LOOKUP_TIMEOUT_SECONDS = float(os.getenv("NEARBY_LOOKUP_TIMEOUT_SECONDS", "2"))
+
+# Outbox workers writing event rows; tweets have one rate-limited worker
+OUTBOX_EVENT_ROW_WORKERS = int(os.getenv("OUTBOX_EVENT_ROW_WORKERS", "2"))
+# How long --once waits for queued rows and tweets before exiting
+OUTBOX_DRAIN_ON_EXIT_SECONDS = float(os.getenv("OUTBOX_DRAIN_ON_EXIT_SECONDS", "120"))
+
+# Max number of stages of one flow allowed to run at the same time
+FLOW_MAX_WORKERS = int(os.getenv("FLOW_MAX_WORKERS", "4"))
+
+# Batch mode: handle every disaster returned by one search instead of just the first
+BATCH_MODE = os.getenv("BATCH_MODE", "false").lower() == "true"
+BATCH_MAX_DISASTERS = int(os.getenv("BATCH_MAX_DISASTERS", "5"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+
+# createDisaster txs of a batch are sent from the same account concurrently,
+# so nonces are handed out locally instead of asking the node for each one
+_nonce_lock = threading.Lock()
+_next_nonce = None
+
+# Disasters already handled by earlier cycles
+dedupe_index = DedupeIndex()
+
+# bbox, weather and analysis prompts are deterministic, so repeats are served from disk
+completion_cache = CompletionCache()
+
+# Event rows and tweets waiting for delivery; see start_outbox_workers()
+outbox = Outbox()
+
+# Stage outputs of every run, so a failed one resumes where it stopped
+run_journal = RunJournal()
+
+# Country (and optional region/city) names resolved to a bbox without the bbox agent
+gazetteer = Gazetteer.load()
+
 # Contract ABI for the new godslite contract
 CONTRACT_ABI = [
     {
@@ -50,94 +103,150 @@ CONTRACT_ABI = [
     }
 ]
 
-def run_disaster_flow():
+def search_disaster(results):
     # Step 1: Get recent disaster
-    disaster_client = OpenAI(
-        base_url="https://api.mosaia.ai/v1/agent",
-        api_key=os.getenv("websearchagent")
-    )
+    disaster_client = get_agent_client("websearchagent")
 
-    disaster_response = disaster_client.chat.completions.create(
-        model="68660a4aeef377abf1f7443f",
-        messages=[{"role": "user", "content": "Find the recent natural disaster in the world"}],
-    )
+    with observe("agent_completion", "68660a4aeef377abf1f7443f"):
+        disaster_response = disaster_client.chat.completions.create(
+            model="68660a4aeef377abf1f7443f",
+            messages=[{"role": "user", "content": "Find the recent natural disaster in the world"}],
+        )
 
     disaster_output = disaster_response.choices[0].message.content.strip()
-    print("\nDisaster Info:\n", disaster_output)
+    log_payload(logger, "Web search reply", disaster_output, model="68660a4aeef377abf1f7443f")
 
     # Parse disaster output
     lines = disaster_output.split('\n')
-    title = lines[0].replace("Title: ", "").strip()
-    description = lines[1].replace("Description: ", "").strip()
-    read_more = lines[2].replace("Read More: ", "").strip()
-    location = lines[3].replace("Disaster Location: ", "").strip()
+    return {
+        "title": lines[0].replace("Title: ", "").strip(),
+        "description": lines[1].replace("Description: ", "").strip(),
+        "read_more": lines[2].replace("Read More: ", "").strip(),
+        "location": lines[3].replace("Disaster Location: ", "").strip(),
+    }
 
+def check_known_disaster(results):
+    # Step 1.1: Stop here if this disaster was already handled, before any agent call or gas is spent
+    disaster = results["search"]
+    match, kind = dedupe_index.reserve(disaster["title"], disaster["location"])
+    if match:
+        logger.info("Known disaster, skipping the rest of the flow", extra={
+            "match": kind, "known_title": match["title"], "disaster_hash": match["disaster_hash"] or "pending",
+        })
+        raise StopFlow(f"duplicate of {match['content_hash']}")
+    return None
+
+def get_bbox(results):
     # Step 2: Get bounding box using disaster description
-    bbox_client = OpenAI(
-        base_url="https://api.mosaia.ai/v1/agent",
-        api_key=os.getenv("bboxagent")
-    )
-
-    bbox_response = bbox_client.chat.completions.create(
+    disaster = results["search"]
+    bbox = gazetteer.resolve(disaster["location"])
+    if bbox:
+        bbox_output = json.dumps(bbox)
+        log_payload(logger, "BBox", bbox_output, source="gazetteer")
+        return bbox_output
+    started = time.perf_counter()
+    bbox_output = completion_cache.complete(
+        get_agent_client("bboxagent"),
         model="6864d6cbca5744854d34c998",
-        messages=[{"role": "user", "content": f"🚨 **{title}** 🚨 {description} 🔗 [Read more]({read_more})"}],
-    )
-
-    bbox_output = bbox_response.choices[0].message.content.strip()
-    print("\nBBox:\n", bbox_output)
-
+        messages=[{"role": "user", "content": f"🚨 **{disaster['title']}** 🚨 {disaster['description']} 🔗 [Read more]({disaster['read_more']})"}],
+    ).strip()
+    gazetteer.record_agent_fallback(time.perf_counter() - started)
+    log_payload(logger, "BBox", bbox_output, model="6864d6cbca5744854d34c998")
+    return bbox_output
+
+def check_nearby_disasters(results):
+    # Step 2.1: Stop if an active disaster over the same area has a similar title
+    bbox = parse_bbox(results["bbox"])
+    if not VERIFICATION_SERVICE_URL or not bbox:
+        return []
+    disaster = results["search"]
+    try:
+        with observe("nearby_disasters", "verification"):
+            response = get_http_client(VERIFICATION_SERVICE_URL).get(
+                "/disasters/nearby", params=bbox, timeout=NEARBY_LOOKUP_TIMEOUT_SECONDS
+            )
+            response.raise_for_status()
+        nearby = response.json()["disasters"]
+    except Exception as e:
+        logger.warning("Nearby disaster lookup failed, relying on the text match only: %s", e)
+        return []
+    match = dedupe_index.match_nearby(disaster["title"], disaster["location"], nearby)
+    if match:
+        logger.info("Known disaster in the same area, skipping the rest of the flow", extra={
+            "match": "geo", "known_title": match["title"], "disaster_hash": match["disaster_hash"],
+        })
+        raise StopFlow(f"duplicate of {match['disaster_hash']}")
+    return nearby
+
+def get_weather(results):
     # Step 3: Get weather data
-    weather_client = OpenAI(
-        base_url="https://api.mosaia.ai/v1/agent",
-        api_key=os.getenv("weatheragent")
-    )
-
-    weather_response = weather_client.chat.completions.create(
+    weather_data = completion_cache.complete(
+        get_agent_client("weatheragent"),
         model="6864dd95ade4d61675d45e4d",
-        messages=[{"role": "user", "content": f"```json\n{bbox_output}\n```"}],
-    )
-
-    weather_data = weather_response.choices[0].message.content.strip()
-    print("\nWeather:\n", weather_data)
-
+        messages=[{"role": "user", "content": f"```json\n{results['bbox']}\n```"}],
+    ).strip()
+    log_payload(logger, "Weather", weather_data, model="6864dd95ade4d61675d45e4d")
+    return weather_data
+
+def summarize_weather(results):
+    # Step 3.1: Reduce the station readings to a small table for the analysis prompt
+    weather_data = results["weather"]
+    if not WEATHER_SUMMARY_ENABLED:
+        return weather_data
+    with observe_parse("weather"):
+        summary = summarize_station_readings(weather_data)
+    if summary is None:
+        logger.info("No station readings to summarize, passing weather data as is")
+        return weather_data
+    logger.info("Weather summarized", extra={"raw_chars": len(weather_data), "summary_chars": len(summary)})
+    return summary
+
+def analyze_disaster(results):
     # Step 4: Financial analysis
-    analysis_client = OpenAI(
-        base_url="https://api.mosaia.ai/v1/agent",
-        api_key=os.getenv("analysisagent")
-    )
-
-    analysis_input = f"🌧️ **{title}**\n{description}\n\n[Read more]({read_more})\n\n{weather_data}"
-    analysis_response = analysis_client.chat.completions.create(
+    disaster = results["search"]
+    # Compared by value: after a journal resume both are fresh strings loaded from JSON
+    weather_form = "raw" if results["weather_summary"] == results["weather"] else "summary"
+    analysis_input = f"🌧️ **{disaster['title']}**\n{disaster['description']}\n\n[Read more]({disaster['read_more']})\n\n{results['weather_summary']}"
+    ANALYSIS_PROMPT_CHARS.labels(weather_form).observe(len(analysis_input))
+    analysis_output = completion_cache.complete(
+        get_agent_client("analysisagent"),
         model="6866162ee2d11c774d448a27",
         messages=[{"role": "user", "content": analysis_input}],
-    )
-
-    analysis_output = analysis_response.choices[0].message.content.strip()
-    print("\nAnalysis:\n", analysis_output)
+        latency=ANALYSIS_SECONDS.labels(weather_form),
+    ).strip()
+    log_payload(logger, "Analysis", analysis_output, model="6866162ee2d11c774d448a27")
 
     # Step 5: Parse amount (keep USD amount as is)
     amount_match = re.search(r"AMOUNT:\s*[\$]?(?P<amount>[\d,]+)", analysis_output)
     amount_required = amount_match.group("amount").replace(",", "") if amount_match else "Unknown"
 
-    print(f"\nAmount required in USD: ${amount_required}")
-
-    # Step 5.1: Write to Smart Contract and get disaster hash
-    contract_disaster_hash = None
-    if amount_required != "Unknown":
-        try:
-            web3 = Web3(Web3.HTTPProvider(ETH_RPC_URL))
-            if not web3.is_connected():
-                raise Exception("Web3 connection failed")
-            account = Account.from_key(ETH_PRIVATE_KEY)
-            if account.address.lower() != ETH_ACCOUNT_ADDRESS.lower():
-                raise Exception("Private key does not match account address")
-            contract = web3.eth.contract(address=Web3.to_checksum_address(ETH_CONTRACT_ADDRESS), abi=CONTRACT_ABI)
-            nonce = web3.eth.get_transaction_count(account.address)
-            # Convert USD amount to wei (assuming 1 USD = 1e18 wei for simplicity, adjust as needed)
-            target_amount_wei = int(float(amount_required) * 1e18)
+    logger.info("Amount required in USD: %s", amount_required, extra={"title": disaster["title"]})
+    return amount_required
+
+def submit_disaster_tx(results):
+    # Step 5.1: Write to Smart Contract (send only, the receipt is awaited by its own stage)
+    disaster = results["search"]
+    amount_required = results["analysis"]
+    if amount_required == "Unknown":
+        return None
+    try:
+        web3 = get_web3(ETH_RPC_URL)
+        if not web3.is_connected():
+            raise Exception("Web3 connection failed")
+        account = Account.from_key(ETH_PRIVATE_KEY)
+        if account.address.lower() != ETH_ACCOUNT_ADDRESS.lower():
+            raise Exception("Private key does not match account address")
+        contract = web3.eth.contract(address=Web3.to_checksum_address(ETH_CONTRACT_ADDRESS), abi=CONTRACT_ABI)
+        # Convert USD amount to wei (assuming 1 USD = 1e18 wei for simplicity, adjust as needed)
+        target_amount_wei = int(float(amount_required) * 1e18)
+        global _next_nonce
+        with _nonce_lock:
+            if _next_nonce is None:
+                _next_nonce = web3.eth.get_transaction_count(account.address, "pending")
+            nonce = _next_nonce
             tx = contract.functions.createDisaster(
-                title,
-                description,
+                disaster["title"],
+                disaster["description"],
                 target_amount_wei
             ).build_transaction({
                 'from': account.address,
@@ -147,80 +256,97 @@ def run_disaster_flow():
                 'chainId': ETH_CHAIN_ID
             })
             signed_tx = web3.eth.account.sign_transaction(tx, ETH_PRIVATE_KEY)
-            tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            print(f"\n[Blockchain] Sent createDisaster tx: {tx_hash.hex()}")
+            try:
+                tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception:
+                # Resync from the node on the next send
+                _next_nonce = None
+                raise
+            _next_nonce = nonce + 1
+        logger.info("Sent createDisaster tx", extra={"tx_hash": tx_hash.hex(), "nonce": nonce})
+        return tx_hash.hex()
+    except Exception:
+        logger.exception("Blockchain interaction failed")
+        return None
+
+def wait_for_disaster_hash(results):
+    # Step 5.2: Wait for the createDisaster receipt and extract the disaster hash
+    tx_hash = results["contract_tx"]
+    if not tx_hash:
+        return None
+    contract_disaster_hash = None
+    try:
+        web3 = get_web3(ETH_RPC_URL)
+        contract = web3.eth.contract(address=Web3.to_checksum_address(ETH_CONTRACT_ADDRESS), abi=CONTRACT_ABI)
+        with observe("tx_receipt_wait", "createDisaster"):
             receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
-            if receipt.status != 1:
-                raise Exception("Transaction failed")
-            # Extract disaster hash from logs
-            for log in receipt.logs:
-                try:
-                    decoded = contract.events.DisasterCreated().process_log(log)
-                    contract_disaster_hash = decoded['args']['disasterHash'].hex()
-                    print(f"[Blockchain] Disaster hash from contract: {contract_disaster_hash}")
-                    break
-                except Exception:
-                    continue
-            if not contract_disaster_hash:
-                print("[Blockchain] Could not extract disaster hash from event logs.")
-        except Exception as e:
-            print(f"[ERROR] Blockchain interaction failed: {e}")
-
-    # Step 6: Construct tweet
-    tweet_text = (
-        f"🚨 {title} 🚨\n\n"
-        f"📝 {description}\n\n"
-        f"💸 Amount required: ${amount_required}\n\n"
-        f"🔗 Read more: {read_more}"
-    )
-
-    print("\nTweet:\n", tweet_text)
-
-    # Step 7: Post to Twitter
-    tweet_client = OpenAI(
-        base_url="https://api.mosaia.ai/v1/agent",
-        api_key=os.getenv("tweetagent")
-    )
-
-    tweet_response = tweet_client.chat.completions.create(
-        model="6864e70f77520411d032518a",
-        messages=[{"role": "user", "content": f'post this content on twitter "{tweet_text}"'}],
-    )
-
-    print("\nTwitter Response:\n", tweet_response.choices[0].message.content)
-
-    # Step 8: Store in DynamoDB
-    aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-    aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-    aws_region = os.getenv("AWS_REGION")
-
-    dynamodb = boto3.resource(
-        'dynamodb',
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key,
-        region_name=aws_region
-    )
-
-    table = dynamodb.Table("gods-hand-events")
+        if receipt.status != 1:
+            raise Exception("Transaction failed")
+        # Extract disaster hash from logs
+        for log in receipt.logs:
+            try:
+                decoded = contract.events.DisasterCreated().process_log(log)
+                contract_disaster_hash = decoded['args']['disasterHash'].hex()
+                logger.info("Disaster hash from contract", extra={"disaster_hash": contract_disaster_hash})
+                break
+            except Exception:
+                continue
+        if not contract_disaster_hash:
+            logger.warning("Could not extract disaster hash from event logs", extra={"tx_hash": tx_hash})
+    except Exception:
+        logger.exception("Blockchain interaction failed")
+    return contract_disaster_hash
+
+def post_tweet(message_id, payload):
+    # Step 7: Post to Twitter (outbox worker, rate limited)
+    tweet_client = get_agent_client("tweetagent")
+
+    with observe("agent_completion", "6864e70f77520411d032518a"):
+        tweet_response = tweet_client.chat.completions.create(
+            model="6864e70f77520411d032518a",
+            messages=[{"role": "user", "content": f'post this content on twitter "{payload["text"]}"'}],
+        )
+
+    log_payload(logger, "Twitter response", tweet_response.choices[0].message.content,
+                model="6864e70f77520411d032518a", event_id=payload["event_id"])
+
+def put_event_row(message_id, item):
+    # Step 8: Store in DynamoDB (outbox worker). The item id is fixed when it is
+    # queued, so a retry after a lost response doesn't write a second row.
+    table = get_dynamodb().Table("gods-hand-events")
+    # When the row actually reaches the table (created_at is when the flow built it);
+    # the verification service's geo index reads new rows by this
+    item["stored_at"] = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    try:
+        table.put_item(Item=item, ConditionExpression="attribute_not_exists(id)")
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        logger.info("DynamoDB entry already present", extra={"event_id": item["id"]})
+        return
+    logger.info("DynamoDB entry added", extra={
+        "event_id": item["id"], "disaster_hash": item["disaster_hash"], "title": item["title"],
+        "location": item["disaster_location"], "amount_required": item["estimated_amount_required"],
+    })
+
+def store_event(results):
+    # Step 6: Hand the event row and the tweet to the outbox; workers deliver them
+    disaster = results["search"]
+    title = disaster["title"]
+    description = disaster["description"]
+    read_more = disaster["read_more"]
+    location = disaster["location"]
+    amount_required = results["analysis"]
+    contract_disaster_hash = results["disaster_hash"]
+    bbox = parse_bbox(results["bbox"])
 
     # Use contract_disaster_hash if available
-    final_disaster_hash = contract_disaster_hash if contract_disaster_hash else hashlib.sha256((title + location).encode()).hexdigest()
+    final_disaster_hash = contract_disaster_hash if contract_disaster_hash else content_hash(title, location)
 
-    # Create a unique hash and timestamp
-    unique_id = str(uuid.uuid4())
+    # Derived from the disaster hash, so the same disaster always gets the same row (and outbox message) id
+    unique_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"godshand:event:{final_disaster_hash}"))
     created_at = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
 
-    # Log values before insertion
-    print("\nLogging values before DB insert:")
-    print("Title:", title)
-    print("Description:", description)
-    print("Read More:", read_more)
-    print("Location:", location)
-    print("Amount Required:", amount_required)
-    print("Hash:", final_disaster_hash)
-    print("ID:", unique_id)
-    print("Created At:", created_at)
-
     # Include all required fields
     dynamodb_item = {
         "id": unique_id,
@@ -232,16 +358,267 @@ def run_disaster_flow():
         "disaster_hash": final_disaster_hash,
         "created_at": created_at
     }
+    # Kept with the event so the verification service can index disasters by area
+    if bbox:
+        dynamodb_item["bbox"] = {key: Decimal(str(value)) for key, value in bbox.items()}
+
+    tweet_text = (
+        f"🚨 {title} 🚨\n\n"
+        f"📝 {description}\n\n"
+        f"💸 Amount required: ${amount_required}\n\n"
+        f"🔗 Read more: {read_more}"
+    )
+    log_payload(logger, "Tweet", tweet_text)
+
+    outbox.enqueue_many([
+        ("event_row", f"event_row:{unique_id}", dynamodb_item),
+        ("tweet", f"tweet:{unique_id}", {"text": tweet_text, "event_id": unique_id}),
+    ])
+    logger.info("Event row and tweet queued", extra={
+        "event_id": unique_id, "disaster_hash": final_disaster_hash, "title": title,
+    })
+    dedupe_index.complete(title, location, final_disaster_hash, unique_id)
+    return dynamodb_item
+
+def parse_disasters(disaster_output):
+    """Split a web-search reply into one dict per Title/Description/Read More/Disaster Location block"""
+    fields = {
+        "title:": "title",
+        "description:": "description",
+        "read more:": "read_more",
+        "disaster location:": "location",
+    }
+    disasters = []
+    current = None
+    for line in disaster_output.split('\n'):
+        # Drop list markers such as "1." or "-" in front of the field name
+        line = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip().strip("*").strip()
+        for prefix, key in fields.items():
+            if line.lower().startswith(prefix):
+                if key == "title":
+                    current = {}
+                    disasters.append(current)
+                if current is not None:
+                    current[key] = line[len(prefix):].strip().strip("*").strip()
+                break
+    return [d for d in disasters if d.get("title") and d.get("location")]
+
+def search_disasters():
+    # Step 1 (batch): Get every recent disaster in one search
+    disaster_client = get_agent_client("websearchagent")
+
+    with observe("agent_completion", "68660a4aeef377abf1f7443f"):
+        disaster_response = disaster_client.chat.completions.create(
+            model="68660a4aeef377abf1f7443f",
+            messages=[{"role": "user", "content": (
+                f"Find up to {BATCH_MAX_DISASTERS} recent natural disasters in the world. "
+                "For each one, give the Title, Description, Read More and Disaster Location lines."
+            )}],
+        )
+
+    disaster_output = disaster_response.choices[0].message.content.strip()
+    log_payload(logger, "Web search reply", disaster_output, model="68660a4aeef377abf1f7443f")
+
+    with observe_parse("disasters"):
+        disasters = parse_disasters(disaster_output)[:BATCH_MAX_DISASTERS]
+    for disaster in disasters:
+        disaster.setdefault("description", "")
+        disaster.setdefault("read_more", "")
+    return disasters
+
+# Per-disaster chain after the search. A known disaster stops at dedupe,
+# or at nearby once its bbox is known.
+# bbox -> nearby -> weather -> weather summary -> analysis is a strict
+# chain, followed by the createDisaster send and receipt wait. The event row
+# needs the on-chain disaster hash, so it waits for the receipt (which
+# resolves immediately when no tx was sent). The row and the tweet are only
+# queued in the outbox; posting and writing happen off the flow.
+DISASTER_CHAIN_STAGES = [
+    Stage("dedupe", check_known_disaster, deps=["search"]),
+    Stage("bbox", get_bbox, deps=["dedupe"]),
+    Stage("nearby", check_nearby_disasters, deps=["search", "bbox"]),
+    Stage("weather", get_weather, deps=["bbox", "nearby"]),
+    Stage("weather_summary", summarize_weather, deps=["weather"]),
+    Stage("analysis", analyze_disaster, deps=["search", "weather_summary"]),
+    Stage("contract_tx", submit_disaster_tx, deps=["search", "analysis"]),
+    Stage("disaster_hash", wait_for_disaster_hash, deps=["contract_tx"]),
+    Stage("store", store_event, deps=["search", "bbox", "analysis", "disaster_hash"]),
+]
+
+# Stage graph of one single-disaster cycle
+DISASTER_FLOW_STAGES = [Stage("search", search_disaster)] + DISASTER_CHAIN_STAGES
+
+def release_abandoned_claim(results):
+    """Let a later cycle retry a disaster whose run was given up before anything went on chain"""
+    disaster = results.get("search")
+    if disaster and "dedupe" in results and not results.get("contract_tx"):
+        dedupe_index.release(disaster["title"], disaster["location"])
+
+def timing_fields(timings):
+    """run_stages timings as log fields: seconds per stage and the run's wall time"""
+    return {
+        "stage_seconds": {name: round(duration, 3) for name, (_, duration) in timings.items()},
+        "wall_seconds": round(max((start + duration for start, duration in timings.values()), default=0.0), 3),
+    }
 
-    # Insert into DynamoDB
-    table.put_item(Item=dynamodb_item)
-    print("\n✅ DynamoDB entry added successfully.")
+def run_journaled(run_id, initial=None, timeout=None):
+    """run_stages over the flow with every stage output journaled under run_id; stages in `initial` are skipped"""
+    run_journal.start(run_id, initial)
+    try:
+        results, timings = run_stages(
+            DISASTER_FLOW_STAGES, max_workers=FLOW_MAX_WORKERS, initial=initial, timeout=timeout,
+            on_result=lambda stage, output: run_journal.record(run_id, stage, output),
+        )
+    except FlowStopped:
+        run_journal.finish(run_id, "stopped")
+        raise
+    except StageFailed as e:
+        # Left resumable; the next cycle picks it up from the last journaled stage
+        run_journal.finish(run_id, "failed", f"{e.stage_name}: {e.error}")
+        raise
+    run_journal.finish(run_id, "done")
+    return results, timings
+
+def run_disaster_flow(timeout=None):
+    run_id = uuid.uuid4().hex[:16]
+    request_id_var.set(run_id)
+    try:
+        results, timings = run_journaled(run_id, timeout=timeout)
+    except FlowStopped as e:
+        observe_stages(e.timings)
+        logger.info("Flow stopped at '%s'", e.stage_name, extra=timing_fields(e.timings))
+        return None
+    except StageFailed as e:
+        observe_stages(e.timings, failed_stage=e.stage_name)
+        logger.error("Flow failed at '%s': %s", e.stage_name, e.error, extra={"run_id": run_id, **timing_fields(e.timings)})
+        raise e.error
+    observe_stages(timings)
+    logger.info("Flow finished", extra=timing_fields(timings))
+    return results["store"]
+
+def run_disaster_chain(disaster, deadline=None):
+    """Run dedupe -> bbox -> ... -> DynamoDB for one disaster of a batch; never raises"""
+    run_id = uuid.uuid4().hex[:16]
+    request_id_var.set(run_id)
+    started = time.perf_counter()
+    timeout = None if deadline is None else max(0.0, deadline - started)
+    try:
+        results, timings = run_journaled(run_id, initial={"search": disaster}, timeout=timeout)
+        observe_stages(timings)
+        return {"title": disaster["title"], "status": "ok", "item": results["store"],
+                "seconds": time.perf_counter() - started, "timings": timings}
+    except FlowStopped as e:
+        observe_stages(e.timings)
+        return {"title": disaster["title"], "status": "known", "seconds": time.perf_counter() - started,
+                "timings": e.timings}
+    except StageFailed as e:
+        observe_stages(e.timings, failed_stage=e.stage_name)
+        logger.error("Disaster '%s' failed at stage '%s': %s", disaster["title"], e.stage_name, e.error)
+        return {"title": disaster["title"], "status": f"failed at {e.stage_name}", "error": str(e.error),
+                "timed_out": isinstance(e.error, TimeoutError),
+                "seconds": time.perf_counter() - started, "timings": e.timings}
+
+def resume_interrupted_runs(deadline=None):
+    """
+    Finish runs an earlier cycle left failed (or a crash left running) from
+    their last journaled stage, so no agent call or createDisaster tx is
+    repeated; returns how many of them stored their disaster.
+    """
+    run_journal.prune()
+    stored = 0
+    for run_id, outputs, attempts in run_journal.resumable():
+        request_id_var.set(run_id)
+        if attempts >= RUN_JOURNAL_MAX_ATTEMPTS:
+            run_journal.finish(run_id, "abandoned", f"gave up after {attempts} attempt(s)")
+            release_abandoned_claim(outputs)
+            logger.warning("Abandoned run", extra={"run_id": run_id, "attempts": attempts, "completed": sorted(outputs)})
+            continue
+        logger.info("Resuming run", extra={"run_id": run_id, "attempt": attempts + 1, "completed": sorted(outputs)})
+        timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        try:
+            results, timings = run_journaled(run_id, initial=outputs, timeout=timeout)
+        except FlowStopped as e:
+            observe_stages(e.timings)
+            continue
+        except StageFailed as e:
+            observe_stages(e.timings, failed_stage=e.stage_name)
+            logger.error("Resumed run failed at '%s': %s", e.stage_name, e.error, extra=timing_fields(e.timings))
+            continue
+        observe_stages(timings)
+        logger.info("Resumed run finished", extra=timing_fields(timings))
+        stored += 1
+    return stored
+
+def run_disaster_batch(timeout=None):
+    request_id_var.set(uuid.uuid4().hex[:16])
+    cycle_started = time.perf_counter()
+    deadline = None if timeout is None else cycle_started + timeout
+    disasters = search_disasters()
+    search_seconds = time.perf_counter() - cycle_started
+    observe_stages({"search": (0.0, search_seconds)})
+    logger.info("Search returned %d disaster(s) in %.2fs", len(disasters), search_seconds)
+    if not disasters:
+        return []
+
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        reports = list(pool.map(lambda disaster: run_disaster_chain(disaster, deadline), disasters))
+
+    for report in reports:
+        logger.info("Batch item %s", report["status"], extra={
+            "title": report["title"], "seconds": round(report["seconds"], 3), **timing_fields(report["timings"]),
+        })
+    ok = sum(1 for report in reports if report["status"] == "ok")
+    known = sum(1 for report in reports if report["status"] == "known")
+    logger.info("Batch done: %d/%d succeeded, %d already known, in %.2fs (%d at a time)",
+                ok, len(reports), known, time.perf_counter() - cycle_started, BATCH_CONCURRENCY)
+    return reports
+
+def run_cycle(timeout=None):
+    """One scheduler cycle; returns how many new disasters were stored"""
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    resumed = resume_interrupted_runs(deadline)
+    if deadline is not None:
+        timeout = max(0.0, deadline - time.perf_counter())
+    if BATCH_MODE:
+        reports = run_disaster_batch(timeout)
+        stored = resumed + sum(1 for report in reports if report["status"] == "ok")
+        failed = [report for report in reports if report["status"].startswith("failed")]
+        if failed and not stored:
+            # Fail the cycle so the scheduler backs off
+            if any(report["timed_out"] for report in failed):
+                raise TimeoutError(f"Batch exceeded {timeout:g}s")
+            raise RuntimeError(f"All {len(failed)} disaster(s) of the batch failed")
+        return stored
+    return resumed + (1 if run_disaster_flow(timeout) else 0)
+
+def report_cycle():
+    logger.info("Cycle stats", extra={
+        "client_pools": client_stats(),
+        "dedupe_index": dedupe_index.stats(),
+        "completion_cache": completion_cache.stats(),
+        "run_journal": run_journal.stats(),
+        "outbox": outbox.stats(),
+        "gazetteer": {**gazetteer.stats(), "cycle": gazetteer.take_cycle_stats()},
+        "logging": logging_stats(),
+    })
+    outbox.prune()
+    export_metrics()
+
+def start_outbox_workers():
+    outbox.register("event_row", put_event_row, workers=OUTBOX_EVENT_ROW_WORKERS)
+    outbox.register("tweet", post_tweet)
+    outbox.start()
 
 if __name__ == "__main__":
-    while True:
-        try:
-            run_disaster_flow()
-        except Exception as e:
-            print(f"[ERROR] Exception in disaster flow: {e}")
-        print("\n[INFO] Sleeping for 1 hour before next run...\n")
-        time.sleep(3600)
+    parser = argparse.ArgumentParser(description="Find new disasters and put them on chain, in DynamoDB and on Twitter")
+    parser.add_argument("--once", action="store_true", help="run a single cycle and exit (for cron)")
+    args = parser.parse_args()
+    start_outbox_workers()
+    scheduler = Scheduler(run_cycle, after_cycle=report_cycle)
+    if args.once:
+        ok = scheduler.run_once()
+        # Whatever isn't delivered by then stays queued for the next run
+        if not outbox.drain(OUTBOX_DRAIN_ON_EXIT_SECONDS):
+            logger.warning("Exiting with undelivered outbox messages", extra={"outbox": outbox.stats()})
+        raise SystemExit(0 if ok else 1)
+    scheduler.run_forever()
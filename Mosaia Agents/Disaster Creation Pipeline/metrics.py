@@ -0,0 +1,206 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    push_to_gateway,
+    write_to_textfile,
+)
+from web3.middleware import Web3Middleware
+
+logger = logging.getLogger(__name__)
+
+# The pipeline is a loop, not a server, so metrics are pushed to a Pushgateway
+# or written for node_exporter's textfile collector after every cycle
+METRICS_PUSHGATEWAY_URL = os.getenv("METRICS_PUSHGATEWAY_URL")
+METRICS_TEXTFILE_PATH = os.getenv("METRICS_TEXTFILE_PATH")
+METRICS_JOB = os.getenv("METRICS_JOB", "disaster-creation-pipeline")
+
+# 5 ms (a warm eth_call) up to 5 min (web-search agent, receipt waits)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# From a fast follow-up cycle to a few missed hourly ones
+DETECTION_BUCKETS = (60, 300, 600, 900, 1800, 2700, 3600, 4500, 5400, 7200, 10800, 14400)
+# Outbox messages wait out retries and the tweet rate limit, so this goes past an hour
+OUTBOX_BUCKETS = LATENCY_BUCKETS + (600, 1800, 3600, 7200)
+# Characters of a prompt, from a short summary to raw multi-station JSON
+PROMPT_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+PARSE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+EXTERNAL_CALL_SECONDS = Histogram(
+    "godshand_external_call_seconds",
+    "Latency of calls to agents, the RPC node and DynamoDB",
+    ["call", "target"],
+    buckets=LATENCY_BUCKETS,
+)
+EXTERNAL_CALL_ERRORS = Counter(
+    "godshand_external_call_errors_total",
+    "External calls that raised or returned an error",
+    ["call", "target"],
+)
+EXTERNAL_CALLS_IN_FLIGHT = Gauge(
+    "godshand_external_calls_in_flight",
+    "External calls currently waiting for an answer",
+    ["call"],
+)
+PARSE_SECONDS = Histogram(
+    "godshand_parse_seconds",
+    "Time spent parsing agent replies",
+    ["parser"],
+    buckets=PARSE_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "godshand_stage_seconds",
+    "Duration of each stage of the disaster flow",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_FAILURES = Counter(
+    "godshand_stage_failures_total",
+    "Disaster flows that failed, by the stage that raised",
+    ["stage"],
+)
+
+CYCLE_SECONDS = Histogram(
+    "godshand_cycle_seconds",
+    "Wall time of one scheduler cycle",
+    buckets=LATENCY_BUCKETS,
+)
+CYCLES = Counter(
+    "godshand_cycles_total",
+    "Scheduler cycles by outcome (ok, failed, deadline_exceeded)",
+    ["status"],
+)
+DETECTION_LATENCY_SECONDS = Histogram(
+    "godshand_detection_latency_seconds",
+    "Upper bound on how long a new disaster waited: previous cycle start to the end of the cycle storing it",
+    buckets=DETECTION_BUCKETS,
+)
+
+ANALYSIS_PROMPT_CHARS = Histogram(
+    "godshand_analysis_prompt_chars",
+    "Size of the financial-analysis prompt, by weather form (raw agent reply or summary table)",
+    ["weather"],
+    buckets=PROMPT_BUCKETS,
+)
+ANALYSIS_SECONDS = Histogram(
+    "godshand_analysis_seconds",
+    "Latency of the financial-analysis agent call, by weather form",
+    ["weather"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOX_DEPTH = Gauge(
+    "godshand_outbox_depth",
+    "Outbox messages waiting to be delivered (pending or in flight)",
+    ["kind"],
+)
+OUTBOX_DRAIN_SECONDS = Histogram(
+    "godshand_outbox_drain_seconds",
+    "Time from enqueueing an outbox message to its successful delivery",
+    ["kind"],
+    buckets=OUTBOX_BUCKETS,
+)
+OUTBOX_DELIVERIES = Counter(
+    "godshand_outbox_deliveries_total",
+    "Outbox delivery attempts by result (ok, retry, dead)",
+    ["kind", "result"],
+)
+BBOX_LOOKUPS = Counter(
+    "godshand_bbox_lookups_total",
+    "Disaster locations resolved by the local gazetteer (hit) or left to the bbox agent (miss)",
+    ["result"],
+)
+BBOX_SECONDS_SAVED = Counter(
+    "godshand_bbox_seconds_saved_total",
+    "Estimated bbox agent time avoided by gazetteer hits",
+)
+
+
+@contextmanager
+def observe(call, target=""):
+    """Time one external call; an exception counts as an error and propagates"""
+    in_flight = EXTERNAL_CALLS_IN_FLIGHT.labels(call)
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_CALL_ERRORS.labels(call, target).inc()
+        raise
+    finally:
+        in_flight.dec()
+        EXTERNAL_CALL_SECONDS.labels(call, target).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def observe_parse(parser):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PARSE_SECONDS.labels(parser).observe(time.perf_counter() - started)
+
+
+def observe_stages(timings, failed_stage=None):
+    """Record the (start, duration) timings returned by run_stages"""
+    for stage, (_, duration) in timings.items():
+        STAGE_SECONDS.labels(stage).observe(duration)
+    if failed_stage:
+        STAGE_FAILURES.labels(failed_stage).inc()
+
+
+class RPCMetricsMiddleware(Web3Middleware):
+    """Times every JSON-RPC request by method (eth_call, eth_sendRawTransaction, ...)"""
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            with observe("rpc", method):
+                response = make_request(method, params)
+            if isinstance(response, dict) and response.get("error"):
+                EXTERNAL_CALL_ERRORS.labels("rpc", method).inc()
+            return response
+        return middleware
+
+
+def instrument_boto3_client(client, call="dynamodb"):
+    """Time every API call of a boto3 client by operation (GetItem, PutItem, ...)"""
+    def before_call(model, context, **kwargs):
+        context["metrics_call"] = (model.name, time.perf_counter())
+        EXTERNAL_CALLS_IN_FLIGHT.labels(call).inc()
+
+    def finish(context, failed):
+        operation, started = context.pop("metrics_call", (None, None))
+        if operation is None:
+            return
+        EXTERNAL_CALLS_IN_FLIGHT.labels(call).dec()
+        EXTERNAL_CALL_SECONDS.labels(call, operation).observe(time.perf_counter() - started)
+        if failed:
+            EXTERNAL_CALL_ERRORS.labels(call, operation).inc()
+
+    def after_call(context, http_response=None, **kwargs):
+        finish(context, http_response is None or http_response.status_code >= 300)
+
+    def after_call_error(context, **kwargs):
+        # Emitted without the operation model when the request itself fails
+        finish(context, True)
+
+    service = client.meta.service_model.service_id.hyphenize()
+    events = client.meta.events
+    events.register(f"before-call.{service}", before_call)
+    events.register(f"after-call.{service}", after_call)
+    events.register(f"after-call-error.{service}", after_call_error)
+
+
+def export_metrics():
+    """Push to METRICS_PUSHGATEWAY_URL and/or write METRICS_TEXTFILE_PATH; no-op when neither is set"""
+    try:
+        if METRICS_PUSHGATEWAY_URL:
+            push_to_gateway(METRICS_PUSHGATEWAY_URL, job=METRICS_JOB, registry=REGISTRY)
+        if METRICS_TEXTFILE_PATH:
+            write_to_textfile(METRICS_TEXTFILE_PATH, REGISTRY)
+    except Exception as e:
+        logger.warning("Metrics export failed: %s", e)
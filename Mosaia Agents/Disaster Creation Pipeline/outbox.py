@@ -0,0 +1,255 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+from metrics import OUTBOX_DELIVERIES, OUTBOX_DEPTH, OUTBOX_DRAIN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.db")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "5"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "900"))
+# A message left in flight longer than this (its worker died) is handed out again
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_KEEP_DONE_HOURS = float(os.getenv("OUTBOX_KEEP_DONE_HOURS", "168"))
+
+# Minimum seconds between two deliveries of a kind, shared by its workers.
+# OUTBOX_MIN_INTERVALS="kind=seconds,..." overrides or extends these.
+MIN_INTERVALS = {
+    "tweet": 60.0,      # Stay well under the tweet agent's (and X's) posting limits
+    "event_row": 0.0,
+}
+for _pair in filter(None, os.getenv("OUTBOX_MIN_INTERVALS", "").split(",")):
+    _kind, _, _seconds = _pair.partition("=")
+    MIN_INTERVALS[_kind.strip()] = float(_seconds)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS messages_due ON messages (kind, status, next_attempt_at);
+"""
+
+
+def _json_default(value):
+    # DynamoDB items carry Decimals; they come back as Decimals via parse_float
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class Outbox:
+    """
+    Durable SQLite queue of side effects (event rows, tweets) that the flow
+    hands off instead of performing inline. Each message's id is its
+    idempotency key: enqueueing the same id again is a no-op, and handlers
+    get the id so they can make the effect itself idempotent (e.g. a
+    conditional put). Delivery is at least once: a message whose worker died
+    mid-delivery is retried after OUTBOX_LEASE_SECONDS.
+
+    Failed deliveries back off exponentially with jitter; after
+    OUTBOX_MAX_ATTEMPTS a message is parked as 'dead' for inspection.
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._handlers = {}  # kind -> (handler, workers)
+        self._next_slot = {}  # kind -> monotonic time of the next allowed delivery
+        self._slot_locks = {}
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self.counters = {}  # kind -> {"enqueued", "duplicates", "delivered", "retried", "dead"}
+
+    def _count(self, kind, key, n=1):
+        counters = self.counters.setdefault(kind, {"enqueued": 0, "duplicates": 0, "delivered": 0, "retried": 0, "dead": 0})
+        counters[key] += n
+
+    # --- Producers ---
+
+    def enqueue_many(self, messages):
+        """Store (kind, id, payload) messages in one transaction; ids already present are skipped"""
+        now = time.time()
+        with self._lock, self._db:
+            for kind, message_id, payload in messages:
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO messages (id, kind, payload, status, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, 'pending', ?, ?)",
+                    (message_id, kind, json.dumps(payload, default=_json_default, ensure_ascii=False), now, now),
+                ).rowcount
+                self._count(kind, "enqueued" if inserted else "duplicates")
+        self._update_depth()
+        with self._wake:
+            self._wake.notify_all()
+
+    def enqueue(self, kind, message_id, payload):
+        self.enqueue_many([(kind, message_id, payload)])
+
+    # --- Workers ---
+
+    def register(self, kind, handler, workers=1):
+        """handler(message_id, payload) delivers one message and raises to have it retried"""
+        self._handlers[kind] = (handler, workers)
+        self._slot_locks[kind] = threading.Lock()
+
+    def start(self):
+        for kind, (_, workers) in self._handlers.items():
+            for i in range(workers):
+                thread = threading.Thread(target=self._run, args=(kind,), name=f"outbox-{kind}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+
+    def _wait(self, seconds):
+        with self._wake:
+            if not self._stop.is_set():
+                self._wake.wait(seconds)
+
+    def _claim(self, kind):
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT id, payload, attempts, created_at FROM messages WHERE kind = ? AND "
+                "((status = 'pending' AND next_attempt_at <= ?) OR (status = 'in_flight' AND lease_until < ?)) "
+                "ORDER BY next_attempt_at LIMIT 1",
+                (kind, now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE messages SET status = 'in_flight', attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                (now + OUTBOX_LEASE_SECONDS, row[0]),
+            )
+        return row[0], json.loads(row[1], parse_float=Decimal), row[2] + 1, row[3]
+
+    def _run(self, kind):
+        handler, _ = self._handlers[kind]
+        interval = MIN_INTERVALS.get(kind, 0.0)
+        slot_lock = self._slot_locks[kind]
+        while not self._stop.is_set():
+            # Rate limit: the workers of a kind claim one at a time, and only once its next slot is due
+            with slot_lock:
+                wait = self._next_slot.get(kind, 0.0) - time.monotonic()
+                message = None
+                if wait <= 0:
+                    try:
+                        message = self._claim(kind)
+                    except sqlite3.Error as e:
+                        logger.warning("Outbox claim failed: %s", e)
+                    if message and interval > 0:
+                        self._next_slot[kind] = time.monotonic() + interval
+            if message is None:
+                self._wait(wait if wait > 0 else OUTBOX_POLL_SECONDS)
+                continue
+            self._deliver(kind, handler, *message)
+
+    def _deliver(self, kind, handler, message_id, payload, attempt, created_at):
+        try:
+            handler(message_id, payload)
+        except Exception as e:
+            dead = attempt >= OUTBOX_MAX_ATTEMPTS
+            delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+            delay *= random.uniform(0.8, 1.2)
+            with self._lock, self._db:
+                self._db.execute(
+                    "UPDATE messages SET status = ?, next_attempt_at = ?, lease_until = NULL, last_error = ? "
+                    "WHERE id = ?",
+                    ("dead" if dead else "pending", time.time() + delay, str(e), message_id),
+                )
+                self._count(kind, "dead" if dead else "retried")
+            OUTBOX_DELIVERIES.labels(kind, "dead" if dead else "retry").inc()
+            log = logger.error if dead else logger.warning
+            log("Outbox %s delivery failed", kind, extra={
+                "message_id": message_id, "attempt": attempt, "error": str(e),
+                "retry_in_seconds": None if dead else round(delay, 1),
+            })
+        else:
+            done_at = time.time()
+            with self._lock, self._db:
+                self._db.execute(
+                    "UPDATE messages SET status = 'done', done_at = ?, lease_until = NULL, last_error = NULL "
+                    "WHERE id = ?",
+                    (done_at, message_id),
+                )
+                self._count(kind, "delivered")
+            OUTBOX_DELIVERIES.labels(kind, "ok").inc()
+            OUTBOX_DRAIN_SECONDS.labels(kind).observe(done_at - created_at)
+            logger.info("Outbox %s delivered", kind, extra={
+                "message_id": message_id, "attempt": attempt, "drain_seconds": round(done_at - created_at, 2),
+            })
+        self._update_depth()
+
+    def drain(self, timeout):
+        """Wait until nothing is pending or in flight (for one-shot runs); returns True if drained"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                waiting = self._db.execute(
+                    "SELECT COUNT(*) FROM messages WHERE status IN ('pending', 'in_flight')"
+                ).fetchone()[0]
+            if not waiting:
+                return True
+            time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+        return False
+
+    # --- Inspection ---
+
+    def _depth(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT kind, status, COUNT(*), MIN(created_at) FROM messages "
+                "WHERE status IN ('pending', 'in_flight', 'dead') GROUP BY kind, status"
+            ).fetchall()
+        return rows
+
+    def _update_depth(self):
+        waiting = {kind: 0 for kind in self._handlers}
+        for kind, status, count, _ in self._depth():
+            if status != "dead":
+                waiting[kind] = waiting.get(kind, 0) + count
+        for kind, count in waiting.items():
+            OUTBOX_DEPTH.labels(kind).set(count)
+
+    def prune(self):
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM messages WHERE status = 'done' AND done_at < ?",
+                (time.time() - OUTBOX_KEEP_DONE_HOURS * 3600,),
+            )
+
+    def stats(self):
+        now = time.time()
+        kinds = {kind: {"pending": 0, "in_flight": 0, "dead": 0, "oldest_waiting_seconds": None}
+                 for kind in self._handlers}
+        for kind, status, count, oldest in self._depth():
+            entry = kinds.setdefault(kind, {"pending": 0, "in_flight": 0, "dead": 0, "oldest_waiting_seconds": None})
+            entry[status] = count
+            if status != "dead":
+                age = round(now - oldest, 1)
+                entry["oldest_waiting_seconds"] = max(entry["oldest_waiting_seconds"] or 0, age)
+        with self._lock:
+            for kind, counters in self.counters.items():
+                kinds.setdefault(kind, {}).update(counters)
+        return kinds
@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from metrics import CYCLE_SECONDS, CYCLES, DETECTION_LATENCY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_BASE_INTERVAL_SECONDS = float(os.getenv("SCHEDULE_BASE_INTERVAL_SECONDS", "3600"))
+# Used instead of the base interval right after a cycle that stored new disasters
+SCHEDULE_FAST_INTERVAL_SECONDS = float(os.getenv("SCHEDULE_FAST_INTERVAL_SECONDS", "600"))
+SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER", "0.1"))  # +/- share of every delay
+SCHEDULE_BACKOFF_BASE_SECONDS = float(os.getenv("SCHEDULE_BACKOFF_BASE_SECONDS", "60"))
+SCHEDULE_BACKOFF_MAX_SECONDS = float(os.getenv("SCHEDULE_BACKOFF_MAX_SECONDS", "3600"))
+SCHEDULE_CYCLE_DEADLINE_SECONDS = float(os.getenv("SCHEDULE_CYCLE_DEADLINE_SECONDS", "900"))
+SCHEDULE_STATE_PATH = os.getenv("SCHEDULE_STATE_PATH", "scheduler_state.json")
+
+
+class SchedulerState:
+    """Last-run bookkeeping in a small JSON file, replaced atomically on every save"""
+
+    def __init__(self, path=SCHEDULE_STATE_PATH):
+        self.path = path
+        self.data = {
+            "cycles": 0,
+            "consecutive_failures": 0,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_status": None,
+            "last_error": None,
+            "last_new_disasters": 0,
+            "last_success_at": None,
+            "last_detection_latency_seconds": None,
+            "next_run_at": None,
+        }
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable scheduler state %s: %s", path, e)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class Scheduler:
+    """
+    Runs `cycle(timeout)` on an adaptive schedule. cycle returns the number
+    of new disasters it stored and raises on failure; it gets the per-cycle
+    deadline as its timeout.
+
+    After a cycle the next one is due in SCHEDULE_BASE_INTERVAL_SECONDS, or
+    SCHEDULE_FAST_INTERVAL_SECONDS if it found something new (disasters tend
+    to come with follow-ups), or after an exponential backoff once cycles
+    start failing. Every delay gets +/- SCHEDULE_JITTER. The due time is
+    persisted, so a restart neither reruns a cycle early nor forgets a
+    backoff.
+    """
+
+    def __init__(self, cycle, after_cycle=None, state=None):
+        self.cycle = cycle
+        self.after_cycle = after_cycle
+        self.state = state or SchedulerState()
+        self._stop = threading.Event()
+
+    def next_delay(self):
+        data = self.state.data
+        if data["consecutive_failures"]:
+            delay = min(SCHEDULE_BACKOFF_MAX_SECONDS,
+                        SCHEDULE_BACKOFF_BASE_SECONDS * 2 ** (data["consecutive_failures"] - 1))
+        elif data["last_new_disasters"]:
+            delay = SCHEDULE_FAST_INTERVAL_SECONDS
+        else:
+            delay = SCHEDULE_BASE_INTERVAL_SECONDS
+        return max(0.0, delay * (1 + random.uniform(-SCHEDULE_JITTER, SCHEDULE_JITTER)))
+
+    def run_once(self):
+        """Run one cycle now and record it; returns True if it succeeded"""
+        data = self.state.data
+        previous_start = data["last_started_at"]
+        started_at = time.time()
+        data["last_started_at"] = started_at
+        self.state.save()
+
+        status, error, new_disasters = "ok", None, 0
+        try:
+            new_disasters = self.cycle(SCHEDULE_CYCLE_DEADLINE_SECONDS) or 0
+        except TimeoutError as e:
+            status, error = "deadline_exceeded", str(e)
+        except Exception as e:
+            status, error = "failed", str(e)
+            logger.exception("Exception in disaster flow")
+        finished_at = time.time()
+        CYCLE_SECONDS.observe(finished_at - started_at)
+        CYCLES.labels(status).inc()
+
+        # A disaster that appeared right after the previous search waits this
+        # long at most before it is stored: until the end of this cycle
+        detection_latency = None
+        if new_disasters and previous_start:
+            detection_latency = finished_at - previous_start
+            DETECTION_LATENCY_SECONDS.observe(detection_latency)
+
+        data.update({
+            "cycles": data["cycles"] + 1,
+            "consecutive_failures": 0 if status == "ok" else data["consecutive_failures"] + 1,
+            "last_finished_at": finished_at,
+            "last_status": status,
+            "last_error": error,
+            "last_new_disasters": new_disasters,
+        })
+        if status == "ok":
+            data["last_success_at"] = finished_at
+        if detection_latency is not None:
+            data["last_detection_latency_seconds"] = round(detection_latency, 1)
+        data["next_run_at"] = finished_at + self.next_delay()
+        self.state.save()
+
+        log = logger.info if status == "ok" else logger.error
+        log("Cycle %s", status, extra={
+            "cycle_seconds": round(finished_at - started_at, 2),
+            "new_disasters": new_disasters,
+            "detection_latency_seconds": data["last_detection_latency_seconds"] if detection_latency else None,
+            "consecutive_failures": data["consecutive_failures"],
+            "next_run_in_seconds": round(data["next_run_at"] - finished_at),
+            "error": error,
+        })
+        if self.after_cycle:
+            self.after_cycle()
+        return status == "ok"
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            due_in = (self.state.data["next_run_at"] or 0) - time.time()
+            if due_in > 0:
+                logger.info("Next cycle in %.0fs", due_in)
+                if self._stop.wait(due_in):
+                    break
+            self.run_once()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """A named step of the pipeline and the stages whose outputs it needs"""
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class StageFailed(Exception):
+    """Raised when a stage raises; carries the partial results and timings"""
+
+    def __init__(self, stage_name, error, results, timings, unfinished=()):
+        super().__init__(f"Stage '{stage_name}' failed: {error}")
+        self.stage_name = stage_name
+        self.error = error
+        self.results = results
+        self.timings = timings
+        # Stages still running when the run gave up on them (timeout only)
+        self.unfinished = tuple(unfinished)
+
+
+class StopFlow(Exception):
+    """Raised by a stage to end the run early on purpose (e.g. a known disaster)"""
+
+
+class FlowStopped(StageFailed):
+    """The run was ended by a StopFlow; not an error"""
+
+
+def _validate(stages, initial):
+    names = {stage.name for stage in stages}
+    if len(names) != len(stages):
+        raise ValueError("Duplicate stage names")
+    names.update(initial)
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+
+def run_stages(stages, max_workers=4, initial=None, timeout=None, on_result=None):
+    """
+    Run stages as a dependency graph. Each stage function receives a dict of
+    the results of the stages completed so far and starts as soon as all of
+    its dependencies are done, so independent stages overlap and the wall
+    time of a run is its critical path. `initial` seeds results for stages
+    that were produced outside the graph (e.g. one disaster of a batch) or
+    by an earlier, interrupted run; stages already in `initial` are skipped.
+    `on_result(name, result)` is called from the stage's worker thread as
+    soon as a stage returns, e.g. to journal it.
+
+    With a `timeout` (seconds), a run that is not done by then raises
+    StageFailed with a TimeoutError; stages still running are left to finish
+    in the background and listed in `unfinished`.
+
+    Returns (results, timings) where timings maps stage name to
+    (start_offset_seconds, duration_seconds) relative to the start of the run.
+    """
+    initial = dict(initial or {})
+    _validate(stages, initial)
+    pending = [stage for stage in stages if stage.name not in initial]
+    results = initial
+    timings = {}
+    running = {}
+    failure = None
+    timed_out = False
+    run_started = time.perf_counter()
+    deadline = run_started + timeout if timeout is not None else None
+
+    def execute(stage, inputs):
+        started = time.perf_counter()
+        try:
+            result = stage.func(inputs)
+            if on_result:
+                on_result(stage.name, result)
+            return result
+        finally:
+            timings[stage.name] = (started - run_started, time.perf_counter() - started)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            # Launch every stage whose dependencies are satisfied
+            if failure is None:
+                for stage in [s for s in pending if all(dep in results for dep in s.deps)]:
+                    pending.remove(stage)
+                    running[pool.submit(execute, stage, dict(results))] = stage
+
+            if not running:
+                if pending and failure is None:
+                    raise ValueError(f"Dependency cycle between stages: {[s.name for s in pending]}")
+                break
+
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                timed_out = True
+                names = [stage.name for stage in running.values()]
+                if failure is None:
+                    failure = (names[0], TimeoutError(f"Run exceeded {timeout:g}s while running {names}"))
+                break
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception as e:
+                    # Let in-flight stages finish but don't start anything new (StopFlow included)
+                    if failure is None:
+                        failure = (stage.name, e)
+    finally:
+        pool.shutdown(wait=not timed_out, cancel_futures=timed_out)
+
+    if failure:
+        # Copies, since abandoned stages may still write to them
+        unfinished = [stage.name for stage in running.values()]
+        if isinstance(failure[1], StopFlow):
+            raise FlowStopped(failure[0], failure[1], dict(results), dict(timings), unfinished)
+        raise StageFailed(failure[0], failure[1], dict(results), dict(timings), unfinished)
+    return results, timings
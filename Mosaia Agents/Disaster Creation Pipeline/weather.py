@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Set to false to hand the weather agent's reply to the analysis agent verbatim
+WEATHER_SUMMARY_ENABLED = os.getenv("WEATHER_SUMMARY_ENABLED", "true").lower() == "true"
+WEATHER_SUMMARY_PERCENTILE = float(os.getenv("WEATHER_SUMMARY_PERCENTILE", "90"))
+
+# Summary row -> (unit, WeatherXM observation field)
+FIELDS = {
+    "precipitation rate": ("mm/h", "precipitation_rate"),
+    "precipitation (day)": ("mm", "precipitation_accumulated"),
+    "wind speed": ("m/s", "wind_speed"),
+    "wind gust": ("m/s", "wind_gust"),
+    "temperature": ("°C", "temperature"),
+    "humidity": ("%", "humidity"),
+}
+_FIELD_KEYS = {key for _, key in FIELDS.values()}
+_FENCED_JSON = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def _json_documents(text):
+    """JSON in the agent's reply: the whole reply, fenced blocks, or the outermost braces"""
+    candidates = [text, *_FENCED_JSON.findall(text)]
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        candidates.append(text[start:end + 1])
+    for candidate in candidates:
+        try:
+            yield json.loads(candidate)
+        except ValueError:
+            continue
+
+
+def _observations(node):
+    """Every station reading in a parsed payload (the `latest` responses, wherever they are nested)"""
+    if isinstance(node, dict):
+        if isinstance(node.get("observation"), dict):
+            yield node["observation"]
+            return
+        if len(_FIELD_KEYS & node.keys()) >= 2:
+            yield node
+            return
+        for value in node.values():
+            yield from _observations(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _observations(value)
+
+
+def parse_stations(text):
+    """
+    Station readings as a (fields x stations) float array with NaN for
+    missing values, one row per FIELDS entry; None if the reply has none.
+    """
+    for document in _json_documents(text):
+        observations = list(_observations(document))
+        if observations:
+            break
+    else:
+        return None
+    columns = np.full((len(FIELDS), len(observations)), np.nan)
+    for j, observation in enumerate(observations):
+        for i, (_, key) in enumerate(FIELDS.values()):
+            value = observation.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                columns[i, j] = value
+    return columns
+
+
+def summarize(text):
+    """
+    Compact min/mean/percentile/max table of the weather agent's station
+    readings across stations, or None when there are no readings to reduce
+    (the caller then keeps the reply as it is).
+    """
+    columns = parse_stations(text)
+    if columns is None:
+        return None
+    present = ~np.isnan(columns).all(axis=1)
+    if not present.any():
+        return None
+    rows = columns[present]
+    stats = np.column_stack([
+        np.nanmin(rows, axis=1),
+        np.nanmean(rows, axis=1),
+        np.nanpercentile(rows, WEATHER_SUMMARY_PERCENTILE, axis=1),
+        np.nanmax(rows, axis=1),
+        (~np.isnan(rows)).sum(axis=1),
+    ])
+    names = [name for name, keep in zip(FIELDS, present) if keep]
+    lines = [
+        f"Weather across {columns.shape[1]} WeatherXM station(s):",
+        f"metric | unit | min | mean | p{WEATHER_SUMMARY_PERCENTILE:g} | max | stations",
+    ]
+    for name, (low, mean, high_pct, high, count) in zip(names, stats):
+        lines.append(f"{name} | {FIELDS[name][0]} | {low:.1f} | {mean:.1f} | {high_pct:.1f} | {high:.1f} | {int(count)}")
+    return "\n".join(lines)
@@ -0,0 +1,126 @@
+import json
+import re
+
+import yaml
+
+# libyaml is several times faster than the pure-Python loader and builds the
+# same objects, except where the two scanners disagree: tabs, tags, non-ASCII
+# line breaks / control characters, a block scalar header directly followed
+# by '#' ("key: >#"), and flow collections holding a '?' or a ':' with no
+# value ("{a:}"). Text with any of those still goes through yaml.safe_load.
+_YAML_FAST_LOADER = getattr(yaml, "CSafeLoader", None)
+_YAML_FAST_LOADER_UNSAFE = re.compile(
+    '[\t!\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\u2028\u2029\ud800-\udfff\ufffe\uffff]'
+    r'|[|>][-+0-9]*#'
+    r'|[{\[][\s\S]*(?:\?|:[}\],])'
+)
+
+# Text json.loads could accept starts with one of these after JSON whitespace
+_JSON_START = re.compile(r'[ \t\n\r]*[{\["\-0-9tfnNI]')
+# A YAML document can only be a mapping if it has a block-mapping colon, a flow
+# mapping or an explicit key; anything else would never be returned as a dict
+_YAML_MAPPING_HINT = re.compile(r':(?:[ \t\r\n\x85\u2028\u2029]|\Z)|[{?]')
+
+_AMOUNT = re.compile(r'amount:\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+_REASONING = re.compile(r'reasoning:\s*(.+?)(?=\n\w+:|$)', re.IGNORECASE | re.DOTALL)
+_COMMENT = re.compile(r'comment:\s*(.+?)(?=\n\w+:|$)', re.IGNORECASE | re.DOTALL)
+_SOURCES = re.compile(r'sources?:\s*(.+?)(?=\n\w+:|$)', re.IGNORECASE | re.DOTALL)
+_SOURCE_DELIMITERS = re.compile(r'[,;\n]')
+
+
+def _coerce(value):
+    if value.isdigit():
+        return int(value)
+    if value.replace('.', '').isdigit():
+        return float(value)
+    lowered = value.lower()
+    if lowered == 'true' or lowered == 'false':
+        return lowered == 'true'
+    return value
+
+
+def _parse_key_values(response_text):
+    """Line-based 'key: value' parser; lines without a colon continue the previous value"""
+    result = {}
+    current_key = None
+    current_value = []
+    for line in response_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        key, colon, value = line.partition(':')
+        if colon:
+            if current_key:
+                result[current_key] = _coerce('\n'.join(current_value).strip())
+            current_key = key.strip()
+            value = value.strip()
+            current_value = [value] if value else []
+        elif current_key:
+            current_value.append(line)
+    if current_key:
+        result[current_key] = _coerce('\n'.join(current_value).strip())
+    return result
+
+
+def _parse_known_fields(response_text):
+    """Pull amount/reasoning/comment/sources out of free text"""
+    result = {}
+    match = _AMOUNT.search(response_text)
+    if match:
+        result['amount'] = float(match.group(1))
+    match = _REASONING.search(response_text)
+    if match:
+        result['reasoning'] = match.group(1).strip()
+    match = _COMMENT.search(response_text)
+    if match:
+        result['comment'] = match.group(1).strip()
+    match = _SOURCES.search(response_text)
+    if match:
+        result['sources'] = [s.strip() for s in _SOURCE_DELIMITERS.split(match.group(1).strip()) if s.strip()]
+    return result
+
+
+def parse_agent_response(response_text):
+    """
+    Parse agent response that could be in JSON, YAML, or custom format.
+
+    The text is sniffed first so only decoders that can succeed are tried;
+    the result is the same as trying JSON, YAML, the line parser and the
+    field regexes in turn.
+    """
+    if _JSON_START.match(response_text):
+        try:
+            return json.loads(response_text)
+        except json.JSONDecodeError:
+            pass
+
+    has_colon = ':' in response_text
+    if _YAML_MAPPING_HINT.search(response_text):
+        try:
+            if _YAML_FAST_LOADER and not _YAML_FAST_LOADER_UNSAFE.search(response_text):
+                result = yaml.load(response_text, Loader=_YAML_FAST_LOADER)
+            else:
+                result = yaml.safe_load(response_text)
+            if isinstance(result, dict):
+                return result
+        except yaml.YAMLError:
+            pass
+
+    # Both fallbacks key off "name:" so text without a colon goes straight to the default
+    if has_colon:
+        try:
+            result = _parse_key_values(response_text)
+        except ValueError:
+            # A value like "1.2.3" passes the digit check but not float()
+            result = None
+        if not result:
+            result = _parse_known_fields(response_text)
+        if result:
+            return result
+
+    return {
+        "amount": None,
+        "comment": response_text,
+        "sources": [],
+        "raw_response": response_text
+    }
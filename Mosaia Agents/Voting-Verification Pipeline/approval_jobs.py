@@ -0,0 +1,271 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from metrics import APPROVAL_JOB_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+APPROVAL_JOBS_PATH = os.getenv("APPROVAL_JOBS_PATH", "approval_jobs.db")
+APPROVAL_JOB_WORKERS = int(os.getenv("APPROVAL_JOB_WORKERS", "4"))
+# Jobs run oldest claim first; a claim of N USDC is treated as if it had been
+# submitted N * APPROVAL_JOB_SECONDS_PER_USDC seconds earlier, up to the cap
+APPROVAL_JOB_SECONDS_PER_USDC = float(os.getenv("APPROVAL_JOB_SECONDS_PER_USDC", "1"))
+APPROVAL_JOB_MAX_AMOUNT_BOOST_SECONDS = float(os.getenv("APPROVAL_JOB_MAX_AMOUNT_BOOST_SECONDS", "3600"))
+APPROVAL_JOB_KEEP_HOURS = float(os.getenv("APPROVAL_JOB_KEEP_HOURS", "168"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    claim_id TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    amount_usdc TEXT NOT NULL,
+    priority REAL NOT NULL,
+    status TEXT NOT NULL,
+    tx_hash TEXT,
+    batch_id TEXT,
+    block_number INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, priority);
+CREATE INDEX IF NOT EXISTS jobs_by_claim ON jobs (claim_id, created_at);
+"""
+
+COLUMNS = ("id", "claim_id", "recipient", "amount_usdc", "priority", "status", "tx_hash", "batch_id",
+           "block_number", "error", "created_at", "updated_at")
+FINAL_STATUSES = ("confirmed", "failed")
+INTERRUPTED_ERROR = "interrupted by a restart; check the wallet before approving again"
+
+
+def _timestamp(value):
+    """Epoch seconds of a claim's created_at (ISO 8601 as the frontend writes it), None if unusable"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def priority_for(amount_usdc, claim_created_at=None, now=None):
+    """Sort key of a job, lowest first: the claim's age shifted earlier by its amount"""
+    submitted = _timestamp(claim_created_at) or now or time.time()
+    boost = min(APPROVAL_JOB_MAX_AMOUNT_BOOST_SECONDS, float(amount_usdc) * APPROVAL_JOB_SECONDS_PER_USDC)
+    return submitted - max(0.0, boost)
+
+
+class ApprovalJobQueue:
+    """
+    SQLite queue of approved claims waiting to be paid out, worked by a pool
+    of threads so /process-vote can answer with a job id right away.
+
+    Statuses: queued, processing (a worker has it, or it waits in a payout
+    batch), submitted (tx sent), confirmed, failed. A claim has at most one
+    job that hasn't failed, so approving it again returns the same job.
+
+    The handler sends the transfer (or hands the claim to the payout
+    batcher) and updates the claim, reporting the tx through
+    mark_submitted(); the receipt outcome comes back through mark_final().
+    """
+
+    def __init__(self, path=APPROVAL_JOBS_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self.workers = 0
+        self.counters = {"accepted": 0, "duplicates": 0, "submitted": 0, "confirmed": 0, "failed": 0, "interrupted": 0}
+
+    def _row(self, row):
+        return dict(zip(COLUMNS, row)) if row else None
+
+    # --- Producers ---
+
+    def submit(self, claim_id, recipient, amount_usdc, claim_created_at=None):
+        """(job, created): a new queued job for the claim, or its existing job that hasn't failed"""
+        now = time.time()
+        with self._lock, self._db:
+            existing = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE claim_id = ? AND status != 'failed' "
+                "ORDER BY created_at DESC LIMIT 1", (claim_id,),
+            ).fetchone()
+            if existing:
+                self.counters["duplicates"] += 1
+                return self._row(existing), False
+            job = {
+                "id": str(uuid.uuid4()),
+                "claim_id": claim_id,
+                "recipient": recipient,
+                "amount_usdc": str(amount_usdc),
+                "priority": priority_for(amount_usdc, claim_created_at, now),
+                "status": "queued",
+                "tx_hash": None, "batch_id": None, "block_number": None, "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self._db.execute(
+                f"INSERT INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                tuple(job[column] for column in COLUMNS),
+            )
+            self.counters["accepted"] += 1
+        with self._wake:
+            self._wake.notify()
+        return job, True
+
+    # --- Workers ---
+
+    def start(self, handler, workers=APPROVAL_JOB_WORKERS):
+        """Run handler(job) for queued jobs on `workers` threads; an exception fails the job"""
+        if self._threads:
+            return
+        self.workers = workers
+        self.prune()
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, args=(handler,), name=f"approval-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+
+    def _claim(self):
+        with self._lock, self._db:
+            row = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE status = 'queued' ORDER BY priority LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = 'processing', updated_at = ? WHERE id = ?", (time.time(), row[0]),
+            )
+        job = self._row(row)
+        job["status"] = "processing"
+        return job
+
+    def _run(self, handler):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.warning("Approval job claim failed: %s", e)
+                job = None
+            if job is None:
+                with self._wake:
+                    if not self._stop.is_set():
+                        self._wake.wait(5)
+                continue
+            try:
+                handler(job)
+            except Exception as e:
+                logger.exception("Approval job failed", extra={"job_id": job["id"], "claim_id": job["claim_id"]})
+                self.mark_final(job["id"], "failed", error=getattr(e, "detail", None) or str(e))
+
+    def _update(self, job_id, status, **fields):
+        """Move a job that isn't final yet to `status`; False if it already was final"""
+        fields["status"] = status
+        fields["updated_at"] = time.time()
+        with self._lock, self._db:
+            return self._db.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} "
+                f"WHERE id = ? AND status NOT IN {FINAL_STATUSES}",
+                (*fields.values(), job_id),
+            ).rowcount > 0
+
+    def mark_batched(self, job_id, batch_id):
+        """Note the batch of a job still waiting in it; a flushed batch has already moved the job on"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET batch_id = ?, updated_at = ? WHERE id = ? AND status = 'processing'",
+                (batch_id, time.time(), job_id),
+            )
+
+    def mark_submitted(self, job_id, tx_hash, batch_id=None):
+        fields = {"tx_hash": tx_hash}
+        if batch_id:
+            fields["batch_id"] = batch_id
+        # The receipt may have been seen first; a final status is left as it is
+        if not self._update(job_id, "submitted", **fields):
+            return
+        self.counters["submitted"] += 1
+        with self._lock:
+            created_at = self._db.execute("SELECT created_at FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        APPROVAL_JOB_WAIT_SECONDS.observe(time.time() - created_at)
+
+    def mark_final(self, job_id, status, error=None, block_number=None):
+        """status is confirmed or failed; a job that is already final keeps its outcome"""
+        if self._update(job_id, status, error=error, block_number=block_number):
+            self.counters[status] += 1
+
+    # --- Restarts ---
+
+    def recover(self):
+        """
+        (interrupted, submitted) jobs a previous process left behind; call
+        before start(). Queued jobs simply run again. Interrupted ones were
+        mid-send (the transfer may or may not have gone out) and must be
+        settled with mark_interrupted(), not retried blindly. Submitted ones
+        need their receipts tracked again.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE status IN ('processing', 'submitted')"
+            ).fetchall()
+        jobs = [self._row(row) for row in rows]
+        return ([job for job in jobs if job["status"] == "processing"],
+                [job for job in jobs if job["status"] == "submitted"])
+
+    def mark_interrupted(self, job_id):
+        if self._update(job_id, "failed", error=INTERRUPTED_ERROR):
+            self.counters["interrupted"] += 1
+
+    def prune(self):
+        with self._lock, self._db:
+            self._db.execute(
+                f"DELETE FROM jobs WHERE status IN {FINAL_STATUSES} AND updated_at < ?",
+                (time.time() - APPROVAL_JOB_KEEP_HOURS * 3600,),
+            )
+
+    # --- Inspection ---
+
+    def get(self, job_id):
+        """The job, with its place in line while it is queued"""
+        with self._lock:
+            job = self._row(self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone())
+            if job and job["status"] == "queued":
+                job["queue_position"] = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND priority < ?", (job["priority"],)
+                ).fetchone()[0] + 1
+        return job
+
+    def job_for_claim(self, claim_id):
+        """Id of the claim's newest job that hasn't failed"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE claim_id = ? AND status != 'failed' ORDER BY created_at DESC LIMIT 1",
+                (claim_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            by_status = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = self._db.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            "jobs": by_status,
+            "workers": self.workers,
+            "oldest_queued_seconds": round(now - oldest, 1) if oldest else None,
+            **self.counters,
+        }
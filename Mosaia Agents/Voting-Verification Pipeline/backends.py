@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# After a failed init, callers get the stored error until this much time has passed
+BACKEND_RETRY_SECONDS = float(os.getenv("BACKEND_RETRY_SECONDS", "5"))
+
+
+class BackendUnavailable(Exception):
+    def __init__(self, name, error):
+        super().__init__(f"{name} is not available: {error}")
+        self.name = name
+        self.error = error
+
+
+class _Backend:
+    def __init__(self, name, init, deps, required):
+        self.name = name
+        self.init = init
+        self.deps = tuple(deps)
+        self.required = required
+        self.status = "cold"
+        self.error = None
+        self.seconds = None
+        self.failed_at = None
+        self.attempts = 0
+        self.task = None
+
+
+class Backends:
+    """
+    Lazily initialized service backends (RPC + wallet, DynamoDB, tunnels...).
+
+    Each backend has a blocking `init()` that runs in a worker thread the
+    first time something needs it, after its `deps`; concurrent callers share
+    that one attempt. warm_all() starts every backend at once, so startup
+    takes as long as the slowest chain instead of the sum of all of them. A
+    failed init is retried by the next caller after BACKEND_RETRY_SECONDS
+    instead of disabling the feature for the life of the process.
+    """
+
+    def __init__(self):
+        self._backends = {}
+        self.ready_at = None  # perf_counter() when the last required backend became warm
+
+    def register(self, name, init, deps=(), required=True):
+        self._backends[name] = _Backend(name, init, deps, required)
+
+    async def require(self, name):
+        """Wait until `name` is initialized; raises BackendUnavailable if it can't be"""
+        backend = self._backends[name]
+        if backend.status == "warm":
+            return
+        if backend.task is None:
+            if backend.status == "failed" and time.monotonic() - backend.failed_at < BACKEND_RETRY_SECONDS:
+                raise BackendUnavailable(name, backend.error)
+            backend.task = asyncio.ensure_future(self._init(backend))
+        try:
+            await asyncio.shield(backend.task)
+        except BackendUnavailable:
+            raise
+        except Exception as e:
+            raise BackendUnavailable(name, e) from e
+
+    async def _init(self, backend):
+        try:
+            for dep in backend.deps:
+                await self.require(dep)
+            backend.status = "warming"
+            backend.attempts += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(backend.init)
+            finally:
+                backend.seconds = round(time.perf_counter() - started, 3)
+            backend.status, backend.error = "warm", None
+            logger.info("Backend %s ready in %.3fs", backend.name, backend.seconds)
+        except Exception as e:
+            backend.status, backend.error, backend.failed_at = "failed", str(e), time.monotonic()
+            logger.warning("Backend %s failed to initialize: %s", backend.name, e)
+            raise
+        finally:
+            backend.task = None
+        self._check_ready()
+
+    def _check_ready(self):
+        if self.ready_at is None and self.is_ready():
+            self.ready_at = time.perf_counter()
+
+    async def warm_all(self):
+        """Initialize every backend concurrently; failures are recorded, not raised"""
+        await asyncio.gather(*(self.require(name) for name in self._backends), return_exceptions=True)
+
+    def is_warm(self, name):
+        return self._backends[name].status == "warm"
+
+    def is_ready(self):
+        return all(b.status == "warm" for b in self._backends.values() if b.required)
+
+    def stats(self):
+        return {
+            name: {
+                "status": b.status,
+                "required": b.required,
+                "init_seconds": b.seconds,
+                "attempts": b.attempts,
+                "error": b.error,
+            }
+            for name, b in self._backends.items()
+        }
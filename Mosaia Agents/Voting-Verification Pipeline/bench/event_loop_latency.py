@@ -0,0 +1,145 @@
+"""
+Checks that slow approvals do not stall the event loop.
+
+Drives the FastAPI app in-process and measures /health and /fact-check
+latency twice: on an idle service, then while a burst of /process-vote
+approvals is in flight. The backends are replaced with stand-ins that
+block their thread for as long as the real ones take (boto3, web3) or
+await (the agent), so a handler that still blocks the loop shows up as a
+p99 jump in the second run.
+
+    python bench/event_loop_latency.py --approvals 20 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SEPOLIA_RPC_URL", "http://127.0.0.1:8545")
+os.environ.setdefault("ETH_CONTRACT_ADDRESS", "0x07f9BFEb19F1ac572f6D69271261dDA1fD378D9A")
+os.environ.setdefault("private_key", "11" * 32)
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+with mock.patch("pyngrok.ngrok.connect", side_effect=RuntimeError("ngrok disabled for benchmark")):
+    import main  # noqa: E402
+
+
+class BlockingTable:
+    """DynamoDB table stand-in whose calls block like a boto3 round trip"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get_item(self, Key):
+        time.sleep(self.latency)
+        return {"Item": {"id": Key["id"], "organization_aztec_address": "0x" + "22" * 20,
+                         "claimed_amount": 5, "reason": "benchmark"}}
+
+    def update_item(self, **kwargs):
+        time.sleep(self.latency)
+
+
+class AsyncCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def create(self, model, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content="amount: 100\ncomment: benchmark\nsources: https://example.org")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def install_stand_ins(args):
+    def get_disaster_info(disaster_hash):
+        time.sleep(args.rpc_latency)
+        return {"title": "Benchmark flood", "target_amount_usdc": 1000.0,
+                "total_donated_usdc": 250.0, "funding_progress": 25.0}
+
+    def send_usdc_to_recipient(recipient_address, amount_usdc, on_final=None):
+        # balanceOf + send, the two RPC round trips left on the approval path
+        time.sleep(2 * args.rpc_latency + args.approval_latency)
+        return "0x" + "ab" * 32
+
+    main.voting_table = BlockingTable(args.db_latency)
+    # The stand-ins replace what the wallet and DynamoDB backends would set up
+    for name in ("wallet", "dynamodb"):
+        main.backends.register(name, lambda: None)
+    main.get_disaster_info = get_disaster_info
+    main.send_usdc_to_recipient = send_usdc_to_recipient
+    main.client = SimpleNamespace(chat=SimpleNamespace(completions=AsyncCompletions(args.agent_latency)))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure(http, method, path, count, concurrency, **kwargs):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await http.request(method, path, **kwargs)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return latencies
+
+
+async def run(args):
+    install_stand_ins(args)
+    # ASGITransport does not send lifespan events, so apply the startup setting by hand
+    asyncio.get_running_loop().set_default_executor(
+        main.ThreadPoolExecutor(max_workers=main.BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+    )
+    fact_check_body = {"statement": "We distributed 500 food kits", "disaster_hash": "0x" + "aa" * 32}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        report = {}
+        for label, with_approvals in (("idle", False), ("approvals in flight", True)):
+            approvals = None
+            if with_approvals:
+                approvals = asyncio.gather(*(
+                    http.post("/process-vote/", json={"voteResult": "approve", "uuid": f"claim-{i}"})
+                    for i in range(args.approvals)
+                ))
+                await asyncio.sleep(0.05)  # Let the approvals get into their slow calls
+            health = await measure(http, "GET", "/health", args.requests, args.concurrency)
+            fact_check = await measure(http, "POST", "/fact-check", max(1, args.requests // 10),
+                                       args.concurrency, json=fact_check_body)
+            if approvals is not None:
+                await approvals
+            report[label] = (health, fact_check)
+
+    print(f"{'':<22}{'/health p50':>12}{'p99':>9}{'/fact-check p50':>17}{'p99':>9}   (ms)")
+    for label, (health, fact_check) in report.items():
+        print(f"{label:<22}{statistics.median(health):>12.1f}{percentile(health, 99):>9.1f}"
+              f"{statistics.median(fact_check):>17.1f}{percentile(fact_check, 99):>9.1f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--approvals", type=int, default=20, help="approvals kept in flight during the second run")
+    parser.add_argument("--requests", type=int, default=200, help="/health requests per run")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--db-latency", type=float, default=0.05, help="seconds per DynamoDB call")
+    parser.add_argument("--rpc-latency", type=float, default=0.1, help="seconds per RPC call")
+    parser.add_argument("--agent-latency", type=float, default=1.0, help="seconds per agent completion")
+    parser.add_argument("--approval-latency", type=float, default=0.5, help="extra seconds spent sending the payout")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
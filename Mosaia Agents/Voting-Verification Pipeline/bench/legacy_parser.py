@@ -0,0 +1,129 @@
+"""
+parse_agent_response() as it was before agent_parser.py, kept verbatim as
+the baseline for parser_benchmark.py.
+"""
+import json
+import re
+
+import yaml
+
+
+def parse_agent_response(response_text):
+    """
+    Parse agent response that could be in JSON, YAML, or custom format
+    """
+    print(f"[INFO] Attempting to parse response: {response_text[:200]}...")
+    
+    # First try JSON
+    try:
+        result = json.loads(response_text)
+        print("[INFO] Successfully parsed as JSON")
+        return result
+    except json.JSONDecodeError:
+        print("[INFO] Not valid JSON, trying YAML...")
+    
+    # Try YAML
+    try:
+        result = yaml.safe_load(response_text)
+        if isinstance(result, dict):
+            print("[INFO] Successfully parsed as YAML")
+            return result
+    except yaml.YAMLError:
+        print("[INFO] Not valid YAML, trying custom parsing...")
+    
+    # Try custom parsing for key: value format
+    try:
+        result = {}
+        lines = response_text.strip().split('\n')
+        current_key = None
+        current_value = []
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+                
+            # Check if line contains a colon (key: value format)
+            if ':' in line and not line.startswith(' '):
+                # Save previous key-value pair
+                if current_key:
+                    value = '\n'.join(current_value).strip()
+                    # Try to convert to appropriate type
+                    if value.isdigit():
+                        result[current_key] = int(value)
+                    elif value.replace('.', '').isdigit():
+                        result[current_key] = float(value)
+                    elif value.lower() in ['true', 'false']:
+                        result[current_key] = value.lower() == 'true'
+                    else:
+                        result[current_key] = value
+                
+                # Start new key-value pair
+                parts = line.split(':', 1)
+                current_key = parts[0].strip()
+                current_value = [parts[1].strip()] if len(parts) > 1 and parts[1].strip() else []
+            else:
+                # Continuation of previous value
+                if current_key:
+                    current_value.append(line)
+        
+        # Save last key-value pair
+        if current_key:
+            value = '\n'.join(current_value).strip()
+            if value.isdigit():
+                result[current_key] = int(value)
+            elif value.replace('.', '').isdigit():
+                result[current_key] = float(value)
+            elif value.lower() in ['true', 'false']:
+                result[current_key] = value.lower() == 'true'
+            else:
+                result[current_key] = value
+        
+        if result:
+            print(f"[INFO] Successfully parsed with custom parser: {result}")
+            return result
+            
+    except Exception as e:
+        print(f"[ERROR] Custom parsing failed: {e}")
+    
+    # Try regex parsing as fallback
+    try:
+        result = {}
+        
+        # Extract amount
+        amount_match = re.search(r'amount:\s*(\d+(?:\.\d+)?)', response_text, re.IGNORECASE)
+        if amount_match:
+            result['amount'] = float(amount_match.group(1))
+        
+        # Extract reasoning/comment
+        reasoning_match = re.search(r'reasoning:\s*(.+?)(?=\n\w+:|$)', response_text, re.IGNORECASE | re.DOTALL)
+        if reasoning_match:
+            result['reasoning'] = reasoning_match.group(1).strip()
+        
+        comment_match = re.search(r'comment:\s*(.+?)(?=\n\w+:|$)', response_text, re.IGNORECASE | re.DOTALL)
+        if comment_match:
+            result['comment'] = comment_match.group(1).strip()
+        
+        # Extract sources
+        sources_match = re.search(r'sources?:\s*(.+?)(?=\n\w+:|$)', response_text, re.IGNORECASE | re.DOTALL)
+        if sources_match:
+            sources_text = sources_match.group(1).strip()
+            # Split by common delimiters
+            sources = [s.strip() for s in re.split(r'[,;\n]', sources_text) if s.strip()]
+            result['sources'] = sources
+        
+        if result:
+            print(f"[INFO] Successfully parsed with regex: {result}")
+            return result
+            
+    except Exception as e:
+        print(f"[ERROR] Regex parsing failed: {e}")
+    
+    # If all parsing methods fail, return a default structure
+    print("[WARN] All parsing methods failed, returning default structure")
+    return {
+        "amount": None,
+        "comment": response_text,
+        "sources": [],
+        "raw_response": response_text
+    }
@@ -0,0 +1,105 @@
+"""
+Per-request cost of the service's logging: the old print() calls of one
+/fact-check request against the same request logged through logs.py.
+
+Each "request" writes a prompt and an agent reply from the recorded corpus
+plus a few status lines. print() goes to stdout redirected into a pipe that
+a slow reader drains, the way a container log driver would; logs.py goes
+through its queue handler at the given level, so only the enqueue is timed.
+
+    python bench/logging_overhead.py --requests 2000 --level INFO
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import logs  # noqa: E402
+
+
+class SlowStream(io.TextIOBase):
+    """A stdout whose reader falls behind: every write costs `delay` seconds"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return len(text)
+
+
+def load_replies(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["reply"] for line in f if line.strip()]
+
+
+def print_request(reply):
+    print("[INFO] Statement: flood relief reached the shelter")
+    print("[INFO] Disaster Hash: 0xabc")
+    print("[INFO] Sending to AI:")
+    print(f"Statement: flood relief reached the shelter\nContext: {reply[:400]}")
+    print("[INFO] Raw Agent Response:")
+    print(reply)
+
+
+def log_request(logger, reply):
+    logger.info("Fact-check", extra={"disaster_hash": "0xabc", "statement": "flood relief reached the shelter"})
+    logs.log_payload(logger, "Agent prompt", f"Statement: flood relief reached the shelter\nContext: {reply[:400]}")
+    logs.log_payload(logger, "Agent response", reply)
+
+
+def time_requests(fn, replies, count):
+    latencies = []
+    for i in range(count):
+        reply = replies[i % len(replies)]
+        started = time.perf_counter()
+        fn(reply)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(args):
+    replies = load_replies(args.corpus)
+    logs.LOG_LEVEL = args.level
+    logs.configure_logging()
+    logger = logging.getLogger("bench")
+    # The listener thread writes to the same slow reader the prints go to
+    for handler in logs._listener.handlers:
+        handler.setStream(SlowStream(args.write_delay_ms / 1000))
+
+    with contextlib.redirect_stdout(SlowStream(args.write_delay_ms / 1000)):
+        printed = time_requests(print_request, replies, args.requests)
+    logged = time_requests(lambda reply: log_request(logger, reply), replies, args.requests)
+
+    print(f"{'':<10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    for name, latencies in (("print", printed), (f"logs {args.level}", logged)):
+        print(f"{name:<10}{statistics.mean(latencies):>10.1f}{statistics.median(latencies):>10.1f}"
+              f"{percentile(latencies, 99):>10.1f}")
+    print(f"[INFO] logs.py stats: {logs.logging_stats()}")
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "agent_replies.jsonl"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--level", default="INFO", choices=["DEBUG", "INFO", "WARNING"])
+    parser.add_argument("--write-delay-ms", type=float, default=0.05, help="cost of each write to stdout")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,126 @@
+"""
+Compares agent_parser.parse_agent_response with the previous implementation
+(bench/legacy_parser.py) on a corpus of recorded agent replies.
+
+Every reply is parsed by both; the run fails if any output (or raised
+exception) differs. Then each parser is timed per reply and traced with
+tracemalloc for peak and retained bytes per call. The legacy parser
+prints on every call, so its stdout goes to /dev/null while it runs.
+
+    python bench/parser_benchmark.py --repeat 200
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import agent_parser  # noqa: E402
+import legacy_parser  # noqa: E402
+
+PARSERS = {
+    "legacy": legacy_parser.parse_agent_response,
+    "agent_parser": agent_parser.parse_agent_response,
+}
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["reply"] for line in f if line.strip()]
+
+
+def outcome(parse, reply):
+    # repr keeps 1, 1.0 and True apart, which == would not
+    try:
+        return repr(parse(reply))
+    except Exception as e:
+        return f"raised {type(e).__name__}"
+
+
+def check_identical(corpus):
+    mismatches = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = [(reply, outcome(PARSERS["legacy"], reply), outcome(PARSERS["agent_parser"], reply))
+                   for reply in corpus]
+    for reply, old, new in results:
+        if old != new:
+            mismatches += 1
+            print(f"[ERROR] Output differs for {reply[:60]!r}:\n  legacy:       {old}\n  agent_parser: {new}")
+    return mismatches
+
+
+def time_parser(parse, corpus, repeat):
+    """Mean microseconds per call for each reply"""
+    per_reply = []
+    for reply in corpus:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            try:
+                parse(reply)
+            except Exception:
+                pass
+        per_reply.append((time.perf_counter() - started) / repeat * 1e6)
+    return per_reply
+
+
+def trace_allocations(parse, corpus):
+    """(peak, retained) bytes per call, averaged over the corpus"""
+    peaks, totals = [], []
+    tracemalloc.start()
+    for reply in corpus:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        try:
+            parse(reply)
+        except Exception:
+            pass
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        after = tracemalloc.take_snapshot()
+        totals.append(sum(stat.size_diff for stat in after.compare_to(before, "lineno") if stat.size_diff > 0))
+    tracemalloc.stop()
+    return statistics.mean(peaks), statistics.mean(totals)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(args):
+    corpus = load_corpus(args.corpus)
+    mismatches = check_identical(corpus)
+    print(f"[INFO] {len(corpus)} replies, {mismatches} output mismatches")
+
+    report = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, parse in PARSERS.items():
+            # Warm up imports and regex/yaml caches before measuring
+            time_parser(parse, corpus, 1)
+            report[name] = (time_parser(parse, corpus, args.repeat), *trace_allocations(parse, corpus))
+
+    print(f"{'':<14}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'peak KiB':>11}{'kept KiB':>11}")
+    for name, (latencies, peak, total) in report.items():
+        print(f"{name:<14}{statistics.mean(latencies):>10.1f}{statistics.median(latencies):>10.1f}"
+              f"{percentile(latencies, 99):>10.1f}{peak / 1024:>11.1f}{total / 1024:>11.1f}")
+    legacy, current = report["legacy"][0], report["agent_parser"][0]
+    print(f"[INFO] agent_parser is {statistics.mean(legacy) / statistics.mean(current):.1f}x faster per reply")
+    return 1 if mismatches else 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "agent_replies.jsonl"))
+    parser.add_argument("--repeat", type=int, default=200, help="calls per reply when timing")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
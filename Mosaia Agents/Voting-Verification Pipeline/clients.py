@@ -0,0 +1,226 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import boto3
+import httpx
+import requests
+from botocore.config import Config
+from openai import AsyncOpenAI, OpenAI
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+
+from metrics import RPCMetricsMiddleware, instrument_boto3_client
+
+logger = logging.getLogger(__name__)
+
+# Shared, process-wide clients. Building an OpenAI client, a Web3 provider or
+# a boto3 resource per call means a new connection pool and TLS handshake per
+# call; everything here is created once per key and then reused.
+MOSAIA_BASE_URL = os.getenv("MOSAIA_BASE_URL", "https://api.mosaia.ai/v1/agent")
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+
+_lock = threading.Lock()
+_creating = {}  # (kind, key) -> lock held while that client is being built
+_registry = {}  # (kind, key) -> entry
+
+
+class _Entry:
+    def __init__(self, kind, label, client, stats_fn):
+        self.kind = kind
+        self.label = label
+        self.client = client
+        self.stats_fn = stats_fn
+        self.created_at = time.time()
+        self.lookups = 0
+
+
+def _get_or_create(kind, key, label, factory):
+    with _lock:
+        entry = _registry.get((kind, key))
+        if entry is None:
+            key_lock = _creating.setdefault((kind, key), threading.Lock())
+    if entry is None:
+        # Built under a per-client lock, not _lock, so slow constructors (boto3, Web3)
+        # of different clients run in parallel while each is still built only once
+        with key_lock:
+            with _lock:
+                entry = _registry.get((kind, key))
+            if entry is None:
+                client, stats_fn = factory()
+                with _lock:
+                    entry = _registry[(kind, key)] = _Entry(kind, label, client, stats_fn)
+                    _creating.pop((kind, key), None)
+                logger.info("Created pooled %s client for %s", kind, label)
+    with _lock:
+        entry.lookups += 1
+    return entry.client
+
+
+def _httpx_client():
+    """httpx client with a keep-alive pool that counts requests and new connections"""
+    counters = {"requests": 0, "connections_opened": 0}
+
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            counters["connections_opened"] += 1
+
+    def on_request(request):
+        counters["requests"] += 1
+        request.extensions["trace"] = trace
+
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        event_hooks={"request": [on_request]},
+    )
+
+    def stats():
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        return {
+            "pool_size": HTTP_POOL_SIZE,
+            "open_connections": len(getattr(pool, "connections", [])),
+            **counters,
+        }
+
+    return http_client, stats
+
+
+def _async_httpx_client():
+    """Async counterpart of _httpx_client; hooks and trace callbacks must be coroutines"""
+    counters = {"requests": 0, "connections_opened": 0}
+
+    async def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            counters["connections_opened"] += 1
+
+    async def on_request(request):
+        counters["requests"] += 1
+        request.extensions["trace"] = trace
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        event_hooks={"request": [on_request]},
+    )
+
+    def stats():
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        return {
+            "pool_size": HTTP_POOL_SIZE,
+            "open_connections": len(getattr(pool, "connections", [])),
+            **counters,
+        }
+
+    return http_client, stats
+
+
+def get_agent_client(agent_key_env: str):
+    """OpenAI-compatible Mosaia client for the agent whose API key is in env var `agent_key_env`"""
+    def factory():
+        http_client, stats = _httpx_client()
+        client = OpenAI(base_url=MOSAIA_BASE_URL, api_key=os.getenv(agent_key_env), http_client=http_client)
+        return client, stats
+    return _get_or_create("agent", agent_key_env, agent_key_env, factory)
+
+
+def get_async_agent_client(agent_key_env: str):
+    """AsyncOpenAI variant of get_agent_client for use inside the event loop"""
+    def factory():
+        http_client, stats = _async_httpx_client()
+        client = AsyncOpenAI(base_url=MOSAIA_BASE_URL, api_key=os.getenv(agent_key_env), http_client=http_client)
+        return client, stats
+    return _get_or_create("agent", f"{agent_key_env}:async", f"{agent_key_env} (async)", factory)
+
+
+def get_web3(rpc_url: str):
+    """Web3 instance whose HTTPProvider reuses one keep-alive requests.Session per RPC endpoint"""
+    def factory():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        web3 = Web3(Web3.HTTPProvider(rpc_url, session=session))
+        web3.middleware_onion.add(RPCMetricsMiddleware, name="metrics")
+
+        def stats():
+            pools = adapter.poolmanager.pools
+            conn_pools = [pools[key] for key in pools.keys()]
+            return {
+                "pool_size": HTTP_POOL_SIZE,
+                "requests": sum(p.num_requests for p in conn_pools),
+                "connections_opened": sum(p.num_connections for p in conn_pools),
+            }
+
+        return web3, stats
+    # RPC URLs often embed an API key, so only the host is shown in stats
+    return _get_or_create("rpc", rpc_url, urlparse(rpc_url or "").hostname or "unknown", factory)
+
+
+def get_dynamodb():
+    """boto3 DynamoDB resource with a keep-alive pool, configured from the AWS_* env vars"""
+    region = os.getenv("AWS_REGION")
+
+    def factory():
+        counters = {"requests": 0}
+
+        def on_send(**kwargs):
+            counters["requests"] += 1
+
+        dynamodb = boto3.resource(
+            "dynamodb",
+            region_name=region,
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            endpoint_url=os.getenv("DYNAMODB_ENDPOINT_URL") or None,
+            config=Config(max_pool_connections=HTTP_POOL_SIZE, tcp_keepalive=True),
+        )
+        dynamodb.meta.client.meta.events.register("before-send.dynamodb", on_send)
+        instrument_boto3_client(dynamodb.meta.client)
+
+        def stats():
+            http_session = getattr(getattr(dynamodb.meta.client, "_endpoint", None), "http_session", None)
+            manager = getattr(http_session, "_manager", None)
+            pools = getattr(manager, "pools", None)
+            conn_pools = [pools[key] for key in pools.keys()] if pools is not None else []
+            return {
+                "pool_size": HTTP_POOL_SIZE,
+                "connections_opened": sum(p.num_connections for p in conn_pools),
+                **counters,
+            }
+
+        return dynamodb, stats
+    return _get_or_create("aws", f"dynamodb:{region}", f"dynamodb:{region}", factory)
+
+
+def client_stats():
+    """Pool sizes and reuse counters for every client created so far"""
+    with _lock:
+        entries = list(_registry.values())
+    stats = []
+    for entry in entries:
+        try:
+            pool = entry.stats_fn()
+        except Exception as e:
+            pool = {"error": str(e)}
+        requests_sent = pool.get("requests", 0)
+        opened = pool.get("connections_opened", 0)
+        stats.append({
+            "kind": entry.kind,
+            "name": entry.label,
+            "lookups": entry.lookups,
+            "age_seconds": round(time.time() - entry.created_at, 1),
+            # Share of requests that went out on an already open connection
+            "connection_reuse_ratio": round(1 - opened / requests_sent, 3) if requests_sent else None,
+            **pool,
+        })
+    return stats
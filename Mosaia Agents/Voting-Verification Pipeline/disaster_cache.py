@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+DISASTER_CACHE_TTL_SECONDS = float(os.getenv("DISASTER_CACHE_TTL_SECONDS", "30"))
+DISASTER_CACHE_MAX_ENTRIES = int(os.getenv("DISASTER_CACHE_MAX_ENTRIES", "1024"))
+DISASTER_EVENT_POLL_SECONDS = float(os.getenv("DISASTER_EVENT_POLL_SECONDS", "5"))
+
+# Events that change what getDisasterDetails returns for a hash. The hash is
+# the first indexed argument, so it is topic[1] of the log.
+DONATION_RECORDED_TOPIC = Web3.to_hex(Web3.keccak(text="DonationRecorded(bytes32,address,uint256,uint256,address)"))
+DISASTER_STATUS_CHANGED_TOPIC = Web3.to_hex(Web3.keccak(text="DisasterStatusChanged(bytes32,bool)"))
+EVENT_NAMES = {DONATION_RECORDED_TOPIC: "DonationRecorded", DISASTER_STATUS_CHANGED_TOPIC: "DisasterStatusChanged"}
+
+
+def normalize_hash(disaster_hash: str):
+    """Lower-case 64 hex chars without 0x, the form used as cache key"""
+    disaster_hash = disaster_hash.lower()
+    if disaster_hash.startswith("0x"):
+        disaster_hash = disaster_hash[2:]
+    if len(disaster_hash) != 64:
+        raise Exception("Invalid disaster_hash length")
+    return disaster_hash
+
+
+class DisasterCache:
+    """TTL + LRU cache of raw getDisasterDetails results keyed by disaster hash"""
+
+    def __init__(self, ttl_seconds=DISASTER_CACHE_TTL_SECONDS, max_entries=DISASTER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # hash -> (expires_at, details)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, disaster_hash):
+        with self._lock:
+            entry = self._entries.get(disaster_hash)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[disaster_hash]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(disaster_hash)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, disaster_hash, details):
+        with self._lock:
+            self._entries[disaster_hash] = (time.monotonic() + self.ttl_seconds, details)
+            self._entries.move_to_end(disaster_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, disaster_hash, loader):
+        """Return cached details for the hash, calling loader(hash) on a miss"""
+        details = self.get(disaster_hash)
+        if details is None:
+            details = loader(disaster_hash)
+            self.put(disaster_hash, details)
+        return details
+
+    def invalidate(self, disaster_hash):
+        with self._lock:
+            if self._entries.pop(disaster_hash, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class DisasterEventWatcher:
+    """
+    Polls the contract for DonationRecorded / DisasterStatusChanged logs and
+    drops the matching cache entries, so totals and the active flag are fresh
+    well before the TTL runs out.
+    """
+
+    def __init__(self, web3, contract_address, cache, poll_seconds=DISASTER_EVENT_POLL_SECONDS, on_event=None):
+        self.web3 = web3
+        self.contract_address = Web3.to_checksum_address(contract_address)
+        self.cache = cache
+        self.poll_seconds = poll_seconds
+        self.on_event = on_event  # called with (event_name, disaster_hash) after the cache entry is dropped
+        self.last_block = None
+        self.events_seen = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="disaster-event-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_once(self):
+        latest = self.web3.eth.block_number
+        if self.last_block is None:
+            self.last_block = latest
+            return
+        if latest <= self.last_block:
+            return
+        logs = self.web3.eth.get_logs({
+            "fromBlock": self.last_block + 1,
+            "toBlock": latest,
+            "address": self.contract_address,
+            "topics": [[DONATION_RECORDED_TOPIC, DISASTER_STATUS_CHANGED_TOPIC]],
+        })
+        for log in logs:
+            if len(log["topics"]) > 1:
+                disaster_hash = normalize_hash(log["topics"][1].hex())
+                self.cache.invalidate(disaster_hash)
+                self.events_seen += 1
+                if self.on_event:
+                    self.on_event(EVENT_NAMES.get(Web3.to_hex(log["topics"][0])), disaster_hash)
+        self.last_block = latest
+
+    def _run(self):
+        logger.info("Watching %s for donation/status events", self.contract_address)
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning("Disaster event poll failed: %s", e)
+            self._stop.wait(self.poll_seconds)
+
+    def stats(self):
+        return {"last_block": self.last_block, "events_seen": self.events_seen}
@@ -0,0 +1,266 @@
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DISASTER_GEO_CELL_DEGREES = float(os.getenv("DISASTER_GEO_CELL_DEGREES", "1"))
+# The events table has no index on created_at, so a refresh is a filtered Scan;
+# DisasterCreated / DisasterStatusChanged events trigger one early
+DISASTER_GEO_POLL_SECONDS = float(os.getenv("DISASTER_GEO_POLL_SECONDS", "60"))
+# Rows are read by stored_at (stamped at write time); each refresh rereads this far back
+# so a row another writer stamped slightly earlier but landed later isn't skipped
+DISASTER_GEO_SCAN_OVERLAP_SECONDS = float(os.getenv("DISASTER_GEO_SCAN_OVERLAP_SECONDS", "120"))
+KM_PER_DEGREE_LAT = 111.32
+
+
+def _parse_time(value):
+    """ISO 8601 timestamp as the creation pipeline writes it, None if it isn't one"""
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _lon_ranges(bbox):
+    """A bbox crossing the antimeridian (min_lon > max_lon) is two longitude ranges"""
+    if bbox["min_lon"] <= bbox["max_lon"]:
+        return [(bbox["min_lon"], bbox["max_lon"])]
+    return [(bbox["min_lon"], 180.0), (-180.0, bbox["max_lon"])]
+
+
+def _overlaps(a, b):
+    if a["min_lat"] > b["max_lat"] or b["min_lat"] > a["max_lat"]:
+        return False
+    return any(a_min <= b_max and b_min <= a_max
+               for a_min, a_max in _lon_ranges(a) for b_min, b_max in _lon_ranges(b))
+
+
+def point_bbox(lat, lon, radius_km=0.0):
+    """bbox around a point; radius_km widens it (longitude scaled by latitude)"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlon = min(180.0, dlat / max(math.cos(math.radians(lat)), 0.01))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if dlon >= 180.0:
+        min_lon, max_lon = -180.0, 180.0
+    else:
+        # Wrap into [-180, 180]; a box that crosses the antimeridian ends up with min_lon > max_lon
+        min_lon = (min_lon + 180.0) % 360.0 - 180.0
+        max_lon = (max_lon + 180.0) % 360.0 - 180.0
+    return {"min_lat": max(-90.0, lat - dlat), "min_lon": min_lon, "max_lat": min(90.0, lat + dlat), "max_lon": max_lon}
+
+
+class GridIndex:
+    """Uniform lat/lon grid; a bbox is listed in every cell it touches"""
+
+    def __init__(self, cell_degrees=DISASTER_GEO_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells = {}  # (row, col) -> set of keys
+        self._boxes = {}  # key -> bbox
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def _cells_for(self, bbox):
+        size = self.cell_degrees
+        rows = range(math.floor(bbox["min_lat"] / size), math.floor(bbox["max_lat"] / size) + 1)
+        for min_lon, max_lon in _lon_ranges(bbox):
+            for col in range(math.floor(min_lon / size), math.floor(max_lon / size) + 1):
+                for row in rows:
+                    yield row, col
+
+    def insert(self, key, bbox):
+        self.remove(key)
+        self._boxes[key] = bbox
+        for cell in self._cells_for(bbox):
+            self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        bbox = self._boxes.pop(key, None)
+        if bbox is None:
+            return
+        for cell in self._cells_for(bbox):
+            keys = self._cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._cells[cell]
+
+    def query(self, bbox):
+        """Keys whose bbox overlaps `bbox`"""
+        candidates = set()
+        for cell in self._cells_for(bbox):
+            candidates |= self._cells.get(cell, set())
+        return [key for key in candidates if _overlaps(self._boxes[key], bbox)]
+
+
+class DisasterGeoIndex:
+    """
+    In-memory grid of the bboxes of active disasters, for "which disasters
+    overlap this area" without scanning the events table.
+
+    Rows of gods-hand-events (written by the creation pipeline with the bbox
+    it computed) are read incrementally by the time they were stored. Whether a disaster is
+    active comes from the chain through `check_active(hashes) -> {hash: bool}`;
+    hashes named by a DisasterStatusChanged event are rechecked on the next
+    refresh, which note_event() starts right away.
+    """
+
+    def __init__(self, table, check_active, poll_seconds=DISASTER_GEO_POLL_SECONDS,
+                 cell_degrees=DISASTER_GEO_CELL_DEGREES):
+        self.table = table
+        self.check_active = check_active
+        self.poll_seconds = poll_seconds
+        self._grid = GridIndex(cell_degrees)
+        self._disasters = {}  # disaster hash -> summary of its event row
+        self._inactive = set()
+        self._stale = set()
+        self._watermark = None  # stored_at (or created_at) of the newest row read
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {"refreshes": 0, "rows_read": 0, "rows_without_bbox": 0, "queries": 0}
+        self.query_seconds = 0.0
+        self.last_refresh_at = None
+        self.last_refresh_seconds = None
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="disaster-geo-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Disaster geo index refresh failed: %s", e)
+
+    def note_event(self, name, disaster_hash):
+        """Contract event hook: new disasters and status changes trigger an early refresh"""
+        if name == "DisasterStatusChanged":
+            with self._lock:
+                self._stale.add(disaster_hash)
+        if name in ("DisasterCreated", "DisasterStatusChanged"):
+            self._wake.set()
+
+    # --- Loading ---
+
+    def _scan_new_rows(self):
+        kwargs = {
+            "ProjectionExpression": "#id, #title, #location, #hash, #bbox, #created, #stored",
+            "ExpressionAttributeNames": {
+                "#id": "id", "#title": "title", "#location": "disaster_location",
+                "#hash": "disaster_hash", "#bbox": "bbox", "#created": "created_at", "#stored": "stored_at",
+            },
+        }
+        if self._watermark:
+            # created_at is set when the flow builds the row, which the outbox may write much
+            # later, so new rows are found by stored_at; rows re-read in the overlap are skipped
+            # by hash. Rows from writers that don't stamp stored_at fall back to created_at.
+            since = self._watermark - timedelta(seconds=DISASTER_GEO_SCAN_OVERLAP_SECONDS)
+            kwargs["FilterExpression"] = (
+                "#stored >= :since OR (attribute_not_exists(#stored) AND #created >= :since)"
+            )
+            kwargs["ExpressionAttributeValues"] = {
+                ":since": since.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            }
+        while True:
+            page = self.table.scan(**kwargs)
+            yield from page.get("Items", [])
+            if "LastEvaluatedKey" not in page:
+                break
+            kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+    def refresh(self):
+        """Read rows created since the last refresh and recheck the active flag of new and stale disasters"""
+        started = time.perf_counter()
+        new = {}
+        watermark = self._watermark
+        for item in self._scan_new_rows():
+            self.counters["rows_read"] += 1
+            bbox = item.get("bbox")
+            disaster_hash = (item.get("disaster_hash") or "").lower().removeprefix("0x")
+            written = _parse_time(item.get("stored_at") or item.get("created_at"))
+            if written and written.tzinfo and (watermark is None or written > watermark):
+                watermark = written
+            if not bbox or len(disaster_hash) != 64:
+                self.counters["rows_without_bbox"] += 1
+                continue
+            if disaster_hash in self._disasters:
+                continue
+            new[disaster_hash] = {
+                "disaster_hash": "0x" + disaster_hash,
+                "event_id": item.get("id"),
+                "title": item.get("title"),
+                "location": item.get("disaster_location"),
+                "created_at": item.get("created_at"),
+                "bbox": {key: float(bbox[key]) for key in ("min_lat", "min_lon", "max_lat", "max_lon")},
+            }
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        to_check = sorted(set(new) | (stale & self._disasters.keys()))
+        try:
+            active = self.check_active(to_check) if to_check else {}
+        except Exception:
+            with self._lock:
+                self._stale |= stale
+            raise
+
+        with self._lock:
+            self._disasters.update(new)
+            for disaster_hash in to_check:
+                if active.get(disaster_hash):
+                    self._inactive.discard(disaster_hash)
+                    self._grid.insert(disaster_hash, self._disasters[disaster_hash]["bbox"])
+                else:
+                    self._inactive.add(disaster_hash)
+                    self._grid.remove(disaster_hash)
+        self._watermark = watermark
+        self.counters["refreshes"] += 1
+        self.last_refresh_at = time.time()
+        self.last_refresh_seconds = round(time.perf_counter() - started, 3)
+        if new or stale:
+            logger.info("Disaster geo index refreshed", extra={
+                "new_rows": len(new), "rechecked": len(to_check), "active": len(self._grid),
+                "refresh_seconds": self.last_refresh_seconds,
+            })
+
+    # --- Queries ---
+
+    def query(self, bbox):
+        """Active disasters whose bbox overlaps `bbox`, newest first"""
+        started = time.perf_counter()
+        with self._lock:
+            matches = [self._disasters[key] for key in self._grid.query(bbox)]
+            self.counters["queries"] += 1
+            self.query_seconds += time.perf_counter() - started
+        return sorted(matches, key=lambda d: d["created_at"] or "", reverse=True)
+
+    def stats(self):
+        with self._lock:
+            queries = self.counters["queries"]
+            return {
+                "active": len(self._grid),
+                "inactive": len(self._inactive),
+                "known": len(self._disasters),
+                "pending_rechecks": len(self._stale),
+                "cell_degrees": self._grid.cell_degrees,
+                **self.counters,
+                "avg_query_us": round(self.query_seconds / queries * 1e6, 1) if queries else None,
+                "last_refresh_at": self.last_refresh_at,
+                "last_refresh_seconds": self.last_refresh_seconds,
+            }
@@ -0,0 +1,336 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+INDEXER_ENABLED = os.getenv("INDEXER_ENABLED", "false").lower() == "true"
+INDEXER_DB_PATH = os.getenv("INDEXER_DB_PATH", "godshand_index.db")
+# Contract deploy block; when unset it is found from the contract's code history (needs an archive node)
+INDEXER_START_BLOCK = int(os.getenv("INDEXER_START_BLOCK")) if os.getenv("INDEXER_START_BLOCK") else None
+INDEXER_CHUNK_SIZE = int(os.getenv("INDEXER_CHUNK_SIZE", "2000"))
+INDEXER_WORKERS = int(os.getenv("INDEXER_WORKERS", "4"))
+# eth_getLogs ranges fetched ahead of the one being applied
+INDEXER_RANGES_IN_FLIGHT = int(os.getenv("INDEXER_RANGES_IN_FLIGHT", "8"))
+INDEXER_CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", "2"))
+INDEXER_POLL_SECONDS = float(os.getenv("INDEXER_POLL_SECONDS", "5"))
+
+GODSHAND_EVENTS_ABI = [
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "internalType": "bytes32", "name": "disasterHash", "type": "bytes32"},
+            {"indexed": False, "internalType": "string", "name": "title", "type": "string"},
+            {"indexed": True, "internalType": "address", "name": "creator", "type": "address"},
+            {"indexed": False, "internalType": "uint256", "name": "targetAmount", "type": "uint256"}
+        ],
+        "name": "DisasterCreated",
+        "type": "event"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "internalType": "bytes32", "name": "disasterHash", "type": "bytes32"},
+            {"indexed": True, "internalType": "address", "name": "donor", "type": "address"},
+            {"indexed": False, "internalType": "uint256", "name": "amount", "type": "uint256"},
+            {"indexed": False, "internalType": "uint256", "name": "totalDonated", "type": "uint256"},
+            {"indexed": True, "internalType": "address", "name": "walletAddress", "type": "address"}
+        ],
+        "name": "DonationRecorded",
+        "type": "event"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "internalType": "bytes32", "name": "disasterHash", "type": "bytes32"},
+            {"indexed": False, "internalType": "bool", "name": "isActive", "type": "bool"}
+        ],
+        "name": "DisasterStatusChanged",
+        "type": "event"
+    }
+]
+
+EVENT_TOPICS = {
+    Web3.to_hex(Web3.keccak(text="DisasterCreated(bytes32,string,address,uint256)")): "DisasterCreated",
+    Web3.to_hex(Web3.keccak(text="DonationRecorded(bytes32,address,uint256,uint256,address)")): "DonationRecorded",
+    Web3.to_hex(Web3.keccak(text="DisasterStatusChanged(bytes32,bool)")): "DisasterStatusChanged",
+}
+
+# uint256 amounts do not fit SQLite integers, so they are stored as decimal text
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS disasters (
+    disaster_hash TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    creator TEXT NOT NULL,
+    target_amount TEXT NOT NULL,
+    total_donated TEXT NOT NULL DEFAULT '0',
+    is_active INTEGER NOT NULL DEFAULT 1,
+    donation_count INTEGER NOT NULL DEFAULT 0,
+    created_block INTEGER NOT NULL,
+    created_tx TEXT NOT NULL,
+    updated_block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS donations (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    disaster_hash TEXT NOT NULL,
+    donor TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    total_donated TEXT NOT NULL,
+    wallet_address TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS donations_by_disaster ON donations (disaster_hash, block_number);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    name TEXT PRIMARY KEY,
+    block INTEGER NOT NULL
+);
+"""
+
+
+def _hex(value):
+    """HexBytes / str to lower-case hex without 0x"""
+    value = value.hex() if hasattr(value, "hex") else str(value)
+    value = value.lower()
+    return value[2:] if value.startswith("0x") else value
+
+
+class ChainIndexer:
+    """
+    Materializes GodsHand contract events into SQLite. Backfills from the
+    deploy block (or the persisted checkpoint) with parallel, chunked
+    eth_getLogs calls, then follows the chain head. Logs are applied in block
+    order and every write is idempotent, so replaying a range is harmless.
+    """
+
+    def __init__(self, web3, contract_address, db_path=INDEXER_DB_PATH, start_block=INDEXER_START_BLOCK,
+                 chunk_size=INDEXER_CHUNK_SIZE, workers=INDEXER_WORKERS, confirmations=INDEXER_CONFIRMATIONS,
+                 poll_seconds=INDEXER_POLL_SECONDS, on_event=None, ranges_in_flight=INDEXER_RANGES_IN_FLIGHT):
+        self.web3 = web3
+        self.contract_address = Web3.to_checksum_address(contract_address)
+        self.contract = web3.eth.contract(address=self.contract_address, abi=GODSHAND_EVENTS_ABI)
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.ranges_in_flight = max(ranges_in_flight, workers)
+        self.confirmations = confirmations
+        self.poll_seconds = poll_seconds
+        self.on_event = on_event  # called with (event_name, disaster_hash) after each applied log
+        self.head_block = None
+        self.backfill_done = False
+        self.last_poll_at = None
+        self.logs_applied = 0
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.start_block is None and self._saved_checkpoint() is None:
+            self.start_block = self.find_deploy_block()
+
+    def find_deploy_block(self):
+        """First block with the contract's code, by binary search over eth_getCode"""
+        head = self.web3.eth.block_number
+        if not self.web3.eth.get_code(self.contract_address, head):
+            raise RuntimeError(f"No contract code at {self.contract_address}; set INDEXER_START_BLOCK")
+        low, high = 0, head
+        try:
+            while low < high:
+                middle = (low + high) // 2
+                if self.web3.eth.get_code(self.contract_address, middle):
+                    high = middle
+                else:
+                    low = middle + 1
+        except Exception as e:
+            raise RuntimeError(f"Can't find the deploy block ({e}); set INDEXER_START_BLOCK") from e
+        logger.info("Indexer start block: contract deployed at block %d", low)
+        return low
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="chain-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                self.last_poll_at = time.time()
+            except Exception as e:
+                logger.warning("Indexer sync failed: %s", e)
+            self._stop.wait(self.poll_seconds)
+
+    # --- Syncing ---
+
+    def _saved_checkpoint(self):
+        with self._lock:
+            row = self._db.execute("SELECT block FROM checkpoint WHERE name = 'godshand'").fetchone()
+        return row[0] if row else None
+
+    def checkpoint(self):
+        saved = self._saved_checkpoint()
+        return saved if saved is not None else self.start_block - 1
+
+    def sync(self):
+        """Index everything from the checkpoint up to head - confirmations"""
+        self.head_block = self.web3.eth.block_number
+        target = self.head_block - self.confirmations
+        from_block = self.checkpoint() + 1
+        if from_block > target:
+            self.backfill_done = True
+            return
+        ranges = ((start, min(start + self.chunk_size - 1, target))
+                  for start in range(from_block, target + 1, self.chunk_size))
+        chunks = -(-(target + 1 - from_block) // self.chunk_size)
+        if chunks > 1:
+            logger.info("Indexer backfilling blocks %d-%d in %d chunks", from_block, target, chunks)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # At most ranges_in_flight fetches ahead; chunks are applied in block order
+            # as the oldest one completes, and each applied chunk lets the next one start
+            in_flight = deque()
+            for _ in range(self.ranges_in_flight):
+                block_range = next(ranges, None)
+                if block_range:
+                    in_flight.append((block_range, pool.submit(self._get_logs, *block_range)))
+            try:
+                while in_flight and not self._stop.is_set():
+                    (start, end), future = in_flight.popleft()
+                    self._apply(future.result(), end)
+                    block_range = next(ranges, None)
+                    if block_range:
+                        in_flight.append((block_range, pool.submit(self._get_logs, *block_range)))
+            finally:
+                # On a failed chunk or stop(), don't fetch what won't be applied
+                for _, future in in_flight:
+                    future.cancel()
+        if self._stop.is_set():
+            return
+        if chunks > 1:
+            logger.info("Indexer caught up to block %d in %.1fs", target, time.perf_counter() - started)
+        self.backfill_done = True
+
+    def _get_logs(self, from_block, to_block):
+        try:
+            return self.web3.eth.get_logs({
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "address": self.contract_address,
+                "topics": [list(EVENT_TOPICS)],
+            })
+        except Exception:
+            # Providers cap the result size per call; split the range and retry
+            if from_block >= to_block:
+                raise
+            middle = (from_block + to_block) // 2
+            return self._get_logs(from_block, middle) + self._get_logs(middle + 1, to_block)
+
+    def _apply(self, logs, checkpoint_block):
+        applied = []
+        logs = sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+        with self._lock, self._db:
+            for log in logs:
+                name = EVENT_TOPICS.get(Web3.to_hex(log["topics"][0]))
+                if not name:
+                    continue
+                event = getattr(self.contract.events, name)().process_log(log)
+                args = event["args"]
+                disaster_hash = _hex(args["disasterHash"])
+                block = log["blockNumber"]
+                if name == "DisasterCreated":
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO disasters (disaster_hash, title, creator, target_amount, "
+                        "created_block, created_tx, updated_block) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (disaster_hash, args["title"], args["creator"], str(args["targetAmount"]),
+                         block, _hex(log["transactionHash"]), block),
+                    )
+                elif name == "DonationRecorded":
+                    inserted = self._db.execute(
+                        "INSERT OR IGNORE INTO donations (tx_hash, log_index, disaster_hash, donor, amount, "
+                        "total_donated, wallet_address, block_number) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (_hex(log["transactionHash"]), log["logIndex"], disaster_hash, args["donor"],
+                         str(args["amount"]), str(args["totalDonated"]), args["walletAddress"], block),
+                    ).rowcount
+                    # totalDonated in the event is the running total, so the write is idempotent
+                    self._db.execute(
+                        "UPDATE disasters SET total_donated = ?, donation_count = donation_count + ?, "
+                        "updated_block = ? WHERE disaster_hash = ?",
+                        (str(args["totalDonated"]), inserted, block, disaster_hash),
+                    )
+                else:
+                    self._db.execute(
+                        "UPDATE disasters SET is_active = ?, updated_block = ? WHERE disaster_hash = ?",
+                        (1 if args["isActive"] else 0, block, disaster_hash),
+                    )
+                applied.append((name, disaster_hash))
+            self._db.execute(
+                "INSERT INTO checkpoint (name, block) VALUES ('godshand', ?) "
+                "ON CONFLICT(name) DO UPDATE SET block = excluded.block",
+                (checkpoint_block,),
+            )
+        self.logs_applied += len(applied)
+        if self.on_event:
+            for name, disaster_hash in applied:
+                self.on_event(name, disaster_hash)
+
+    # --- Reads ---
+
+    def is_synced(self):
+        """True once backfill finished and the follower polled recently"""
+        return (self.backfill_done and self.last_poll_at is not None
+                and time.time() - self.last_poll_at < 3 * self.poll_seconds + 10)
+
+    def get_details(self, disaster_hash):
+        """
+        Row for the hash in the same tuple shape as getDisasterDetails, or None.
+        metadata and timestamp are not part of the events and come back empty.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT title, target_amount, total_donated, creator, is_active FROM disasters "
+                "WHERE disaster_hash = ?", (_hex(disaster_hash),)
+            ).fetchone()
+        if not row:
+            return None
+        title, target_amount, total_donated, creator, is_active = row
+        return (title, "", int(target_amount), int(total_donated), creator, 0, bool(is_active))
+
+    def list_disasters(self, offset=0, limit=50):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT disaster_hash, title, target_amount, total_donated, is_active FROM disasters "
+                "ORDER BY created_block, rowid LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+            total = self._db.execute("SELECT COUNT(*) FROM disasters").fetchone()[0]
+        return total, [
+            {"disaster_hash": h, "title": t, "target_amount": int(ta), "total_donated": int(td), "is_active": bool(a)}
+            for h, t, ta, td, a in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            disasters = self._db.execute("SELECT COUNT(*) FROM disasters").fetchone()[0]
+            donations = self._db.execute("SELECT COUNT(*) FROM donations").fetchone()[0]
+        checkpoint = self.checkpoint()
+        return {
+            "start_block": self.start_block,
+            "checkpoint_block": checkpoint,
+            "head_block": self.head_block,
+            "lag_blocks": (self.head_block - checkpoint) if self.head_block is not None else None,
+            "backfill_done": self.backfill_done,
+            "synced": self.is_synced(),
+            "disasters": disasters,
+            "donations": donations,
+            "logs_applied": self.logs_applied,
+        }
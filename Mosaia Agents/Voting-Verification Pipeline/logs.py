@@ -0,0 +1,148 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Prompts and agent replies are logged in full only at DEBUG. At INFO this
+# share of them is logged, cut to LOG_PAYLOAD_MAX_CHARS.
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+# ID of the unit of work being logged: an HTTP request in the verification
+# service, a disaster flow in the creation pipeline
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_exception_formatter = logging.Formatter()
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields become top-level keys"""
+
+    converter = time.gmtime
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s [%(levelname)s] %(name)s %(request_id)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS}
+        return f"{line} {json.dumps(fields, default=str, ensure_ascii=False)}" if fields else line
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a QueueListener thread, which formats and writes them.
+    The calling thread only merges the message args, stamps the request ID
+    and enqueues; when the queue is full the record is dropped, not waited on.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._lock_counters = threading.Lock()
+        self.counters = {"records": 0, "dropped": 0}
+        self.enqueue_seconds = 0.0
+
+    def prepare(self, record):
+        record.request_id = getattr(record, "request_id", None) or request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames of the calling thread, so render them here
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_counters:
+                self.counters["dropped"] += 1
+
+    def emit(self, record):
+        started = time.perf_counter()
+        super().emit(record)
+        with self._lock_counters:
+            self.counters["records"] += 1
+            self.enqueue_seconds += time.perf_counter() - started
+
+
+_handler = None
+_listener = None
+
+
+def configure_logging():
+    """Route the root logger through the non-blocking queue; safe to call more than once"""
+    global _handler, _listener
+    if _handler is not None:
+        return
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    _handler = NonBlockingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def truncate(text, limit=None):
+    limit = LOG_PAYLOAD_MAX_CHARS if limit is None else limit
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def log_payload(logger, message, payload, **fields):
+    """Log a prompt or agent reply: always at DEBUG, sampled and truncated at INFO"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, extra={"payload": payload, **fields})
+    elif LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE and logger.isEnabledFor(logging.INFO):
+        logger.info(message, extra={"payload": truncate(payload), "sampled": True, **fields})
+
+
+def logging_stats():
+    if _handler is None:
+        return {"configured": False}
+    with _handler._lock_counters:
+        records = _handler.counters["records"]
+        stats = {**_handler.counters, "enqueue_seconds": _handler.enqueue_seconds}
+    return {
+        "level": LOG_LEVEL,
+        "format": LOG_FORMAT,
+        **stats,
+        "queue_depth": _handler.queue.qsize(),
+        "avg_enqueue_us": round(stats["enqueue_seconds"] / records * 1e6, 2) if records else None,
+    }
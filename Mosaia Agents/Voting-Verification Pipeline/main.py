@@ -1,26 +1,44 @@
+import time
+_import_started = time.perf_counter()  # Start of the startup-time breakdown
 import os
 import requests
-import traceback
+import logging
 import re
 import asyncio
 import threading
-import time
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from web3 import Web3
-from openai import OpenAI
 from decimal import Decimal
+from typing import Optional
 from botocore.exceptions import ClientError
-import json
-import yaml
-import boto3
 from pyngrok import ngrok
+from clients import get_async_agent_client, get_web3, get_dynamodb, client_stats
+from disaster_cache import DisasterCache, DisasterEventWatcher, normalize_hash
+from indexer import ChainIndexer, INDEXER_ENABLED
+from disaster_geo import DisasterGeoIndex, point_bbox
+from multicall import get_disaster_details_batch
+from tx_submitter import TransactionSubmitter
+from payout_batcher import PayoutBatcher, PAYOUT_BATCH_MODE
+from approval_jobs import ApprovalJobQueue, INTERRUPTED_ERROR
+from completion_cache import CompletionCache
+from agent_parser import parse_agent_response
+from singleflight import SingleFlight
+from metrics import observe_parse, render_metrics
+from logs import configure_logging, log_payload, logging_stats, request_id_var, truncate
+from backends import Backends, BackendUnavailable
 
 # Load env
 load_dotenv()
-AGENT_API_KEY = os.getenv("verifyagent")
+configure_logging()
+logger = logging.getLogger("verification")
 NGROK_AUTHTOKEN = os.getenv("ngrok")
 
 # Config
@@ -28,24 +46,81 @@ RPC_URL = os.getenv("SEPOLIA_RPC_URL")
 if not RPC_URL:
     raise Exception("SEPOLIA_RPC_URL environment variable is required")
 CONTRACT_ADDRESS = os.getenv("ETH_CONTRACT_ADDRESS")  # You'll need to set this environment variable
+GODSLITE_ADDRESS = "0x07f9BFEb19F1ac572f6D69271261dDA1fD378D9A"
+USDC_ADDRESS = os.getenv("USDC_ADDRESS", "0x1c7D4B196Cb0C7B01d743Fbc6116a902379C7238")  # Sepolia USDC
+# "indexer" serves disaster reads from the local chain index once it is synced, "rpc" always asks the node
+DISASTER_READ_SOURCE = os.getenv("DISASTER_READ_SOURCE", "rpc").lower()
+
+# Whether to start initializing every backend as soon as the app starts (they are lazy either way)
+WARM_ON_STARTUP = os.getenv("WARM_ON_STARTUP", "true").lower() == "true"
+VOTING_ENABLED = bool(os.getenv("AWS_REGION") and os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"))
+
+# Nothing slow happens at import time: the RPC wallet, DynamoDB, the event
+# watcher and the ngrok tunnel are backends that initialize in parallel in
+# the lifespan (and on first use), see backends.py
+backends = Backends()
+startup_timings = {}
+
+@asynccontextmanager
+async def lifespan(app):
+    startup_timings["import_seconds"] = round(_app_imported - _import_started, 3)
+    startup_timings["lifespan_started_seconds"] = round(time.perf_counter() - _import_started, 3)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+    )
+    warm_up = asyncio.ensure_future(backends.warm_all()) if WARM_ON_STARTUP else None
+    yield
+    if warm_up:
+        warm_up.cancel()
+    await asyncio.to_thread(stop_background_workers)
 
 # Init
-app = FastAPI()
-client = OpenAI(base_url="https://api.mosaia.ai/v1/agent", api_key=AGENT_API_KEY)
+# Handlers are async: agent calls use AsyncOpenAI and every blocking web3 /
+# boto3 call is pushed to a worker thread with asyncio.to_thread, so a slow
+# approval never stalls the event loop (and with it /health).
+app = FastAPI(lifespan=lifespan)
+client = get_async_agent_client("verifyagent")
+# Disk cache of agent completions; per-agent TTLs live in completion_cache.py
+completion_cache = CompletionCache()
+# Identical requests that arrive while one is already running share its result
+fact_check_flights = SingleFlight("fact_check")
+revote_flights = SingleFlight("revote_adjustment")
+# Approved claims waiting to be paid out; /process-vote only queues them
+approval_jobs = ApprovalJobQueue()
+
+# Threads available to asyncio.to_thread; each in-flight web3/boto3 call holds one
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "64"))
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tag every log record of a request with its X-Request-ID (generated if absent)"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        logger.debug("request finished", extra={
+            "method": request.method, "path": request.url.path, "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+        return response
+    finally:
+        request_id_var.reset(token)
 
 # Start ngrok tunnel on port 8000 when app starts
 def start_ngrok():
     if NGROK_AUTHTOKEN:
         ngrok.set_auth_token(NGROK_AUTHTOKEN)
     public_url = ngrok.connect(8000, "http")
-    print(f"[NGROK] Tunnel started: {public_url.public_url}")
+    logger.info("ngrok tunnel started", extra={"public_url": public_url.public_url})
     return public_url.public_url
 
 ngrok_url = None
-try:
+
+def init_ngrok():
+    global ngrok_url
     ngrok_url = start_ngrok()
-except Exception as e:
-    print(f"[NGROK] Failed to start ngrok tunnel: {e}")
 
 # ABI for the new godslite contract
 CONTRACT_ABI = [
@@ -70,6 +145,13 @@ CONTRACT_ABI = [
         "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
         "stateMutability": "view",
         "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "getAllDisasterHashes",
+        "outputs": [{"internalType": "bytes32[]", "name": "", "type": "bytes32[]"}],
+        "stateMutability": "view",
+        "type": "function"
     }
 ]
 
@@ -77,150 +159,78 @@ CONTRACT_ABI = [
 class FactCheckInput(BaseModel):
     statement: str
     disaster_hash: str
+    bypass_cache: bool = False
 
-# === Utility: Parse agent response ===
-def parse_agent_response(response_text):
-    """
-    Parse agent response that could be in JSON, YAML, or custom format
-    """
-    print(f"[INFO] Attempting to parse response: {response_text[:200]}...")
-    
-    # First try JSON
-    try:
-        result = json.loads(response_text)
-        print("[INFO] Successfully parsed as JSON")
-        return result
-    except json.JSONDecodeError:
-        print("[INFO] Not valid JSON, trying YAML...")
-    
-    # Try YAML
-    try:
-        result = yaml.safe_load(response_text)
-        if isinstance(result, dict):
-            print("[INFO] Successfully parsed as YAML")
-            return result
-    except yaml.YAMLError:
-        print("[INFO] Not valid YAML, trying custom parsing...")
-    
-    # Try custom parsing for key: value format
-    try:
-        result = {}
-        lines = response_text.strip().split('\n')
-        current_key = None
-        current_value = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check if line contains a colon (key: value format)
-            if ':' in line and not line.startswith(' '):
-                # Save previous key-value pair
-                if current_key:
-                    value = '\n'.join(current_value).strip()
-                    # Try to convert to appropriate type
-                    if value.isdigit():
-                        result[current_key] = int(value)
-                    elif value.replace('.', '').isdigit():
-                        result[current_key] = float(value)
-                    elif value.lower() in ['true', 'false']:
-                        result[current_key] = value.lower() == 'true'
-                    else:
-                        result[current_key] = value
-                
-                # Start new key-value pair
-                parts = line.split(':', 1)
-                current_key = parts[0].strip()
-                current_value = [parts[1].strip()] if len(parts) > 1 and parts[1].strip() else []
-            else:
-                # Continuation of previous value
-                if current_key:
-                    current_value.append(line)
-        
-        # Save last key-value pair
-        if current_key:
-            value = '\n'.join(current_value).strip()
-            if value.isdigit():
-                result[current_key] = int(value)
-            elif value.replace('.', '').isdigit():
-                result[current_key] = float(value)
-            elif value.lower() in ['true', 'false']:
-                result[current_key] = value.lower() == 'true'
-            else:
-                result[current_key] = value
-        
-        if result:
-            print(f"[INFO] Successfully parsed with custom parser: {result}")
-            return result
-            
-    except Exception as e:
-        print(f"[ERROR] Custom parsing failed: {e}")
-    
-    # Try regex parsing as fallback
-    try:
-        result = {}
-        
-        # Extract amount
-        amount_match = re.search(r'amount:\s*(\d+(?:\.\d+)?)', response_text, re.IGNORECASE)
-        if amount_match:
-            result['amount'] = float(amount_match.group(1))
-        
-        # Extract reasoning/comment
-        reasoning_match = re.search(r'reasoning:\s*(.+?)(?=\n\w+:|$)', response_text, re.IGNORECASE | re.DOTALL)
-        if reasoning_match:
-            result['reasoning'] = reasoning_match.group(1).strip()
-        
-        comment_match = re.search(r'comment:\s*(.+?)(?=\n\w+:|$)', response_text, re.IGNORECASE | re.DOTALL)
-        if comment_match:
-            result['comment'] = comment_match.group(1).strip()
-        
-        # Extract sources
-        sources_match = re.search(r'sources?:\s*(.+?)(?=\n\w+:|$)', response_text, re.IGNORECASE | re.DOTALL)
-        if sources_match:
-            sources_text = sources_match.group(1).strip()
-            # Split by common delimiters
-            sources = [s.strip() for s in re.split(r'[,;\n]', sources_text) if s.strip()]
-            result['sources'] = sources
-        
-        if result:
-            print(f"[INFO] Successfully parsed with regex: {result}")
-            return result
-            
-    except Exception as e:
-        print(f"[ERROR] Regex parsing failed: {e}")
-    
-    # If all parsing methods fail, return a default structure
-    print("[WARN] All parsing methods failed, returning default structure")
-    return {
-        "amount": None,
-        "comment": response_text,
-        "sources": [],
-        "raw_response": response_text
-    }
+# === Cache of getDisasterDetails results, invalidated by contract events ===
+disaster_cache = DisasterCache()
+disaster_event_watcher = None
+chain_indexer = None
+# Grid of active disaster bboxes, started by the disaster_geo backend
+disaster_geo_index = None
+
+def note_disaster_event(name, disaster_hash):
+    if disaster_geo_index:
+        disaster_geo_index.note_event(name, disaster_hash)
+
+def init_event_watcher():
+    """Until this is up the disaster cache relies on its TTL only"""
+    global disaster_event_watcher, chain_indexer
+    contract_address = CONTRACT_ADDRESS or GODSLITE_ADDRESS
+    if INDEXER_ENABLED:
+        # The indexer sees every contract event, so it also drives cache invalidation
+        def on_event(name, disaster_hash):
+            disaster_cache.invalidate(disaster_hash)
+            note_disaster_event(name, disaster_hash)
+        chain_indexer = ChainIndexer(get_web3(RPC_URL), contract_address, on_event=on_event)
+        chain_indexer.start()
+    else:
+        disaster_event_watcher = DisasterEventWatcher(
+            get_web3(RPC_URL), contract_address, disaster_cache, on_event=note_disaster_event
+        )
+        disaster_event_watcher.start()
+
+def check_disasters_active(disaster_hashes):
+    """{hash: is active} from the local index when synced, the rest through Multicall3"""
+    details_by_hash = {}
+    if DISASTER_READ_SOURCE == "indexer" and chain_indexer and chain_indexer.is_synced():
+        details_by_hash = {h: chain_indexer.get_details(h) for h in disaster_hashes}
+    missing = [h for h in disaster_hashes if not details_by_hash.get(h)]
+    if missing:
+        fetched, _ = get_disaster_details_batch(get_web3(RPC_URL), CONTRACT_ADDRESS or GODSLITE_ADDRESS, missing)
+        details_by_hash.update(fetched)
+    return {h: bool(d and d[0] and d[6]) for h, d in details_by_hash.items()}
+
+def init_disaster_geo():
+    """Loads every event row once, then follows new rows and status changes in the background"""
+    global disaster_geo_index
+    index = DisasterGeoIndex(get_dynamodb().Table("gods-hand-events"), check_disasters_active)
+    index.refresh()
+    index.start()
+    disaster_geo_index = index
+
+def fetch_disaster_details(disaster_hash: str, contract):
+    """getDisasterDetails for the hash, served from the local index or the cache when fresh"""
+    key = normalize_hash(disaster_hash)
+    if DISASTER_READ_SOURCE == "indexer" and chain_indexer and chain_indexer.is_synced():
+        details = chain_indexer.get_details(key)
+        if details:
+            return details
+
+    def load(key):
+        logger.debug("Fetching disaster details", extra={"disaster_hash": key})
+        return contract.functions.getDisasterDetails(bytes.fromhex(key)).call()
+    return disaster_cache.get_or_load(key, load)
 
 # === Utility: Get disaster information from Ethereum contract ===
 def get_disaster_info(disaster_hash: str):
     try:
-        print("[INFO] Connecting to Ethereum Sepolia...")
-        web3 = Web3(Web3.HTTPProvider(RPC_URL))
-        if not web3.is_connected():
-            raise Exception("Cannot connect to Ethereum Sepolia")
-
+        web3 = get_web3(RPC_URL)
         contract = web3.eth.contract(
             address=Web3.to_checksum_address(CONTRACT_ADDRESS),
             abi=CONTRACT_ABI
         )
 
-        if disaster_hash.startswith("0x"):
-            disaster_hash = disaster_hash[2:]
-        if len(disaster_hash) != 64:
-            raise Exception("Invalid disaster_hash length")
-
-        disaster_bytes = bytes.fromhex(disaster_hash)
-
-        print("[INFO] Fetching disaster details...")
-        details = contract.functions.getDisasterDetails(disaster_bytes).call()
+        details = fetch_disaster_details(disaster_hash, contract)
         
         # Check if disaster exists and is active
         if not details[0]:  # title is empty
@@ -237,9 +247,9 @@ def get_disaster_info(disaster_hash: str):
         target_amount = float(target_amount_usdc) / 1_000_000
         total_donated = float(total_donated_usdc) / 1_000_000
         
-        print(f"[INFO] Disaster: {title}")
-        print(f"[INFO] Target Amount: ${target_amount:.2f} USDC")
-        print(f"[INFO] Total Donated: ${total_donated:.2f} USDC")
+        logger.info("Disaster details", extra={
+            "title": title, "target_amount_usdc": target_amount, "total_donated_usdc": total_donated,
+        })
 
         return {
             "title": title,
@@ -248,92 +258,351 @@ def get_disaster_info(disaster_hash: str):
             "funding_progress": (total_donated / target_amount * 100) if target_amount > 0 else 0
         }
     except Exception as e:
-        print(f"[ERROR] get_disaster_info: {e}")
-        traceback.print_exc()
+        logger.exception("get_disaster_info failed")
         raise HTTPException(status_code=400, detail=str(e))
 
 
 
+# === Endpoint: /disasters ===
+def disaster_summary(disaster_hash: str, target_amount_raw: int, total_donated_raw: int, title: str, is_active: bool):
+    # Amounts are USDC with 6 decimals, same as get_disaster_info
+    target_amount = float(target_amount_raw) / 1_000_000
+    total_donated = float(total_donated_raw) / 1_000_000
+    return {
+        "disaster_hash": "0x" + disaster_hash,
+        "title": title,
+        "target_amount_usdc": target_amount,
+        "total_donated_usdc": total_donated,
+        "funding_progress": (total_donated / target_amount * 100) if target_amount > 0 else 0,
+        "is_active": is_active
+    }
+
+@app.get("/disasters")
+def list_disasters(offset: int = 0, limit: int = 50):
+    """
+    List disasters with title, target, donated and progress. Reads come from
+    the local index when it is the configured source, otherwise from one
+    getAllDisasterHashes call plus one Multicall3 call per page chunk.
+    """
+    if offset < 0 or not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 500")
+    try:
+        if DISASTER_READ_SOURCE == "indexer" and chain_indexer and chain_indexer.is_synced():
+            total, rows = chain_indexer.list_disasters(offset, limit)
+            disasters = [
+                disaster_summary(r["disaster_hash"], r["target_amount"], r["total_donated"], r["title"], r["is_active"])
+                for r in rows
+            ]
+            return {"total": total, "offset": offset, "limit": limit, "source": "indexer",
+                    "rpc_round_trips": 0, "disasters": disasters}
+
+        web3 = get_web3(RPC_URL)
+        contract_address = CONTRACT_ADDRESS or GODSLITE_ADDRESS
+        contract = web3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=CONTRACT_ABI)
+        all_hashes = [normalize_hash(h.hex()) for h in contract.functions.getAllDisasterHashes().call()]
+        page = all_hashes[offset:offset + limit]
+        details_by_hash, round_trips = get_disaster_details_batch(web3, contract_address, page)
+
+        disasters = []
+        for disaster_hash in page:
+            details = details_by_hash.get(disaster_hash)
+            if details is None:
+                continue
+            disaster_cache.put(disaster_hash, details)
+            disasters.append(disaster_summary(disaster_hash, details[2], details[3], details[0], details[6]))
+        return {"total": len(all_hashes), "offset": offset, "limit": limit, "source": "rpc",
+                "rpc_round_trips": 1 + round_trips, "disasters": disasters}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("list_disasters failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# === Endpoint: /disasters/nearby ===
+@app.get("/disasters/nearby")
+async def nearby_disasters(lat: Optional[float] = None, lon: Optional[float] = None, radius_km: float = 0.0,
+                           min_lat: Optional[float] = None, min_lon: Optional[float] = None,
+                           max_lat: Optional[float] = None, max_lon: Optional[float] = None):
+    """
+    Active disasters whose bbox contains a point (lat, lon, optionally widened
+    by radius_km) or overlaps a bbox (min/max lat/lon; min_lon > max_lon
+    crosses the antimeridian). Answered from the in-memory grid, not DynamoDB.
+    """
+    if lat is not None and lon is not None:
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 <= radius_km <= 5000):
+            raise HTTPException(status_code=400, detail="lat, lon or radius_km out of range")
+        bbox = point_bbox(lat, lon, radius_km)
+    elif None not in (min_lat, min_lon, max_lat, max_lon):
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+            raise HTTPException(status_code=400, detail="bbox out of range")
+        bbox = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon}
+    else:
+        raise HTTPException(status_code=400, detail="Pass lat and lon, or min_lat, min_lon, max_lat and max_lon")
+    if not VOTING_ENABLED:
+        raise HTTPException(status_code=503, detail="Disaster events are not available. Please check configuration.")
+    await require_backends("disaster_geo")
+    started = time.perf_counter()
+    disasters = disaster_geo_index.query(bbox)
+    return {"count": len(disasters), "query_us": round((time.perf_counter() - started) * 1e6, 1),
+            "bbox": bbox, "disasters": disasters}
+
+# === Fact-check helpers shared by /fact-check and /fact-check/stream ===
+FACT_CHECK_MODEL = "686656aaf14ab5c885e431ce"
+
+def fact_check_prompt(statement: str, disaster_info: dict):
+    return (
+        f"Petition: {statement}\n"
+        f"Disaster: {disaster_info['title']}\n"
+        f"Target Amount: ${disaster_info['target_amount_usdc']:.2f} USDC\n"
+        f"Total Donated: ${disaster_info['total_donated_usdc']:.2f} USDC\n"
+        f"Funding Progress: {disaster_info['funding_progress']:.1f}%\n"
+        "Based on the petition and the current funding status, decide how much should be allocated from the donated funds. "
+        "Respond with the amount to allocate, a brief reasoning, and a single source which shows that the NGO performed the work."
+    )
+
+def fact_check_context(disaster_info: dict):
+    return {
+        "disaster_title": disaster_info["title"],
+        "target_amount_usdc": disaster_info["target_amount_usdc"],
+        "total_donated_usdc": disaster_info["total_donated_usdc"],
+        "funding_progress": disaster_info["funding_progress"],
+    }
+
+def finalize_fact_check(response_text: str, disaster_info: dict):
+    """Turn the raw agent reply into the /fact-check response body"""
+    # Parse the response using the robust parser
+    with observe_parse("agent_response"):
+        result = parse_agent_response(response_text)
+
+    # Extract values with fallbacks
+    amount = result.get("amount")
+    comment = (result.get("comment") or 
+              result.get("reasoning") or 
+              result.get("response") or 
+              "No comment available")
+    sources = result.get("sources", [])
+    
+    # Ensure sources is a list
+    if isinstance(sources, str):
+        sources = [sources]
+    elif not isinstance(sources, list):
+        sources = []
+
+    # Clean up amount: remove $ and USD and keep only the number
+    if isinstance(amount, str):
+        cleaned = amount.replace("$", "").replace(",", "").replace("USD", "").strip()
+        try:
+            amount = float(re.findall(r"[\d.]+", cleaned)[0])
+        except Exception:
+            amount = None
+
+    return {
+        "amount": amount,
+        "comment": comment,
+        "sources": sources,
+        **fact_check_context(disaster_info),
+        "raw_agent_response": response_text  # Include raw response for debugging
+    }
+
+def sse_event(event: str, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # === Endpoint: /fact-check ===
 @app.post("/fact-check")
-def fact_check(data: FactCheckInput):
+async def fact_check(data: FactCheckInput):
+    try:
+        disaster_hash = normalize_hash(data.disaster_hash)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    key = (data.statement, disaster_hash, data.bypass_cache)
+    return await fact_check_flights.do(key, lambda: run_fact_check(data))
+
+async def run_fact_check(data: FactCheckInput):
     try:
-        print(f"[INFO] Statement: {data.statement}")
-        print(f"[INFO] Disaster Hash: {data.disaster_hash}")
+        logger.info("Fact-check", extra={"disaster_hash": data.disaster_hash, "statement": truncate(data.statement)})
 
         # === Get Disaster Information from Ethereum Contract ===
-        disaster_info = get_disaster_info(data.disaster_hash)
-        total_donated = disaster_info["total_donated_usdc"]
-        target_amount = disaster_info["target_amount_usdc"]
-        funding_progress = disaster_info["funding_progress"]
+        disaster_info = await asyncio.to_thread(get_disaster_info, data.disaster_hash)
 
         # === Call Mosaia Agent with statement and USDC amounts ===
-        ai_message = (
-            f"Petition: {data.statement}\n"
-            f"Disaster: {disaster_info['title']}\n"
-            f"Target Amount: ${target_amount:.2f} USDC\n"
-            f"Total Donated: ${total_donated:.2f} USDC\n"
-            f"Funding Progress: {funding_progress:.1f}%\n"
-            "Based on the petition and the current funding status, decide how much should be allocated from the donated funds. "
-            "Respond with the amount to allocate, a brief reasoning, and a single source which shows that the NGO performed the work."
-        )
-        print("[INFO] Sending to AI:")
-        print(ai_message)
-        completion = client.chat.completions.create(
-            model="686656aaf14ab5c885e431ce",
+        ai_message = fact_check_prompt(data.statement, disaster_info)
+        log_payload(logger, "Agent prompt", ai_message, model=FACT_CHECK_MODEL)
+        response_text = (await completion_cache.complete_async(
+            client,
+            model=FACT_CHECK_MODEL,
             messages=[{"role": "user", "content": ai_message}],
-        )
-        response_text = completion.choices[0].message.content.strip()
-        print("[INFO] Raw Agent Response:")
-        print(response_text)
-
-        # Parse the response using the robust parser
-        result = parse_agent_response(response_text)
-
-        # Extract values with fallbacks
-        amount = result.get("amount")
-        comment = (result.get("comment") or 
-                  result.get("reasoning") or 
-                  result.get("response") or 
-                  "No comment available")
-        sources = result.get("sources", [])
-        
-        # Ensure sources is a list
-        if isinstance(sources, str):
-            sources = [sources]
-        elif not isinstance(sources, list):
-            sources = []
-
-        # Clean up amount: remove $ and USD and keep only the number
-        if isinstance(amount, str):
-            cleaned = amount.replace("$", "").replace(",", "").replace("USD", "").strip()
-            try:
-                amount = float(re.findall(r"[\d.]+", cleaned)[0])
-            except Exception:
-                amount = None
+            bypass=data.bypass_cache,
+        )).strip()
+        log_payload(logger, "Agent response", response_text, model=FACT_CHECK_MODEL)
 
         # === Final Response ===
-        return {
-            "amount": amount,
-            "comment": comment,
-            "sources": sources,
-            "disaster_title": disaster_info["title"],
-            "target_amount_usdc": target_amount,
-            "total_donated_usdc": total_donated,
-            "funding_progress": funding_progress,
-            "raw_agent_response": response_text  # Include raw response for debugging
-        }
+        return finalize_fact_check(response_text, disaster_info)
 
     except Exception as e:
-        print(f"[ERROR] Main exception: {e}")
-        traceback.print_exc()
+        logger.exception("Fact-check failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# === Endpoint: /fact-check/stream ===
+@app.post("/fact-check/stream")
+async def fact_check_stream(data: FactCheckInput):
+    """
+    /fact-check as Server-Sent Events: a `context` event with the on-chain
+    disaster figures as soon as they are read, `token` events while the agent
+    generates, then a `result` event with the same body /fact-check returns.
+    Failures after the stream has started arrive as an `error` event.
+    """
+    try:
+        # Read before the response starts so an unknown disaster is still a 4xx/5xx
+        disaster_info = await asyncio.to_thread(get_disaster_info, data.disaster_hash)
+    except Exception as e:
+        logger.warning("fact_check_stream could not read the disaster: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def events():
+        yield sse_event("context", fact_check_context(disaster_info))
+        try:
+            pieces = []
+            async for text in completion_cache.stream_async(
+                client,
+                model=FACT_CHECK_MODEL,
+                messages=[{"role": "user", "content": fact_check_prompt(data.statement, disaster_info)}],
+                bypass=data.bypass_cache,
+            ):
+                pieces.append(text)
+                yield sse_event("token", {"text": text})
+            yield sse_event("result", finalize_fact_check("".join(pieces).strip(), disaster_info))
+        except Exception as e:
+            logger.exception("fact_check_stream failed")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# === Transaction status endpoint ===
+@app.get("/transactions/{tx_hash}")
+def get_transaction_status(tx_hash: str):
+    """Receipt-tracker state of a payout submitted by this process"""
+    status = tx_submitter.status(tx_hash) if tx_submitter else None
+    if not status:
+        raise HTTPException(status_code=404, detail="Unknown transaction")
+    return status
+
+@app.get("/stats/transactions")
+def get_transaction_stats():
+    """Submission, confirmation and nonce-resync counters of the payout submitter"""
+    return tx_submitter.stats() if tx_submitter else {"enabled": False}
+
+# === Batched payout endpoints ===
+@app.get("/payout-batches/{batch_id}")
+def get_payout_batch(batch_id: str):
+    status = payout_batcher.batch_status(batch_id) if payout_batcher else None
+    if not status:
+        raise HTTPException(status_code=404, detail="Unknown payout batch")
+    return status
+
+@app.get("/stats/payout-batches")
+def get_payout_batch_stats():
+    """Claims per transaction and queue depth of the batched payout mode"""
+    return payout_batcher.stats() if payout_batcher else {"enabled": False}
+
+# === Approval job endpoints ===
+@app.get("/jobs/{job_id}")
+def get_approval_job(job_id: str):
+    """Status of an approval accepted by /process-vote: queued, processing, submitted, confirmed or failed"""
+    job = approval_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+@app.get("/stats/approval-jobs")
+def get_approval_job_stats():
+    """Jobs by status, queue wait and worker count of the approval queue"""
+    return approval_jobs.stats()
+
 # === Health check endpoint ===
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy", "service": "disaster-relief-fact-checker"}
 
+# === Liveness / readiness ===
+@app.get("/livez")
+async def liveness():
+    """The process is up and the event loop answers; says nothing about backends"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """503 until every required backend is initialized; lists each backend's state"""
+    ready = backends.is_ready()
+    body = {"status": "ready" if ready else "starting", "backends": backends.stats()}
+    return Response(content=json.dumps(body), media_type="application/json", status_code=200 if ready else 503)
+
+@app.get("/stats/startup")
+def get_startup_stats():
+    """Seconds spent importing, until the lifespan started and until ready, plus per-backend init time"""
+    return {
+        **startup_timings,
+        "ready_seconds": round(backends.ready_at - _import_started, 3) if backends.ready_at else None,
+        "backends": backends.stats(),
+    }
+
+# === Prometheus metrics endpoint ===
+@app.get("/metrics")
+def get_metrics():
+    """Latency histograms, error counters and in-flight gauges of every external call"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+# === Client pool stats endpoint ===
+@app.get("/stats/clients")
+def get_client_stats():
+    """Pool sizes and connection reuse of the shared agent, RPC and DynamoDB clients"""
+    return {"clients": client_stats()}
+
+# === Disaster cache stats endpoint ===
+@app.get("/stats/disaster-cache")
+def get_disaster_cache_stats():
+    """Hit/miss counters of the getDisasterDetails cache and the event watcher position"""
+    return {
+        "cache": disaster_cache.stats(),
+        "event_watcher": disaster_event_watcher.stats() if disaster_event_watcher else None,
+    }
+
+# === Logging stats endpoint ===
+@app.get("/stats/logging")
+def get_logging_stats():
+    """Records enqueued and dropped by the async log handler and the average cost per record"""
+    return logging_stats()
+
+# === Completion cache stats endpoint ===
+@app.get("/stats/completion-cache")
+def get_completion_cache_stats():
+    """Per-agent hit rate of the disk-backed completion cache"""
+    return completion_cache.stats()
+
+# === Single-flight stats endpoint ===
+@app.get("/stats/singleflight")
+def get_singleflight_stats():
+    """Requests answered by joining an identical in-flight fact-check or re-vote adjustment"""
+    return {flights.name: flights.stats() for flights in (fact_check_flights, revote_flights)}
+
+# === Disaster geo index stats endpoint ===
+@app.get("/stats/disaster-geo")
+def get_disaster_geo_stats():
+    """Active/inactive disasters in the bbox grid, refresh counters and average query time"""
+    return disaster_geo_index.stats() if disaster_geo_index else {"enabled": False}
+
+# === Chain indexer stats endpoint ===
+@app.get("/stats/indexer")
+def get_indexer_stats():
+    """Checkpoint, lag and row counts of the local GodsHand event index"""
+    if not chain_indexer:
+        return {"enabled": False}
+    return {"enabled": True, "read_source": DISASTER_READ_SOURCE, **chain_indexer.stats()}
+
 # === Test endpoint ===
 @app.get("/test-parser")
 def test_parser():
@@ -425,39 +694,55 @@ USDC_ABI = [
         ],
         "stateMutability": "view",
         "type": "function"
+    },
+    {
+        "inputs": [
+            { "internalType": "address", "name": "owner", "type": "address" },
+            { "internalType": "address", "name": "spender", "type": "address" }
+        ],
+        "name": "allowance",
+        "outputs": [
+            { "internalType": "uint256", "name": "", "type": "uint256" }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            { "internalType": "address", "name": "spender", "type": "address" },
+            { "internalType": "uint256", "name": "amount", "type": "uint256" }
+        ],
+        "name": "approve",
+        "outputs": [
+            { "internalType": "bool", "name": "", "type": "bool" }
+        ],
+        "stateMutability": "nonpayable",
+        "type": "function"
     }
 ]
 
-# DynamoDB Tables - Only initialize if required environment variables are present
+# DynamoDB Tables - initialized by the dynamodb backend when the AWS env vars are present
 dynamodb = None
 voting_table = None
 
-# Initialize DynamoDB components only if required environment variables exist
-if os.getenv("AWS_REGION") and os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
-    try:
-        dynamodb = boto3.resource(
-            "dynamodb",
-            region_name=os.getenv("AWS_REGION"),
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-        )
-        voting_table = dynamodb.Table("gods-hand-claims")
-        print("[INFO] DynamoDB components initialized successfully")
-    except Exception as e:
-        print(f"[WARN] Failed to initialize DynamoDB components: {e}")
-        print("[WARN] Voting features will be disabled")
-else:
-    print("[WARN] Missing required AWS environment variables. Voting features will be disabled.")
+def init_dynamodb():
+    global dynamodb, voting_table
+    dynamodb = get_dynamodb()
+    table = dynamodb.Table("gods-hand-claims")
+    table.load()  # DescribeTable: fails here, not on the first vote, if credentials or the table are wrong
+    voting_table = table
 
-# Web3 Setup for Ethereum Sepolia
+# Web3 Setup for Ethereum Sepolia, done by the wallet backend
 w3 = None
 account = None
 godslite_contract = None
 usdc_contract = None
+tx_submitter = None
+payout_batcher = None
 
-# Initialize Web3 components for Ethereum Sepolia
-try:
-    w3 = Web3(Web3.HTTPProvider(RPC_URL))
+def init_wallet():
+    global w3, account, godslite_contract, usdc_contract, tx_submitter
+    web3 = get_web3(RPC_URL)
     
     # Get private key from environment variable
     private_key = os.getenv("private_key")
@@ -469,28 +754,102 @@ try:
     if len(private_key) != 64:
         raise Exception(f"Invalid private key length: {len(private_key)}. Expected 64 characters.")
     
-    account = w3.eth.account.from_key(private_key)
+    # One round trip so an unreachable node shows up in /readyz
+    chain_id = web3.eth.chain_id
+    if chain_id != 11155111:
+        raise Exception(f"RPC node is on chain {chain_id}, expected Sepolia (11155111)")
+
+    wallet = web3.eth.account.from_key(private_key)
     
     # Initialize godslite contract
-    godslite_contract = w3.eth.contract(
-        address=Web3.to_checksum_address("0x07f9BFEb19F1ac572f6D69271261dDA1fD378D9A"), 
+    godslite_contract = web3.eth.contract(
+        address=Web3.to_checksum_address(GODSLITE_ADDRESS), 
         abi=GODSLITE_ABI
     )
     
     # Initialize USDC contract
-    usdc_contract = w3.eth.contract(
-        address=Web3.to_checksum_address("0x1c7D4B196Cb0C7B01d743Fbc6116a902379C7238"), 
+    usdc_contract = web3.eth.contract(
+        address=Web3.to_checksum_address(USDC_ADDRESS), 
         abi=USDC_ABI
     )
     
-    print("[INFO] Web3 components initialized successfully for Ethereum Sepolia")
-    print(f"[INFO] Using account: {account.address}")
-    print(f"[INFO] Godslite contract: 0x07f9BFEb19F1ac572f6D69271261dDA1fD378D9A")
-    print(f"[INFO] USDC contract: 0x1c7D4B196Cb0C7B01d743Fbc6116a902379C7238")
+    # Local nonces + background receipt tracking for payouts
+    submitter = TransactionSubmitter(web3, wallet, private_key, 11155111)
+    submitter.start()
+    w3, account, tx_submitter = web3, wallet, submitter
     
-except Exception as e:
-    print(f"[WARN] Failed to initialize Web3 components: {e}")
-    print("[WARN] Voting features will be disabled")
+    logger.info("Web3 components initialized successfully for Ethereum Sepolia", extra={
+        "account": account.address,
+        "godslite_contract": GODSLITE_ADDRESS,
+        "usdc_contract": USDC_ADDRESS,
+    })
+
+def init_payout_batcher():
+    global payout_batcher
+    batcher = PayoutBatcher(
+        w3, account, usdc_contract, tx_submitter, 11155111,
+        on_submitted=record_batched_payout,
+        on_final=record_payout_result,
+        on_failed=record_payout_failure
+    )
+    batcher.start()
+    payout_batcher = batcher
+
+def init_approval_jobs():
+    if approval_jobs.workers:
+        return  # Already running; recovering again would fail jobs this process is working on
+    interrupted, submitted = approval_jobs.recover()
+    # Settled on the claim first, so a failed DynamoDB write leaves the job to the next init attempt
+    for job in interrupted:
+        record_interrupted_payout(job["claim_id"])
+        approval_jobs.mark_interrupted(job["id"])
+    # Payouts a previous process sent but didn't see confirmed; a disperse tx pays several claims
+    claims_by_tx = {}
+    for job in submitted:
+        claims_by_tx.setdefault(job["tx_hash"], []).append(job["claim_id"])
+    for tx_hash, claim_ids in claims_by_tx.items():
+        callbacks = [record_payout_result(claim_id) for claim_id in claim_ids]
+        def on_final(tx_hash, status, receipt, callbacks=callbacks):
+            for callback in callbacks:
+                callback(tx_hash, status, receipt)
+        tx_submitter.track(tx_hash, on_final=on_final, meta={"claims": claim_ids})
+    approval_jobs.start(run_approval_job)
+
+def stop_background_workers():
+    approval_jobs.stop()
+    if disaster_event_watcher:
+        disaster_event_watcher.stop()
+    if chain_indexer:
+        chain_indexer.stop()
+    if disaster_geo_index:
+        disaster_geo_index.stop()
+    if payout_batcher:
+        payout_batcher.stop()
+    if tx_submitter:
+        tx_submitter.stop()
+
+backends.register("wallet", init_wallet)
+backends.register("event_watcher", init_event_watcher, required=False)
+backends.register("ngrok", init_ngrok, required=False)
+if VOTING_ENABLED:
+    backends.register("dynamodb", init_dynamodb)
+    backends.register("disaster_geo", init_disaster_geo, deps=["dynamodb"], required=False)
+    if PAYOUT_BATCH_MODE:
+        backends.register("payout_batcher", init_payout_batcher, deps=["wallet", "dynamodb"])
+    backends.register(
+        "approval_jobs", init_approval_jobs,
+        deps=["wallet", "dynamodb", *(["payout_batcher"] if PAYOUT_BATCH_MODE else [])],
+    )
+else:
+    logger.warning("Missing required AWS environment variables. Voting features will be disabled.")
+
+async def require_backends(*names):
+    """Wait for the backends a request needs; 503 with the reason if one can't start"""
+    for name in names:
+        try:
+            await backends.require(name)
+        except BackendUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
 
 # Voting Input model
 class VoteInput(BaseModel):
@@ -504,18 +863,10 @@ def get_disaster_info_from_contract(disaster_hash: str):
         if not godslite_contract:
             raise Exception("Godslite contract not initialized")
             
-        print(f"[INFO] Fetching disaster info from contract for hash: {disaster_hash}")
-        
-        # Convert disaster hash to bytes32
-        if disaster_hash.startswith("0x"):
-            disaster_hash = disaster_hash[2:]
-        if len(disaster_hash) != 64:
-            raise Exception("Invalid disaster_hash length")
+        logger.debug("Fetching disaster info from contract", extra={"disaster_hash": disaster_hash})
         
-        disaster_bytes = bytes.fromhex(disaster_hash)
-        
-        # Get disaster details from contract
-        details = godslite_contract.functions.getDisasterDetails(disaster_bytes).call()
+        # Get disaster details from contract (or the cache)
+        details = fetch_disaster_details(disaster_hash, godslite_contract)
         
         # Check if disaster exists and is active
         if not details[0]:  # title is empty
@@ -532,9 +883,9 @@ def get_disaster_info_from_contract(disaster_hash: str):
         target_amount = float(target_amount_usdc) / 1_000_000
         total_donated = float(total_donated_usdc) / 1_000_000
         
-        print(f"[INFO] Disaster: {title}")
-        print(f"[INFO] Target Amount: ${target_amount:.2f} USDC")
-        print(f"[INFO] Total Donated: ${total_donated:.2f} USDC")
+        logger.info("Disaster details", extra={
+            "title": title, "target_amount_usdc": target_amount, "total_donated_usdc": total_donated,
+        })
 
         return {
             "title": title,
@@ -543,73 +894,235 @@ def get_disaster_info_from_contract(disaster_hash: str):
             "funding_progress": (total_donated / target_amount * 100) if target_amount > 0 else 0
         }
     except Exception as e:
-        print(f"[ERROR] get_disaster_info_from_contract: {e}")
-        traceback.print_exc()
+        logger.exception("get_disaster_info_from_contract failed")
         raise HTTPException(status_code=400, detail=str(e))
 
 # Helper: Send USDC from controlled wallet to recipient
-def send_usdc_to_recipient(recipient_address: str, amount_usdc: float):
-    """Send USDC from the controlled wallet to the recipient"""
+def send_usdc_to_recipient(recipient_address: str, amount_usdc: float, on_final=None):
+    """
+    Submit a USDC transfer from the controlled wallet to the recipient and
+    return its tx hash without waiting for the receipt. on_final(tx_hash,
+    status, receipt) is called by the receipt tracker once the tx is final.
+    """
     try:
-        if not usdc_contract or not account:
+        if not usdc_contract or not account or not tx_submitter:
             raise Exception("USDC contract or account not initialized")
             
-        print(f"[INFO] Sending {amount_usdc} USDC to {recipient_address}")
-        
         # Convert USDC amount to wei (USDC has 6 decimals)
         amount_wei = int(amount_usdc * 1_000_000)
         
-        # Check wallet balance
+        # Check wallet balance, minus what in-flight payouts will still take out
         wallet_balance = usdc_contract.functions.balanceOf(account.address).call()
-        wallet_balance_usdc = float(wallet_balance) / 1_000_000
+        available = wallet_balance - tx_submitter.reserved()
+        available_usdc = float(available) / 1_000_000
+        
+        if amount_wei > available:
+            raise Exception(f"Insufficient USDC balance. Required: {amount_usdc}, Available: {available_usdc}")
         
-        print(f"[INFO] Wallet balance: {wallet_balance_usdc:.2f} USDC")
+        # Build USDC transfer transaction with a locally allocated nonce
+        def build_tx(nonce):
+            return usdc_contract.functions.transfer(
+                Web3.to_checksum_address(recipient_address), 
+                amount_wei
+            ).build_transaction({
+                'from': account.address,
+                'chainId': 11155111,  # Sepolia chain ID
+                'nonce': nonce,
+                'gas': 100000,  # Standard gas for ERC20 transfer
+                'gasPrice': w3.to_wei('20', 'gwei')  # Higher gas price for Sepolia
+            })
         
-        if amount_wei > wallet_balance:
-            raise Exception(f"Insufficient USDC balance. Required: {amount_usdc}, Available: {wallet_balance_usdc}")
+        tx_hash = tx_submitter.submit(
+            build_tx,
+            reserved_amount=amount_wei,
+            on_final=on_final,
+            meta={"recipient": recipient_address, "amount_usdc": str(amount_usdc)}
+        )
         
-        # Build USDC transfer transaction
-        nonce = w3.eth.get_transaction_count(account.address)
-        tx = usdc_contract.functions.transfer(
-            Web3.to_checksum_address(recipient_address), 
-            amount_wei
-        ).build_transaction({
-            'from': account.address,
-            'chainId': 11155111,  # Sepolia chain ID
-        'nonce': nonce,
-            'gas': 100000,  # Standard gas for ERC20 transfer
-            'gasPrice': w3.to_wei('20', 'gwei')  # Higher gas price for Sepolia
+        logger.info("USDC transfer submitted", extra={
+            "recipient": recipient_address, "amount_usdc": amount_usdc, "tx_hash": tx_hash,
+            "available_usdc": available_usdc,
         })
         
-        # Sign and send transaction
-        signed_tx = w3.eth.account.sign_transaction(tx, private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        return tx_hash
         
-        print(f"[INFO] ✅ USDC transfer successful!")
-        print(f"[INFO] Transaction Hash: {tx_hash.hex()}")
-        print(f"[INFO] Block Number: {receipt.blockNumber}")
+    except Exception as e:
+        logger.exception("send_usdc_to_recipient failed")
+        raise HTTPException(status_code=500, detail=f"USDC transfer failed: {str(e)}")
+
+# payout_status values after which no USDC can have left the wallet for the claim
+PAYOUT_RETRYABLE_STATUSES = ("failed", "dropped")
+
+def record_payout_result(claim_id: str):
+    """on_final callback that stores the confirmation outcome on the claim and its approval job"""
+    def on_final(tx_hash, status, receipt):
+        job_id = approval_jobs.job_for_claim(claim_id)
+        if job_id:
+            approval_jobs.mark_final(
+                job_id, "confirmed" if status == "confirmed" else "failed",
+                error=None if status == "confirmed" else f"Payout tx {status}",
+                block_number=receipt.blockNumber if receipt is not None else None,
+            )
+        voting_table.update_item(
+            Key={"id": claim_id},
+            UpdateExpression="SET payout_status = :p, payout_block = :b",
+            ExpressionAttributeValues={
+                ":p": status,
+                ":b": receipt.blockNumber if receipt is not None else None
+            }
+        )
+    return on_final
+
+def record_batched_payout(claim_id: str, tx_hash: str, batch_id: str):
+    """Store the tx hash of a batched payout on the claim once it is sent"""
+    job_id = approval_jobs.job_for_claim(claim_id)
+    if job_id:
+        approval_jobs.mark_submitted(job_id, tx_hash, batch_id=batch_id)
+    voting_table.update_item(
+        Key={"id": claim_id},
+        UpdateExpression="SET claims_hash = :h, payout_status = :p, payout_batch = :b",
+        ExpressionAttributeValues={":h": tx_hash, ":p": "pending", ":b": batch_id}
+    )
+
+def record_payout_failure(claim_id: str, error: Exception):
+    job_id = approval_jobs.job_for_claim(claim_id)
+    if job_id:
+        approval_jobs.mark_final(job_id, "failed", error=getattr(error, "detail", None) or str(error))
+    voting_table.update_item(
+        Key={"id": claim_id},
+        UpdateExpression="SET payout_status = :p, payout_error = :e",
+        ExpressionAttributeValues={":p": "failed", ":e": str(error)}
+    )
+
+def record_interrupted_payout(claim_id: str):
+    """
+    A restart cut off the claim's payout mid-send (or dropped it from an in-memory
+    batch). Whether USDC went out is unknown, so the claim is kept approved with a
+    payout_status that /process-vote won't pay again until someone has checked.
+    """
+    voting_table.update_item(
+        Key={"id": claim_id},
+        UpdateExpression="SET claim_state = :s, payout_status = :p, payout_error = :e REMOVE payout_batch",
+        ExpressionAttributeValues={":s": "approved", ":p": "interrupted", ":e": INTERRUPTED_ERROR}
+    )
+
+def record_approval(claim_id: str, expression: str, values: dict):
+    """Mark the claim approved once its payout is underway; the payout stands even if this write fails"""
+    try:
+        voting_table.update_item(
+            Key={"id": claim_id},
+            UpdateExpression=expression,
+            ExpressionAttributeValues=values
+        )
+    except ClientError:
+        logger.exception("Recording the approval of claim %s failed", claim_id)
+
+def run_approval_job(job: dict):
+    """Pay out one approved claim (approval job worker thread)"""
+    claim_id, org_address = job["claim_id"], job["recipient"]
+    claimed_amount_usdc = Decimal(job["amount_usdc"])
+
+    if payout_batcher:
+        # Batched mode: the tx hash is written to the claim (and the job) when the batch is flushed.
+        # The claim is marked queued before enqueue(): a full batch can flush (and record the
+        # payout as pending or failed) before enqueue() even returns.
+        record_approval(
+            claim_id, "SET claim_state = :s, payout_status = :p REMOVE payout_batch",
+            {":s": "approved", ":p": "queued"}
+        )
+        batch_id = payout_batcher.enqueue(claim_id, org_address, claimed_amount_usdc)
+        approval_jobs.mark_batched(job["id"], batch_id)
+        # Only while still queued; once flushed, record_batched_payout has written the batch itself
+        try:
+            voting_table.update_item(
+                Key={"id": claim_id},
+                UpdateExpression="SET payout_batch = :b",
+                ConditionExpression="payout_status = :p",
+                ExpressionAttributeValues={":b": batch_id, ":p": "queued"}
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                logger.exception("Recording the payout batch of claim %s failed", claim_id)
+        return
+
+    # Send USDC directly to the organization; confirmation is tracked in the background
+    try:
+        tx_hash = send_usdc_to_recipient(org_address, claimed_amount_usdc, on_final=record_payout_result(claim_id))
+    except Exception as e:
+        record_payout_failure(claim_id, e)
+        return
+    approval_jobs.mark_submitted(job["id"], tx_hash)
+
+    # Update DB with approved status and transaction hash
+    record_approval(claim_id, "SET claim_state = :s, claims_hash = :h", {":s": "approved", ":h": tx_hash})
+
+async def adjust_claimed_amount(claim_id: str, vote_result: str, item: dict):
+    """Ask the agent for a revised amount and send the claim back for re-voting"""
+    try:
+        reason = item.get("reason", "")
+        claimed_amount = item.get("claimed_amount", 0)
+
+        # Use AI to determine the new amount based on context
+        prompt = (
+            f"The organization has requested {claimed_amount} USDC as relief funds. "
+            f"The reason they provided is: '{reason}'. "
+            f"Voters believe the amount should be '{vote_result}'. "
+            f"Please analyze the request and suggest a revised amount in USDC. "
+            f"Consider the reason provided and whether the amount should be increased or decreased. "
+            f"Respond with just the new amount as a number."
+        )
+
+        response_content = (await completion_cache.complete_async(
+            client,
+            model="6866646ff14ab5c885e4386d",
+            messages=[{"role": "user", "content": prompt}],
+        )).strip()
+        
+        # Extract the number from AI response
+        new_amount = int("".join(filter(str.isdigit, response_content)))
+        
+        # Ensure minimum amount of 1 USDC
+        if new_amount < 1:
+            new_amount = 1
+            logger.info("AI suggested amount too low, adjusted to the 1 USDC minimum")
+
+        logger.info("AI suggested new amount", extra={
+            "claim_id": claim_id, "new_amount": new_amount, "previous_amount": claimed_amount,
+        })
+
+        # Update DB with new amount and send back for re-voting
+        await asyncio.to_thread(
+            voting_table.update_item,
+            Key={"id": claim_id},
+            UpdateExpression="SET claim_state = :s, claimed_amount = :a",
+            ExpressionAttributeValues={
+                ":s": "voting",
+                ":a": new_amount
+            }
+        )
         
-        return tx_hash.hex(), receipt.blockNumber
+        return {
+            "status": "🔁 Claim sent back for re-voting with updated amount.",
+            "newAmount": new_amount,
+            "previousAmount": claimed_amount,
+            "aiReasoning": "AI analyzed the request and suggested adjustment based on context"
+        }
         
     except Exception as e:
-        print(f"[ERROR] send_usdc_to_recipient: {e}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"USDC transfer failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"AI adjustment failed: {str(e)}")
 
 @app.post("/process-vote/")
 async def process_vote(vote: VoteInput):
-    # Check if DynamoDB is available
-    if not voting_table:
+    # Check if DynamoDB is configured
+    if not VOTING_ENABLED:
         raise HTTPException(status_code=503, detail="Voting system is not available. Please check configuration.")
     
-    # Check if Web3 components are available
-    if not w3 or not account or not godslite_contract or not usdc_contract:
-        raise HTTPException(status_code=503, detail="Blockchain components are not available. Please check configuration.")
+    # Wait for DynamoDB, the wallet and the approval queue if they are still starting (or retry them if they failed)
+    await require_backends("dynamodb", "wallet", "approval_jobs")
     
     # Step 1: Get item from DynamoDB
     try:
-        response = voting_table.get_item(Key={"id": vote.uuid})
+        response = await asyncio.to_thread(voting_table.get_item, Key={"id": vote.uuid})
         item = response.get("Item")
         if not item:
             raise HTTPException(status_code=404, detail="UUID not found in DB.")
@@ -619,6 +1132,11 @@ async def process_vote(vote: VoteInput):
     vote_result = vote.voteResult.lower()
 
     if vote_result == "approve":
+        # An approved claim is only paid again once its payout is known not to have happened
+        # (reverted, dropped or never sent); a live job is returned by submit() below instead
+        if (item.get("claim_state") == "approved" and item.get("payout_status") not in PAYOUT_RETRYABLE_STATUSES
+                and not await asyncio.to_thread(approval_jobs.job_for_claim, vote.uuid)):
+            raise HTTPException(status_code=409, detail="Claim is already approved and its payout is not known to have failed.")
         try:
             # Get organization address and claimed amount from DB
             org_address = item.get("organization_aztec_address")
@@ -629,25 +1147,21 @@ async def process_vote(vote: VoteInput):
             if claimed_amount_usdc is None:
                 raise HTTPException(status_code=500, detail="Missing claimed_amount in DB.")
 
-            print(f"[INFO] Approving claim for {claimed_amount_usdc} USDC to {org_address}")
-
-            # Send USDC directly to the organization
-            tx_hash, block_number = send_usdc_to_recipient(org_address, claimed_amount_usdc)
-
-            # Update DB with approved status and transaction hash
-            voting_table.update_item(
-                Key={"id": vote.uuid},
-                UpdateExpression="SET claim_state = :s, claims_hash = :h",
-                ExpressionAttributeValues={
-                    ":s": "approved",
-                    ":h": tx_hash
-                }
+            # The payout runs on the approval queue; poll GET /jobs/{jobId} for its progress.
+            # Approving a claim that already has a live job returns that job.
+            job, created = await asyncio.to_thread(
+                approval_jobs.submit, vote.uuid, org_address, claimed_amount_usdc, item.get("created_at")
             )
+            logger.info("Approving claim" if created else "Claim approval already queued", extra={
+                "claim_id": vote.uuid, "amount_usdc": claimed_amount_usdc, "recipient": org_address,
+                "job_id": job["id"],
+            })
 
             return {
-                "status": "✅ Claim approved & USDC sent successfully.",
-                "txHash": tx_hash,
-                "confirmedInBlock": block_number,
+                "status": "✅ Claim approved & payout queued.",
+                "jobId": job["id"],
+                "jobStatus": job["status"],
+                "txHash": job["tx_hash"],
                 "claimed_amount_usdc": str(claimed_amount_usdc),
                 "recipient": org_address
             }
@@ -657,7 +1171,8 @@ async def process_vote(vote: VoteInput):
 
     elif vote_result == "reject":
         try:
-            voting_table.update_item(
+            await asyncio.to_thread(
+                voting_table.update_item,
                 Key={"id": vote.uuid},
                 UpdateExpression="SET claim_state = :s",
                 ExpressionAttributeValues={":s": "rejected"}
@@ -667,62 +1182,16 @@ async def process_vote(vote: VoteInput):
             raise HTTPException(status_code=500, detail=f"Update error: {e.response['Error']['Message']}")
 
     elif vote_result in ["higher", "lower"]:
-        try:
-            reason = item.get("reason", "")
-            claimed_amount = item.get("claimed_amount", 0)
-
-            # Use AI to determine the new amount based on context
-            prompt = (
-                f"The organization has requested {claimed_amount} USDC as relief funds. "
-                f"The reason they provided is: '{reason}'. "
-                f"Voters believe the amount should be '{vote_result}'. "
-                f"Please analyze the request and suggest a revised amount in USDC. "
-                f"Consider the reason provided and whether the amount should be increased or decreased. "
-                f"Respond with just the new amount as a number."
-            )
-
-            completion = client.chat.completions.create(
-                model="6866646ff14ab5c885e4386d",
-                messages=[{"role": "user", "content": prompt}],
-            )
-            response_content = completion.choices[0].message.content.strip()
-            
-            # Extract the number from AI response
-            new_amount = int("".join(filter(str.isdigit, response_content)))
-            
-            # Ensure minimum amount of 1 USDC
-            if new_amount < 1:
-                new_amount = 1
-                print(f"[INFO] AI suggested amount too low, adjusted to minimum: {new_amount} USDC")
-
-            print(f"[INFO] AI suggested new amount: {new_amount} USDC (was: {claimed_amount})")
-
-            # Update DB with new amount and send back for re-voting
-            voting_table.update_item(
-                Key={"id": vote.uuid},
-                UpdateExpression="SET claim_state = :s, claimed_amount = :a",
-                ExpressionAttributeValues={
-                    ":s": "voting",
-                    ":a": new_amount
-                }
-            )
-            
-            return {
-                "status": "🔁 Claim sent back for re-voting with updated amount.",
-                "newAmount": new_amount,
-                "previousAmount": claimed_amount,
-                "aiReasoning": "AI analyzed the request and suggested adjustment based on context"
-            }
-            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"AI adjustment failed: {str(e)}")
+        # Reviewers voting the same way on the same claim at once share one adjustment
+        key = (vote.uuid, vote_result, str(item.get("claimed_amount", 0)))
+        return await revote_flights.do(key, lambda: adjust_claimed_amount(vote.uuid, vote_result, item))
 
     else:
         raise HTTPException(status_code=400, detail="Invalid vote result. Must be: approve, reject, higher, or lower.")
 
 # === Health check endpoint ===
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy", "service": "disaster-relief-fact-checker"}
 
 # === Test endpoint ===
@@ -755,6 +1224,8 @@ def test_parser():
     
     return {"test_results": results}
 
+_app_imported = time.perf_counter()
+
 if __name__ == "__main__":
     import uvicorn
     
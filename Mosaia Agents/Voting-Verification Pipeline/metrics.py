@@ -0,0 +1,117 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from web3.middleware import Web3Middleware
+
+# 5 ms (a warm eth_call) up to 5 min (web-search agent, receipt waits)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+PARSE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+EXTERNAL_CALL_SECONDS = Histogram(
+    "godshand_external_call_seconds",
+    "Latency of calls to agents, the RPC node and DynamoDB",
+    ["call", "target"],
+    buckets=LATENCY_BUCKETS,
+)
+EXTERNAL_CALL_ERRORS = Counter(
+    "godshand_external_call_errors_total",
+    "External calls that raised or returned an error",
+    ["call", "target"],
+)
+EXTERNAL_CALLS_IN_FLIGHT = Gauge(
+    "godshand_external_calls_in_flight",
+    "External calls currently waiting for an answer",
+    ["call"],
+)
+PARSE_SECONDS = Histogram(
+    "godshand_parse_seconds",
+    "Time spent parsing agent replies",
+    ["parser"],
+    buckets=PARSE_BUCKETS,
+)
+
+APPROVAL_JOB_WAIT_SECONDS = Histogram(
+    "godshand_approval_job_wait_seconds",
+    "Time from accepting an approval to sending its payout tx",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def observe(call, target=""):
+    """Time one external call; an exception counts as an error and propagates"""
+    in_flight = EXTERNAL_CALLS_IN_FLIGHT.labels(call)
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_CALL_ERRORS.labels(call, target).inc()
+        raise
+    finally:
+        in_flight.dec()
+        EXTERNAL_CALL_SECONDS.labels(call, target).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def observe_parse(parser):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PARSE_SECONDS.labels(parser).observe(time.perf_counter() - started)
+
+
+class RPCMetricsMiddleware(Web3Middleware):
+    """Times every JSON-RPC request by method (eth_call, eth_sendRawTransaction, ...)"""
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            with observe("rpc", method):
+                response = make_request(method, params)
+            if isinstance(response, dict) and response.get("error"):
+                EXTERNAL_CALL_ERRORS.labels("rpc", method).inc()
+            return response
+        return middleware
+
+
+def instrument_boto3_client(client, call="dynamodb"):
+    """Time every API call of a boto3 client by operation (GetItem, PutItem, ...)"""
+    def before_call(model, context, **kwargs):
+        context["metrics_call"] = (model.name, time.perf_counter())
+        EXTERNAL_CALLS_IN_FLIGHT.labels(call).inc()
+
+    def finish(context, failed):
+        operation, started = context.pop("metrics_call", (None, None))
+        if operation is None:
+            return
+        EXTERNAL_CALLS_IN_FLIGHT.labels(call).dec()
+        EXTERNAL_CALL_SECONDS.labels(call, operation).observe(time.perf_counter() - started)
+        if failed:
+            EXTERNAL_CALL_ERRORS.labels(call, operation).inc()
+
+    def after_call(context, http_response=None, **kwargs):
+        finish(context, http_response is None or http_response.status_code >= 300)
+
+    def after_call_error(context, **kwargs):
+        # Emitted without the operation model when the request itself fails
+        finish(context, True)
+
+    service = client.meta.service_model.service_id.hyphenize()
+    events = client.meta.events
+    events.register(f"before-call.{service}", before_call)
+    events.register(f"after-call.{service}", after_call)
+    events.register(f"after-call-error.{service}", after_call_error)
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition for /metrics"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
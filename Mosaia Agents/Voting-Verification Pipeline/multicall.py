@@ -0,0 +1,63 @@
+import os
+
+from web3 import Web3
+
+# Multicall3 is deployed at the same address on Sepolia and most EVM chains
+MULTICALL3_ADDRESS = os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11")
+MULTICALL_BATCH_SIZE = int(os.getenv("MULTICALL_BATCH_SIZE", "100"))
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+
+GET_DISASTER_DETAILS_SELECTOR = Web3.keccak(text="getDisasterDetails(bytes32)")[:4]
+DISASTER_DETAILS_TYPES = ["string", "string", "uint256", "uint256", "address", "uint256", "bool"]
+
+
+def get_disaster_details_batch(web3, contract_address, disaster_hashes, batch_size=MULTICALL_BATCH_SIZE):
+    """
+    getDisasterDetails for many hashes through Multicall3.aggregate3, one
+    eth_call per `batch_size` hashes. Returns (details_by_hash, round_trips);
+    hashes whose call reverted map to None.
+    """
+    multicall = web3.eth.contract(address=Web3.to_checksum_address(MULTICALL3_ADDRESS), abi=MULTICALL3_ABI)
+    target = Web3.to_checksum_address(contract_address)
+    details_by_hash = {}
+    round_trips = 0
+    for start in range(0, len(disaster_hashes), batch_size):
+        chunk = disaster_hashes[start:start + batch_size]
+        calls = [(target, True, GET_DISASTER_DETAILS_SELECTOR + bytes.fromhex(h)) for h in chunk]
+        results = multicall.functions.aggregate3(calls).call()
+        round_trips += 1
+        for disaster_hash, (success, return_data) in zip(chunk, results):
+            details_by_hash[disaster_hash] = (
+                tuple(web3.codec.decode(DISASTER_DETAILS_TYPES, return_data)) if success else None
+            )
+    return details_by_hash, round_trips
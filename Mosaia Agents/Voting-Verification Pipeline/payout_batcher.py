@@ -0,0 +1,243 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+PAYOUT_BATCH_MODE = os.getenv("PAYOUT_BATCH_MODE", "false").lower() == "true"
+PAYOUT_BATCH_SIZE = int(os.getenv("PAYOUT_BATCH_SIZE", "10"))
+PAYOUT_BATCH_WINDOW_SECONDS = float(os.getenv("PAYOUT_BATCH_WINDOW_SECONDS", "30"))
+# Optional Disperse-style contract: one disperseToken tx pays every claim of a batch
+DISPERSE_CONTRACT_ADDRESS = os.getenv("DISPERSE_CONTRACT_ADDRESS")
+
+DISPERSE_ABI = [
+    {
+        "inputs": [
+            {"internalType": "address", "name": "token", "type": "address"},
+            {"internalType": "address[]", "name": "recipients", "type": "address[]"},
+            {"internalType": "uint256[]", "name": "values", "type": "uint256[]"}
+        ],
+        "name": "disperseToken",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    }
+]
+
+TRANSFER_GAS = 100000
+DISPERSE_BASE_GAS = 60000
+DISPERSE_GAS_PER_RECIPIENT = 40000
+
+
+class PayoutBatcher:
+    """
+    Queues approved claims and pays them out together once PAYOUT_BATCH_SIZE
+    claims are waiting or the oldest one has waited PAYOUT_BATCH_WINDOW_SECONDS.
+    A batch costs one balance check and either one disperseToken tx (every claim
+    gets the same tx hash) or a burst of back-to-back pre-nonced transfers that
+    can land in the same block.
+
+    on_submitted(claim_id, tx_hash, batch_id) runs when a claim's tx is sent,
+    on_final(claim_id) must return the tx_submitter on_final callback for the
+    claim, and on_failed(claim_id, error) runs when a claim can't be paid.
+    """
+
+    def __init__(self, web3, account, usdc_contract, submitter, chain_id, on_submitted, on_final, on_failed,
+                 max_size=PAYOUT_BATCH_SIZE, window_seconds=PAYOUT_BATCH_WINDOW_SECONDS,
+                 disperse_address=DISPERSE_CONTRACT_ADDRESS):
+        self.web3 = web3
+        self.account = account
+        self.usdc_contract = usdc_contract
+        self.submitter = submitter
+        self.chain_id = chain_id
+        self.on_submitted = on_submitted
+        self.on_final = on_final
+        self.on_failed = on_failed
+        self.max_size = max_size
+        self.window_seconds = window_seconds
+        self.disperse = (
+            web3.eth.contract(address=Web3.to_checksum_address(disperse_address), abi=DISPERSE_ABI)
+            if disperse_address else None
+        )
+        self._queue = []
+        self._pending_batch_id = None
+        self._batches = {}  # batch_id -> status of recently flushed batches
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {"claims_queued": 0, "claims_paid": 0, "claims_failed": 0, "batches": 0, "transactions": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="payout-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+
+    def enqueue(self, claim_id, recipient, amount_usdc):
+        """Queue a claim for the next batch; returns the id of that batch"""
+        with self._cond:
+            # _run flushes the queue max_size claims at a time, so every max_size-th claim starts a batch
+            if len(self._queue) % self.max_size == 0:
+                self._pending_batch_id = str(uuid.uuid4())
+            batch_id = self._pending_batch_id
+            self._queue.append({
+                "batch_id": batch_id,
+                "claim_id": claim_id,
+                "recipient": Web3.to_checksum_address(recipient),
+                "amount_wei": int(amount_usdc * 1_000_000),
+                "queued_at": time.time(),
+            })
+            self.counters["claims_queued"] += 1
+            self._cond.notify()
+        return batch_id
+
+    def batch_status(self, batch_id):
+        with self._cond:
+            queued = [c["claim_id"] for c in self._queue if c["batch_id"] == batch_id]
+            if queued:
+                return {"batch_id": batch_id, "status": "queued", "claims": queued}
+            return self._batches.get(batch_id)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                wait = self._queue[0]["queued_at"] + self.window_seconds - time.time()
+                if len(self._queue) < self.max_size and wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                claims = self._queue[:self.max_size]
+                del self._queue[:self.max_size]
+                batch_id = claims[0]["batch_id"]
+            try:
+                self.flush(batch_id, claims)
+            except Exception as e:
+                logger.exception("Payout batch %s failed", batch_id)
+                for claim in claims:
+                    self._fail(claim, e)
+
+    def _fail(self, claim, error):
+        self.counters["claims_failed"] += 1
+        try:
+            self.on_failed(claim["claim_id"], error)
+        except Exception:
+            logger.exception("on_failed callback for claim %s failed", claim["claim_id"])
+
+    def flush(self, batch_id, claims):
+        started = time.perf_counter()
+        batch = {"batch_id": batch_id, "status": "submitting", "claims": [c["claim_id"] for c in claims], "tx_hashes": []}
+        with self._cond:
+            self._batches[batch_id] = batch
+            while len(self._batches) > 1000:
+                self._batches.pop(next(iter(self._batches)))
+
+        # One balance check for the whole batch; claims that don't fit are failed, not the batch
+        available = self.usdc_contract.functions.balanceOf(self.account.address).call() - self.submitter.reserved()
+        payable = []
+        for claim in claims:
+            if claim["amount_wei"] <= available:
+                available -= claim["amount_wei"]
+                payable.append(claim)
+            else:
+                self._fail(claim, Exception(f"Insufficient USDC balance for {claim['amount_wei'] / 1_000_000} USDC"))
+        if payable:
+            if self.disperse:
+                self._send_disperse(batch, payable)
+            else:
+                self._send_transfers(batch, payable)
+        # Nothing was sent when no claim was payable or every send failed
+        batch["status"] = "submitted" if batch["tx_hashes"] else "failed"
+        self.counters["batches"] += 1
+        logger.info("Payout batch %s: %d/%d claims in %d tx(s), submitted in %.2fs",
+                    batch_id, len(payable), len(claims), len(batch["tx_hashes"]), time.perf_counter() - started)
+
+    def _gas_price(self):
+        return self.web3.to_wei('20', 'gwei')
+
+    def _send_transfers(self, batch, claims):
+        # The submitter hands out consecutive nonces, so these go out back to back
+        for claim in claims:
+            def build_tx(nonce, claim=claim):
+                return self.usdc_contract.functions.transfer(claim["recipient"], claim["amount_wei"]).build_transaction({
+                    'from': self.account.address,
+                    'chainId': self.chain_id,
+                    'nonce': nonce,
+                    'gas': TRANSFER_GAS,
+                    'gasPrice': self._gas_price()
+                })
+            try:
+                tx_hash = self.submitter.submit(build_tx, reserved_amount=claim["amount_wei"],
+                                                on_final=self.on_final(claim["claim_id"]))
+            except Exception as e:
+                self._fail(claim, e)
+                continue
+            self._submitted(batch, claim, tx_hash)
+
+    def _send_disperse(self, batch, claims):
+        total = sum(claim["amount_wei"] for claim in claims)
+        # Allow the disperse contract exactly this batch's total, never more. approve() sets
+        # (not adds to) the allowance and nonce order mines it right before this batch's
+        # disperse, so an earlier batch still in flight can't eat into it.
+        self.submitter.submit(lambda nonce: self.usdc_contract.functions.approve(
+            self.disperse.address, total
+        ).build_transaction({
+            'from': self.account.address,
+            'chainId': self.chain_id,
+            'nonce': nonce,
+            'gas': TRANSFER_GAS,
+            'gasPrice': self._gas_price()
+        }))
+        self.counters["transactions"] += 1
+
+        def build_tx(nonce):
+            return self.disperse.functions.disperseToken(
+                self.usdc_contract.address,
+                [claim["recipient"] for claim in claims],
+                [claim["amount_wei"] for claim in claims]
+            ).build_transaction({
+                'from': self.account.address,
+                'chainId': self.chain_id,
+                'nonce': nonce,
+                'gas': DISPERSE_BASE_GAS + DISPERSE_GAS_PER_RECIPIENT * len(claims),
+                'gasPrice': self._gas_price()
+            })
+
+        claim_callbacks = [self.on_final(claim["claim_id"]) for claim in claims]
+
+        def on_final(tx_hash, status, receipt):
+            for callback in claim_callbacks:
+                callback(tx_hash, status, receipt)
+
+        tx_hash = self.submitter.submit(build_tx, reserved_amount=total, on_final=on_final)
+        for claim in claims:
+            self._submitted(batch, claim, tx_hash)
+
+    def _submitted(self, batch, claim, tx_hash):
+        if tx_hash not in batch["tx_hashes"]:
+            batch["tx_hashes"].append(tx_hash)
+            self.counters["transactions"] += 1
+        self.counters["claims_paid"] += 1
+        try:
+            self.on_submitted(claim["claim_id"], tx_hash, batch["batch_id"])
+        except Exception:
+            logger.exception("on_submitted callback for claim %s failed", claim["claim_id"])
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue)
+        claims = self.counters["claims_paid"]
+        return {
+            **self.counters,
+            "queued": queued,
+            "mode": "disperse" if self.disperse else "transfer_burst",
+            "claims_per_transaction": round(claims / self.counters["transactions"], 2) if self.counters["transactions"] else None,
+        }
@@ -0,0 +1,42 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the
+    work, callers arriving while it is in flight await the same task and get
+    its result (or exception). Nothing is kept once the task finishes, so
+    this deduplicates only simultaneous requests, never later ones.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}  # key -> asyncio.Task
+        self.counters = {"executed": 0, "coalesced": 0}
+
+    async def do(self, key, func):
+        """Run func() (a coroutine function) unless a call with this key is already running"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.counters["executed"] += 1
+        else:
+            self.counters["coalesced"] += 1
+        # A caller that disconnects must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every waiter went away
+
+    def stats(self):
+        requests = self.counters["executed"] + self.counters["coalesced"]
+        return {
+            **self.counters,
+            "in_flight": len(self._inflight),
+            "dedup_rate": round(self.counters["coalesced"] / requests, 3) if requests else None,
+        }
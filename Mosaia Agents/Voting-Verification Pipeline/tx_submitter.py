@@ -0,0 +1,234 @@
+import logging
+import os
+import threading
+import time
+
+from metrics import EXTERNAL_CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TX_RECEIPT_POLL_SECONDS = float(os.getenv("TX_RECEIPT_POLL_SECONDS", "2"))
+TX_RECEIPT_TIMEOUT_SECONDS = float(os.getenv("TX_RECEIPT_TIMEOUT_SECONDS", "600"))
+TX_HISTORY_SECONDS = float(os.getenv("TX_HISTORY_SECONDS", "3600"))  # How long final txs stay queryable
+
+# Node error messages that mean our local nonce is out of step with the chain
+NONCE_ERRORS = ("nonce too low", "nonce too high", "replacement transaction underpriced", "invalid nonce")
+# The node already has this exact signed tx: it was sent, so resending it under another nonce would pay twice
+ALREADY_KNOWN_ERRORS = ("already known", "known transaction", "already imported")
+
+
+def is_nonce_error(error):
+    message = str(error).lower()
+    return any(text in message for text in NONCE_ERRORS)
+
+
+def is_already_known(error):
+    message = str(error).lower()
+    return any(text in message for text in ALREADY_KNOWN_ERRORS)
+
+
+class NonceManager:
+    """
+    Hands out nonces for one account from a local counter. The counter is
+    seeded from the node's pending transaction count and re-seeded whenever
+    a send fails, so a skipped or rejected nonce never leaves a gap.
+    """
+
+    def __init__(self, web3, address):
+        self.web3 = web3
+        self.address = address
+        self.lock = threading.Lock()
+        self._next = None
+        self.resyncs = 0
+
+    def allocate(self):
+        """Next nonce; caller must hold `lock` until the tx using it is sent"""
+        if self._next is None:
+            self._next = self.web3.eth.get_transaction_count(self.address, "pending")
+            self.resyncs += 1
+        nonce = self._next
+        self._next += 1
+        return nonce
+
+    def resync(self):
+        self._next = None
+
+
+class TransactionSubmitter:
+    """
+    Signs and sends transactions with locally allocated nonces and returns the
+    hash immediately. A background thread polls receipts for everything in
+    flight and calls each tx's on_final(tx_hash, status, receipt) once it is
+    final: confirmed, failed (reverted) or dropped. A tx with no receipt after
+    receipt_timeout is flagged overdue but stays pending, since it can still be
+    mined; it is only dropped once the account's mined nonce has passed its own.
+    """
+
+    def __init__(self, web3, account, private_key, chain_id,
+                 poll_seconds=TX_RECEIPT_POLL_SECONDS, receipt_timeout=TX_RECEIPT_TIMEOUT_SECONDS):
+        self.web3 = web3
+        self.account = account
+        self.private_key = private_key
+        self.chain_id = chain_id
+        self.poll_seconds = poll_seconds
+        self.receipt_timeout = receipt_timeout
+        self.nonces = NonceManager(web3, account.address)
+        self._txs = {}  # tx_hash -> record
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_polled_block = None
+        self.counters = {"submitted": 0, "confirmed": 0, "failed": 0, "timed_out": 0, "dropped": 0, "send_errors": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="tx-receipt-tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def submit(self, build_tx, reserved_amount=0, on_final=None, meta=None):
+        """
+        Send the tx returned by build_tx(nonce) and return its hash. reserved_amount
+        is held against the wallet balance (see reserved()) until the tx is final.
+        """
+        for attempt in range(2):
+            with self.nonces.lock:
+                nonce = self.nonces.allocate()
+                signed_tx = None
+                try:
+                    tx = build_tx(nonce)
+                    signed_tx = self.web3.eth.account.sign_transaction(tx, self.private_key)
+                    tx_hash = self.web3.eth.send_raw_transaction(signed_tx.raw_transaction).hex()
+                except Exception as e:
+                    if signed_tx is not None and is_already_known(e):
+                        # Same tx already in the mempool: it counts as sent, under its own hash and nonce
+                        tx_hash = signed_tx.hash.hex()
+                        logger.warning("Tx with nonce %d already known to the node, tracking it", nonce)
+                        break
+                    self.nonces.resync()
+                    self.counters["send_errors"] += 1
+                    if attempt == 0 and is_nonce_error(e):
+                        logger.warning("Nonce %d rejected (%s), resyncing and retrying", nonce, e)
+                        continue
+                    raise
+            break
+        if not tx_hash.startswith("0x"):
+            tx_hash = "0x" + tx_hash
+        with self._lock:
+            self._txs[tx_hash] = {
+                "tx_hash": tx_hash,
+                "nonce": nonce,
+                "status": "pending",
+                "submitted_at": time.time(),
+                "block_number": None,
+                "reserved_amount": reserved_amount,
+                "on_final": on_final,
+                "meta": meta or {},
+            }
+        self.counters["submitted"] += 1
+        logger.info("Submitted tx", extra={"tx_hash": tx_hash, "nonce": nonce})
+        return tx_hash
+
+    def track(self, tx_hash, reserved_amount=0, on_final=None, meta=None):
+        """Poll the receipt of a tx sent earlier (e.g. by a previous process) like a submitted one"""
+        if not tx_hash.startswith("0x"):
+            tx_hash = "0x" + tx_hash
+        with self._lock:
+            self._txs[tx_hash] = {
+                "tx_hash": tx_hash,
+                "nonce": None,
+                "status": "pending",
+                "submitted_at": time.time(),
+                "block_number": None,
+                "reserved_amount": reserved_amount,
+                "on_final": on_final,
+                "meta": meta or {},
+            }
+
+    def reserved(self):
+        """Sum of reserved_amount over txs that are not final yet"""
+        with self._lock:
+            return sum(tx["reserved_amount"] for tx in self._txs.values() if tx["status"] == "pending")
+
+    def status(self, tx_hash):
+        if not tx_hash.startswith("0x"):
+            tx_hash = "0x" + tx_hash
+        with self._lock:
+            tx = self._txs.get(tx_hash)
+            if not tx:
+                return None
+            return {k: v for k, v in tx.items() if k != "on_final"}
+
+    def _nonce_of(self, tx):
+        """Nonce of a tracked tx we didn't send ourselves, looked up once; None while the node doesn't know it"""
+        if tx["nonce"] is None:
+            try:
+                tx["nonce"] = self.web3.eth.get_transaction(tx["tx_hash"])["nonce"]
+            except Exception:
+                pass
+        return tx["nonce"]
+
+    def poll_once(self):
+        block_number = self.web3.eth.block_number
+        if block_number == self._last_polled_block:
+            return
+        self._last_polled_block = block_number
+        now = time.time()
+        with self._lock:
+            expired = [h for h, tx in self._txs.items()
+                       if tx["status"] != "pending" and now - tx["finished_at"] > TX_HISTORY_SECONDS]
+            for tx_hash in expired:
+                del self._txs[tx_hash]
+            pending = [tx for tx in self._txs.values() if tx["status"] == "pending"]
+        # Read before the receipts: a nonce used up by then either has our receipt or went to another tx
+        overdue = [tx for tx in pending if now - tx["submitted_at"] > self.receipt_timeout]
+        mined_nonces = self.web3.eth.get_transaction_count(self.account.address, "latest") if overdue else None
+        for tx in pending:
+            receipt = None
+            try:
+                receipt = self.web3.eth.get_transaction_receipt(tx["tx_hash"])
+            except Exception:
+                pass  # Not mined yet
+            if receipt is not None:
+                self._finish(tx, "confirmed" if receipt.status == 1 else "failed", receipt)
+            elif tx in overdue:
+                if not tx.get("overdue"):
+                    # Possibly dropped. It can still be mined, so it stays pending; the node's
+                    # pending count becomes the source of truth again so a free nonce gets reused.
+                    tx["overdue"] = True
+                    self.counters["timed_out"] += 1
+                    with self.nonces.lock:
+                        self.nonces.resync()
+                    logger.warning("No receipt after %ds", self.receipt_timeout, extra={"tx_hash": tx["tx_hash"]})
+                nonce = self._nonce_of(tx)
+                if nonce is not None and nonce < mined_nonces:
+                    # Its nonce was mined by another tx, so this one never will be
+                    self._finish(tx, "dropped", None)
+
+    def _finish(self, tx, status, receipt):
+        with self._lock:
+            tx["status"] = status
+            tx["block_number"] = receipt.blockNumber if receipt is not None else None
+            tx["finished_at"] = time.time()
+        self.counters[status] += 1
+        EXTERNAL_CALL_SECONDS.labels("tx_receipt_wait", status).observe(tx["finished_at"] - tx["submitted_at"])
+        logger.info("Tx %s", status, extra={"tx_hash": tx["tx_hash"], "block_number": tx["block_number"]})
+        if tx["on_final"]:
+            try:
+                tx["on_final"](tx["tx_hash"], status, receipt)
+            except Exception:
+                logger.exception("on_final callback for %s failed", tx["tx_hash"])
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning("Receipt poll failed: %s", e)
+            self._stop.wait(self.poll_seconds)
+
+    def stats(self):
+        with self._lock:
+            in_flight = sum(1 for tx in self._txs.values() if tx["status"] == "pending")
+        return {**self.counters, "in_flight": in_flight, "nonce_resyncs": self.nonces.resyncs}
@@ -0,0 +1,95 @@
+"""Latency summaries, the results store and the comparison between two runs"""
+import glob
+import json
+import os
+import subprocess
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Metric -> True when a higher value is better
+METRICS = {"throughput_rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "error_rate": False}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies_ms, errors, seconds, concurrency, **extra):
+    requests = len(latencies_ms) + errors
+    summary = {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies_ms) / seconds, 3) if seconds else 0.0,
+        **extra,
+    }
+    if latencies_ms:
+        summary.update({
+            "p50_ms": round(percentile(latencies_ms, 50), 1),
+            "p95_ms": round(percentile(latencies_ms, 95), 1),
+            "p99_ms": round(percentile(latencies_ms, 99), 1),
+            "max_ms": round(max(latencies_ms), 1),
+        })
+    return summary
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD") or None,
+                "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def save_results(run):
+    """Write the run to results/<utc time>_<commit>.json and return the path"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(RESULTS_DIR, f"{stamp}_{run.get('commit') or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_results(path_or_latest, exclude=None):
+    """A results file by path, or "latest" for the newest one other than `exclude`"""
+    if path_or_latest != "latest":
+        with open(path_or_latest, encoding="utf-8") as f:
+            return path_or_latest, json.load(f)
+    paths = sorted(p for p in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if p != exclude)
+    if not paths:
+        return None, None
+    return load_results(paths[-1])
+
+
+def compare(baseline, current, threshold):
+    """
+    Print current vs baseline per scenario and metric. Returns the
+    regressions: metrics that moved the wrong way by more than `threshold`
+    (a share, 0.1 = 10%).
+    """
+    regressions = []
+    print(f"{'scenario':<14}{'metric':<16}{'baseline':>11}{'current':>11}{'change':>9}")
+    for scenario, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            print(f"{scenario:<14}(not in baseline)")
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in now or metric not in before:
+                continue
+            old, new = before[metric], now[metric]
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append((scenario, metric, old, new))
+            print(f"{scenario:<14}{metric:<16}{old:>11}{new:>11}{change:>+9.1%}{flag}")
+    return regressions
@@ -0,0 +1,246 @@
+"""
+Offline load test for both pipelines. Nothing leaves the machine: the
+Mosaia agents are a local OpenAI-compatible server with canned replies,
+Sepolia is an anvil node with GodsHand.sol and a mock USDC deployed, and
+DynamoDB is a moto server with the gods-hand-events and gods-hand-claims
+tables (see stand_ins.py).
+
+Scenarios:
+  fact-check      POST /fact-check, a different statement per request
+  process-vote    POST /process-vote/ with approve on pre-seeded claims (accepting
+                  the approval job; payouts run on the approval queue)
+  disaster-flow   run_disaster_flow() from the creation pipeline
+
+Each scenario reports throughput and p50/p95/p99 latency. The run is saved
+to results/<utc time>_<commit>.json; --compare checks it against an
+earlier run (a path, or "latest") and exits 1 on a regression.
+
+    pip install -r requirements.txt   # plus both pipelines' requirements and Foundry's anvil
+    python run.py --requests 200 --concurrency 20 --agent-latency 0.5 --compare latest
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from eth_account import Account
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, LOADTEST_DIR)
+
+from report import compare, git_revision, load_results, save_results, summarize  # noqa: E402
+from stand_ins import FakeAgentServer, LocalChain, LocalDynamoDB, free_port, wait_for_port  # noqa: E402
+
+SCENARIOS = ("fact-check", "process-vote", "disaster-flow")
+AGENT_KEY_ENVS = ("websearchagent", "bboxagent", "weatheragent", "analysisagent", "tweetagent", "verifyagent")
+
+
+def pipeline_env(args, agent, chain, dynamodb, workdir):
+    """Environment shared by both pipeline processes, pointing every client at a stand-in"""
+    env = {
+        **os.environ,
+        "MOSAIA_BASE_URL": agent.base_url,
+        "AWS_REGION": dynamodb.region,
+        "AWS_ACCESS_KEY_ID": "loadtest",
+        "AWS_SECRET_ACCESS_KEY": "loadtest",
+        "DYNAMODB_ENDPOINT_URL": dynamodb.endpoint_url,
+        "LOG_LEVEL": args.log_level,
+        # Fresh caches and indexes so every run starts cold and runs are comparable
+        "COMPLETION_CACHE_PATH": os.path.join(workdir, "completion_cache.db"),
+        "COMPLETION_CACHE_DISABLED": "false" if args.completion_cache else "true",
+        "DEDUPE_DB_PATH": os.path.join(workdir, "disaster_index.db"),
+        "RUN_JOURNAL_PATH": os.path.join(workdir, "run_journal.db"),
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.db"),
+        # The stand-in tweet agent has no posting limit to respect
+        "OUTBOX_MIN_INTERVALS": "tweet=0",
+        "INDEXER_DB_PATH": os.path.join(workdir, "godshand_index.db"),
+        "APPROVAL_JOBS_PATH": os.path.join(workdir, "approval_jobs.db"),
+        "METRICS_PUSHGATEWAY_URL": "",
+        "METRICS_TEXTFILE_PATH": "",
+    }
+    env.update({name: "loadtest" for name in AGENT_KEY_ENVS})
+    return env
+
+
+async def drive(base_url, requests, concurrency, make_request):
+    """Send `requests` calls with at most `concurrency` in flight; make_request(http, i) does one"""
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as http:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await make_request(http, i)
+                    response.raise_for_status()
+                except Exception as e:
+                    errors += 1
+                    if errors <= 3:
+                        print(f"[WARN] request {i} failed: {e}", file=sys.stderr)
+                    return
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+def wait_until_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = httpx.get(f"{base_url}/readyz")
+        if response.status_code == 200:
+            return
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Verification service not ready after {timeout}s: {response.text}")
+        time.sleep(0.2)
+
+
+def run_verification(args, env, chain, dynamodb):
+    service_account = chain.funded_account()
+    chain.mint_usdc(service_account.address, args.requests * 10)
+    disaster_hash = chain.create_disaster("Load test flood", target_usdc=100_000, donated_usdc=25_000)
+    recipient = Account.create().address
+    claim_ids = dynamodb.seed_claims(args.requests, recipient, prefix=f"loadtest-{int(time.time())}")
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(LOADTEST_DIR, "workers.py"), "serve-verification", "--port", str(port)],
+        env={
+            **env,
+            "SEPOLIA_RPC_URL": chain.rpc_url,
+            "ETH_CONTRACT_ADDRESS": chain.godshand.address,
+            "USDC_ADDRESS": chain.usdc.address,
+            "private_key": service_account.key.hex().removeprefix("0x"),
+            "TX_RECEIPT_POLL_SECONDS": "0.5",
+        },
+    )
+    try:
+        wait_for_port(port, timeout=60)
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_ready(base_url)
+        results = {}
+        if "fact-check" in args.scenarios:
+            results["fact-check"] = asyncio.run(drive(base_url, args.requests, args.concurrency, lambda http, i: http.post(
+                "/fact-check", json={"statement": f"We distributed {100 + i} food kits in the flooded districts",
+                                     "disaster_hash": disaster_hash})))
+        if "process-vote" in args.scenarios:
+            results["process-vote"] = asyncio.run(drive(base_url, args.requests, args.concurrency, lambda http, i: http.post(
+                "/process-vote/", json={"voteResult": "approve", "uuid": claim_ids[i]})))
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_disaster_flow(args, env, chain):
+    pipeline_account = chain.funded_account()
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        out = f.name
+    try:
+        subprocess.run(
+            [sys.executable, os.path.join(LOADTEST_DIR, "workers.py"), "disaster-flow",
+             "--requests", str(args.flow_requests), "--concurrency", str(args.flow_concurrency), "--out", out],
+            env={
+                **env,
+                "ETH_RPC_URL": chain.rpc_url,
+                "ETH_CHAIN_ID": str(chain.web3.eth.chain_id),
+                "ETH_CONTRACT_ADDRESS": chain.godshand.address,
+                "ETH_ACCOUNT_ADDRESS": pipeline_account.address,
+                "ETH_PRIVATE_KEY": pipeline_account.key.hex(),
+            },
+            check=True,
+        )
+        with open(out, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.unlink(out)
+
+
+def run(args):
+    replies = None
+    if args.agent_replies:
+        with open(args.agent_replies, encoding="utf-8") as f:
+            replies = json.load(f)
+    agent = FakeAgentServer(latency=args.agent_latency, jitter=args.agent_jitter, replies=replies).start()
+    chain = LocalChain(rpc_url=args.rpc_url, block_time=args.block_time)
+    dynamodb = LocalDynamoDB(endpoint_url=args.dynamodb_url)
+    scenarios = {}
+    try:
+        chain.start()
+        dynamodb.start()
+        with tempfile.TemporaryDirectory(prefix="godshand-loadtest-") as workdir:
+            env = pipeline_env(args, agent, chain, dynamodb, workdir)
+            if {"fact-check", "process-vote"} & set(args.scenarios):
+                scenarios.update(run_verification(args, env, chain, dynamodb))
+            if "disaster-flow" in args.scenarios:
+                scenarios["disaster-flow"] = run_disaster_flow(args, env, chain)
+    finally:
+        dynamodb.stop()
+        chain.stop()
+        agent.stop()
+
+    run_record = {
+        **git_revision(),
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("compare", "no_save", "regression_threshold")},
+        "agent_requests": agent.counters["requests"],
+        "scenarios": scenarios,
+    }
+
+    print(f"{'scenario':<14}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, s in scenarios.items():
+        print(f"{name:<14}{s['requests']:>9}{s['errors']:>8}{s['throughput_rps']:>9.2f}"
+              f"{s.get('p50_ms', 0):>9.1f}{s.get('p95_ms', 0):>9.1f}{s.get('p99_ms', 0):>9.1f}")
+
+    saved = None
+    if not args.no_save:
+        saved = save_results(run_record)
+        print(f"[INFO] Results saved to {saved}")
+
+    if args.compare:
+        baseline_path, baseline = load_results(args.compare, exclude=saved)
+        if baseline is None:
+            print("[INFO] No earlier results to compare against")
+            return 0
+        if baseline.get("config") != run_record["config"]:
+            print("[WARN] Baseline was run with different settings, comparison is only indicative")
+        print(f"[INFO] Compared with {baseline_path} (commit {baseline.get('commit')})")
+        regressions = compare(baseline, run_record, args.regression_threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="HTTP requests in flight at once")
+    parser.add_argument("--flow-requests", type=int, default=10, help="run_disaster_flow() calls")
+    parser.add_argument("--flow-concurrency", type=int, default=2, help="disaster flows running at once")
+    parser.add_argument("--agent-latency", type=float, default=1.0, help="seconds per agent completion")
+    parser.add_argument("--agent-jitter", type=float, default=0.2, help="+/- share of --agent-latency")
+    parser.add_argument("--agent-replies", help="JSON file of model ID -> reply template overriding the defaults")
+    parser.add_argument("--block-time", type=float, help="anvil block time in seconds (default: mine on every tx)")
+    parser.add_argument("--rpc-url", help="use this running anvil (chain ID 11155111) instead of starting one")
+    parser.add_argument("--dynamodb-url", help="use this DynamoDB endpoint (e.g. DynamoDB Local) instead of moto")
+    parser.add_argument("--completion-cache", action="store_true", help="keep the agent completion cache on")
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL of the pipeline processes")
+    parser.add_argument("--compare", help='results file to compare with, or "latest"')
+    parser.add_argument("--regression-threshold", type=float, default=0.1,
+                        help="share a metric may get worse before it counts as a regression")
+    parser.add_argument("--no-save", action="store_true", help="do not write this run to results/")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
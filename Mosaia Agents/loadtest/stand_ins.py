@@ -0,0 +1,378 @@
+"""
+Local stand-ins for the services both pipelines talk to:
+
+- FakeAgentServer: OpenAI-compatible /chat/completions with a configurable
+  latency and a canned reply per Mosaia model ID (streaming included)
+- LocalChain: an anvil node on the Sepolia chain ID with GodsHand.sol and a
+  6-decimal mock USDC deployed, and funded accounts for both pipelines
+- LocalDynamoDB: a moto server (or an existing DynamoDB Local) with the
+  gods-hand-events and gods-hand-claims tables
+"""
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GODSHAND_SOURCE = os.path.join(REPO_ROOT, "Contract", "GodsHand.sol")
+SOLC_VERSION = "0.8.19"
+SEPOLIA_CHAIN_ID = 11155111
+
+# {n} is a per-server request counter and {token} a random hex string, so
+# every disaster flow sees a new disaster and the dedupe index stays out of the way
+DEFAULT_REPLIES = {
+    # Web search
+    "68660a4aeef377abf1f7443f": (
+        "Title: Flood {token}\n"
+        "Description: Heavy rain flooded low-lying districts, displacing thousands of families.\n"
+        "Read More: https://example.org/disasters/{token}\n"
+        "Disaster Location: Region-{token}"
+    ),
+    # Bounding box
+    "6864d6cbca5744854d34c998": '{{"min_lat": 9.1, "max_lat": 10.4, "min_lon": 76.2, "max_lon": 77.1}}',
+    # Weather: the WeatherXM tool's output, two stations' latest readings
+    "6864dd95ade4d61675d45e4d": (
+        '{{"successful": ['
+        '{{"stationId": "a", "data": {{"observation": {{"temperature": 24.1, "humidity": 96, "wind_speed": 11.2, '
+        '"wind_gust": 19.5, "precipitation_rate": 18.4, "precipitation_accumulated": 182.4}}}}}}, '
+        '{{"stationId": "b", "data": {{"observation": {{"temperature": 23.6, "humidity": 98, "wind_speed": 9.8, '
+        '"wind_gust": 16.1, "precipitation_rate": 22.0, "precipitation_accumulated": 211.0}}}}}}'
+        '], "failed": []}}'
+    ),
+    # Analysis
+    "6866162ee2d11c774d448a27": "Severe flooding with large-scale displacement.\nAMOUNT: $25,000",
+    # Tweet
+    "6864e70f77520411d032518a": "Tweet posted: https://x.com/godshand/status/{n}",
+    # Fact-check
+    "686656aaf14ab5c885e431ce": (
+        "amount: 120\ncomment: The NGO distributed food kits in the affected districts.\n"
+        "sources: https://example.org/reports/{n}"
+    ),
+    # Re-vote adjustment
+    "6866646ff14ab5c885e4386d": "150",
+}
+
+MOCK_USDC_SOURCE = """
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.19;
+
+contract MockUSDC {
+    string public name = "USD Coin";
+    string public symbol = "USDC";
+    uint8 public decimals = 6;
+    mapping(address => uint256) public balanceOf;
+    mapping(address => mapping(address => uint256)) public allowance;
+
+    event Transfer(address indexed from, address indexed to, uint256 value);
+    event Approval(address indexed owner, address indexed spender, uint256 value);
+
+    function mint(address to, uint256 amount) public {
+        balanceOf[to] += amount;
+        emit Transfer(address(0), to, amount);
+    }
+
+    function transfer(address to, uint256 amount) public returns (bool) {
+        require(balanceOf[msg.sender] >= amount, "insufficient balance");
+        balanceOf[msg.sender] -= amount;
+        balanceOf[to] += amount;
+        emit Transfer(msg.sender, to, amount);
+        return true;
+    }
+
+    function approve(address spender, uint256 amount) public returns (bool) {
+        allowance[msg.sender][spender] = amount;
+        emit Approval(msg.sender, spender, amount);
+        return true;
+    }
+
+    function transferFrom(address from, address to, uint256 amount) public returns (bool) {
+        require(balanceOf[from] >= amount, "insufficient balance");
+        require(allowance[from][msg.sender] >= amount, "insufficient allowance");
+        allowance[from][msg.sender] -= amount;
+        balanceOf[from] -= amount;
+        balanceOf[to] += amount;
+        emit Transfer(from, to, amount);
+        return true;
+    }
+}
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+class FakeAgentServer:
+    """OpenAI-compatible agent endpoint; replies after `latency` seconds (+/- jitter share)"""
+
+    def __init__(self, latency=1.0, jitter=0.2, replies=None, stream_chunk_chars=24):
+        self.latency = latency
+        self.jitter = jitter
+        self.replies = {**DEFAULT_REPLIES, **(replies or {})}
+        self.stream_chunk_chars = stream_chunk_chars
+        self.port = free_port()
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "streamed": 0}
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1/agent"
+
+    def reply_for(self, model):
+        with self._lock:
+            self.counters["requests"] += 1
+            n = self.counters["requests"]
+        template = self.replies.get(model, "amount: 100\ncomment: benchmark reply\nsources: https://example.org")
+        return template.format(n=n, token=uuid.uuid4().hex[:12])
+
+    def delay(self):
+        spread = self.latency * self.jitter
+        time.sleep(max(0.0, random.uniform(self.latency - spread, self.latency + spread)))
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                model = body.get("model", "")
+                content = server.reply_for(model)
+                server.delay()
+                if body.get("stream"):
+                    self.stream(model, content)
+                else:
+                    self.send_json({
+                        "id": f"chatcmpl-{uuid.uuid4().hex}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    })
+
+            def send_json(self, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def stream(self, model, content):
+                with server._lock:
+                    server.counters["streamed"] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+                size = server.stream_chunk_chars
+                for i in range(0, len(content), size):
+                    chunk = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model, "choices": [{"index": 0, "delta": {"content": content[i:i + size]},
+                                                          "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-agent", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def compile_contracts():
+    """ABI and bytecode of GodsHand.sol (contract godslite) and the mock USDC"""
+    import solcx
+
+    if SOLC_VERSION not in {str(v) for v in solcx.get_installed_solc_versions()}:
+        solcx.install_solc(SOLC_VERSION)
+    with open(GODSHAND_SOURCE, encoding="utf-8") as f:
+        godshand = f.read()
+    compiled = solcx.compile_standard({
+        "language": "Solidity",
+        "sources": {"GodsHand.sol": {"content": godshand}, "MockUSDC.sol": {"content": MOCK_USDC_SOURCE}},
+        "settings": {"optimizer": {"enabled": True, "runs": 200},
+                     "outputSelection": {"*": {"*": ["abi", "evm.bytecode.object"]}}},
+    }, solc_version=SOLC_VERSION)
+    contracts = compiled["contracts"]
+    return {
+        name: {"abi": contracts[source][name]["abi"], "bytecode": contracts[source][name]["evm"]["bytecode"]["object"]}
+        for source, name in (("GodsHand.sol", "godslite"), ("MockUSDC.sol", "MockUSDC"))
+    }
+
+
+class LocalChain:
+    """
+    anvil on the Sepolia chain ID (both pipelines sign with 11155111) with
+    godslite and MockUSDC deployed. Accounts are fresh keys funded through
+    anvil_setBalance. Pass rpc_url to use an already running anvil instead.
+    """
+
+    def __init__(self, rpc_url=None, block_time=None):
+        self.rpc_url = rpc_url
+        self.block_time = block_time
+        self._process = None
+        self.web3 = None
+        self.deployer = None
+        self.godshand = None
+        self.usdc = None
+
+    def start(self):
+        from web3 import Web3
+
+        if not self.rpc_url:
+            anvil = shutil.which("anvil")
+            if not anvil:
+                raise RuntimeError("anvil not found on PATH; install Foundry or pass --rpc-url")
+            port = free_port()
+            command = [anvil, "--port", str(port), "--chain-id", str(SEPOLIA_CHAIN_ID), "--silent"]
+            if self.block_time:
+                command += ["--block-time", str(self.block_time)]
+            self._process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            wait_for_port(port)
+            self.rpc_url = f"http://127.0.0.1:{port}"
+        self.web3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        if self.web3.eth.chain_id != SEPOLIA_CHAIN_ID:
+            raise RuntimeError(f"{self.rpc_url} has chain ID {self.web3.eth.chain_id}, expected {SEPOLIA_CHAIN_ID}")
+
+        self.deployer = self.funded_account()
+        artifacts = compile_contracts()
+        self.godshand = self.deploy(artifacts["godslite"])
+        self.usdc = self.deploy(artifacts["MockUSDC"])
+        return self
+
+    def funded_account(self, eth=100):
+        from eth_account import Account
+
+        account = Account.create()
+        self.web3.provider.make_request("anvil_setBalance", [account.address, hex(eth * 10 ** 18)])
+        return account
+
+    def transact(self, account, call, gas=3_000_000):
+        tx = call.build_transaction({
+            "from": account.address,
+            "nonce": self.web3.eth.get_transaction_count(account.address, "pending"),
+            "gas": gas,
+            "gasPrice": self.web3.to_wei("20", "gwei"),
+            "chainId": SEPOLIA_CHAIN_ID,
+        })
+        signed = account.sign_transaction(tx)
+        receipt = self.web3.eth.wait_for_transaction_receipt(self.web3.eth.send_raw_transaction(signed.raw_transaction))
+        if receipt.status != 1:
+            raise RuntimeError(f"Transaction {receipt.transactionHash.hex()} reverted")
+        return receipt
+
+    def deploy(self, artifact):
+        factory = self.web3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"])
+        receipt = self.transact(self.deployer, factory.constructor())
+        return self.web3.eth.contract(address=receipt.contractAddress, abi=artifact["abi"])
+
+    def create_disaster(self, title, target_usdc, donated_usdc=0):
+        """A disaster as the frontend would leave it: created, then donated to; returns its 0x hash"""
+        receipt = self.transact(self.deployer, self.godshand.functions.createDisaster(
+            title, "benchmark disaster", int(target_usdc * 1_000_000)))
+        disaster_hash = self.godshand.events.DisasterCreated().process_receipt(receipt)[0]["args"]["disasterHash"]
+        if donated_usdc:
+            self.transact(self.deployer, self.godshand.functions.recordDonation(
+                disaster_hash, int(donated_usdc * 1_000_000), self.deployer.address))
+        return "0x" + disaster_hash.hex().removeprefix("0x")
+
+    def mint_usdc(self, address, amount_usdc):
+        self.transact(self.deployer, self.usdc.functions.mint(address, int(amount_usdc * 1_000_000)))
+
+    def stop(self):
+        if self._process:
+            self._process.terminate()
+            self._process.wait(timeout=10)
+
+
+class LocalDynamoDB:
+    """moto's DynamoDB server with the two tables the pipelines use; pass endpoint_url for DynamoDB Local"""
+
+    TABLES = ("gods-hand-events", "gods-hand-claims")
+
+    def __init__(self, endpoint_url=None, region="us-east-1"):
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self._server = None
+        self.resource = None
+
+    def start(self):
+        import boto3
+
+        if not self.endpoint_url:
+            from moto.server import ThreadedMotoServer
+
+            port = free_port()
+            self._server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+            self._server.start()
+            self.endpoint_url = f"http://127.0.0.1:{port}"
+        self.resource = boto3.resource(
+            "dynamodb", region_name=self.region, endpoint_url=self.endpoint_url,
+            aws_access_key_id="loadtest", aws_secret_access_key="loadtest",
+        )
+        existing = set(self.resource.meta.client.list_tables()["TableNames"])
+        for name in self.TABLES:
+            if name not in existing:
+                self.resource.create_table(
+                    TableName=name,
+                    KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+                    AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+                    BillingMode="PAY_PER_REQUEST",
+                ).wait_until_exists()
+        return self
+
+    def seed_claims(self, count, recipient, amount_usdc=1, prefix="claim"):
+        """`count` claims in the voting state, ids prefix-0 .. prefix-(count - 1)"""
+        table = self.resource.Table("gods-hand-claims")
+        with table.batch_writer() as batch:
+            for i in range(count):
+                batch.put_item(Item={
+                    "id": f"{prefix}-{i}",
+                    "organization_aztec_address": recipient,
+                    "claimed_amount": Decimal(str(amount_usdc)),
+                    "reason": "Food kits and clean water for displaced families",
+                    "claim_state": "voting",
+                })
+        return [f"{prefix}-{i}" for i in range(count)]
+
+    def stop(self):
+        if self._server:
+            self._server.stop()
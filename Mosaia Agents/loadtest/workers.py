@@ -0,0 +1,99 @@
+"""
+Pipeline-side half of the load test. Both pipelines have a main.py (and
+clients.py, metrics.py, ...), so each runs in its own process started by
+run.py with the stand-in endpoints in its environment.
+
+    python workers.py serve-verification --port 8000
+    python workers.py disaster-flow --requests 20 --concurrency 4 --out flow.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.dirname(LOADTEST_DIR)
+PIPELINE_DIRS = {
+    "verification": os.path.join(AGENTS_DIR, "Voting-Verification Pipeline"),
+    "disaster": os.path.join(AGENTS_DIR, "Disaster Creation Pipeline"),
+}
+
+sys.path.insert(0, LOADTEST_DIR)
+
+from report import summarize  # noqa: E402
+
+
+def import_pipeline(name):
+    # Relative paths in the env (cache and index databases) resolve like in production
+    os.chdir(PIPELINE_DIRS[name])
+    sys.path.insert(0, PIPELINE_DIRS[name])
+    no_ngrok = contextlib.nullcontext()
+    if name == "verification":
+        no_ngrok = mock.patch("pyngrok.ngrok.connect", side_effect=RuntimeError("ngrok disabled for load test"))
+    with no_ngrok:
+        import main
+    return main
+
+
+def serve_verification(args):
+    import uvicorn
+
+    main = import_pipeline("verification")
+    # Runs the app's startup hooks (executor size, receipt tracker, event watcher) like production
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def disaster_flow(args):
+    out = os.path.abspath(args.out)
+    main = import_pipeline("disaster")
+    # Event rows and tweets are delivered in the background, as in production
+    main.start_outbox_workers()
+    lock = threading.Lock()
+    latencies, counts = [], {"errors": 0, "stopped": 0}
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            outcome = "stopped" if main.run_disaster_flow() is None else None
+        except Exception:
+            traceback.print_exc()
+            outcome = "errors"
+        with lock:
+            if outcome:
+                counts[outcome] += 1
+            if outcome != "errors":
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    summary = summarize(latencies, counts["errors"], time.perf_counter() - started, args.concurrency,
+                        stopped_early=counts["stopped"])
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(summary, f)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve-verification")
+    serve.add_argument("--port", type=int, required=True)
+    flow = commands.add_parser("disaster-flow")
+    flow.add_argument("--requests", type=int, required=True)
+    flow.add_argument("--concurrency", type=int, required=True)
+    flow.add_argument("--out", required=True)
+    args = parser.parse_args()
+    if args.command == "serve-verification":
+        serve_verification(args)
+    else:
+        disaster_flow(args)
+
+
+if __name__ == "__main__":
+    main_cli()